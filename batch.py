@@ -0,0 +1,142 @@
+"""Headless batch mode: run an operation chain over whole directories"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import operations
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+
+
+def find_images(input_dir):
+    """List image files under input_dir (recursively), sorted"""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths
+
+
+def sibling_images(path):
+    """Image files in the same directory as path, sorted by name"""
+    folder = os.path.dirname(os.path.abspath(path))
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(IMAGE_EXTENSIONS)
+                  and os.path.isfile(os.path.join(folder, name)))
+
+
+def output_path_for(path, input_dir, output_dir, fmt=None):
+    """Mirror path from input_dir into output_dir, optionally changing extension"""
+    relative = os.path.relpath(path, input_dir)
+    if fmt:
+        relative = os.path.splitext(relative)[0] + '.' + fmt.lower().lstrip('.')
+    return os.path.join(output_dir, relative)
+
+
+def process_file(path, out_path, chain):
+    """Worker: load, transform and write a single file"""
+    try:
+        image = operations.open_image(path, operations.draft_size(chain))
+        result = operations.apply_chain(image, chain)
+        os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+        operations.save_image(result, out_path)
+        return path, None
+    except Exception as e:
+        return path, str(e)
+
+
+def run_batch(input_dir, output_dir, chain, workers=None, fmt=None, progress=None):
+    """Process every image in input_dir on a process pool.
+
+    Files are submitted through a bounded window so memory stays flat on
+    very large directories. Returns a summary dict.
+    """
+    paths = find_images(input_dir)
+    workers = workers or os.cpu_count() or 1
+    window = workers * 4
+    errors = []
+    done = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        queue = iter(paths)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                path = next(queue, None)
+                if path is None:
+                    exhausted = True
+                    break
+                out_path = output_path_for(path, input_dir, output_dir, fmt)
+                pending.add(executor.submit(process_file, path, out_path, chain))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, error = future.result()
+                done += 1
+                if error:
+                    errors.append((path, error))
+                if progress:
+                    progress(done, len(paths), time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'total': len(paths),
+        'processed': done - len(errors),
+        'errors': errors,
+        'seconds': elapsed,
+        'images_per_second': done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_progress(done, total, elapsed):
+    """Single-line progress report on stderr"""
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(f"\r{done}/{total} images  {rate:.1f} img/s")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Apply an operation chain to every image in a directory.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--op", action="append", default=[], metavar="NAME[=VALUE]",
+                        help="operation to apply, in order; repeatable "
+                             f"({', '.join(operations.OPERATIONS)})")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--format", default=None,
+                        help="output extension, e.g. png (default: keep input's)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    return parser
+
+
+def main(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        chain = [operations.parse_op(spec) for spec in args.op]
+    except ValueError as e:
+        parser.error(str(e))
+    if not chain:
+        parser.error("at least one --op is required")
+
+    summary = run_batch(args.input_dir, args.output_dir, chain,
+                        workers=args.workers, fmt=args.format,
+                        progress=None if args.quiet else print_progress)
+
+    for path, error in summary['errors']:
+        print(f"Failed: {path}: {error}", file=sys.stderr)
+    print(f"Processed {summary['processed']}/{summary['total']} images "
+          f"in {summary['seconds']:.2f}s ({summary['images_per_second']:.1f} images/s)")
+    return 1 if summary['errors'] else 0
@@ -0,0 +1,70 @@
+"""Thread scaling of the banded edge detectors on 4K+ images.
+
+    python benchmarks/bench_edges.py --sizes 3840x2160 7680x4320 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import edges  # noqa: E402
+
+
+def synthetic(width, height, seed=0):
+    """Blocks and discs with mild noise, so Canny has real edges to follow"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    image = ((xx // 97 + yy // 61) % 2 * 120 + 60).astype(np.float32)
+    for _ in range(20):
+        cx, cy, r = rng.integers(0, width), rng.integers(0, height), rng.integers(20, 300)
+        image[(xx - cx) ** 2 + (yy - cy) ** 2 < r * r] = rng.integers(0, 256)
+    image += rng.normal(0, 4, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.float32)
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["3840x2160", "7680x4320"])
+    parser.add_argument("--workers", nargs="+", type=int, default=None,
+                        help="thread counts to try (default: 1, 2, 4, ... up to CPU count)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= cpus], cpus})
+
+    print(f"{'size':>11} {'method':>8} {'threads':>7} {'seconds':>8} {'MP/s':>7} {'speedup':>7}")
+    for size in args.sizes:
+        width, height = map(int, size.lower().split('x'))
+        gray = synthetic(width, height)
+        megapixels = width * height / 1e6
+        for method in ("sobel", "prewitt", "canny"):
+            if method == "canny":
+                def run(n):
+                    return edges.canny(gray, workers=n)
+            else:
+                def run(n):
+                    return edges.gradient_magnitude(gray, method, workers=n)
+            baseline = None
+            for n in workers:
+                seconds = best_time(lambda: run(n), args.repeat)
+                baseline = baseline or seconds
+                print(f"{size:>11} {method:>8} {n:>7} {seconds:>8.3f} "
+                      f"{megapixels / seconds:>7.1f} {baseline / seconds:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""File size and encode time over a sweep of encoder settings.
+
+Each setting is encoded to a temporary file; the table shows how much
+size each second of encoding buys, to pick the fastest acceptable
+settings. A photo can be given instead of the synthetic image.
+
+    python benchmarks/bench_export.py --size 4k --formats PNG JPEG
+    python benchmarks/bench_export.py --image photo.jpg --parallel
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export  # noqa: E402
+import operations  # noqa: E402
+from bench_operations import SIZES, synthetic  # noqa: E402
+
+# format -> list of encoder option overrides
+SETTINGS = {
+    'PNG': [{'compress_level': level} for level in (0, 1, 3, 6, 9)] + [{'optimize': True}],
+    'JPEG': [{'quality': q, 'subsampling': s} for q in (75, 85, 95) for s in ('4:2:0', '4:4:4')]
+            + [{'quality': 85, 'progressive': True}, {'quality': 85, 'optimize': True}],
+    'WEBP': [{'quality': q} for q in (75, 90)] + [{'lossless': True, 'method': m} for m in (0, 4)],
+    'TIFF': [{'compression': c} for c in export.TIFF_COMPRESSION],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="4k", choices=list(SIZES))
+    parser.add_argument("--image", help="benchmark this file instead of a synthetic image")
+    parser.add_argument("--formats", nargs="+", default=list(SETTINGS), choices=list(SETTINGS))
+    parser.add_argument("--parallel", action="store_true",
+                        help="also time the web set encoded serially and in parallel")
+    args = parser.parse_args()
+
+    if args.image:
+        image = operations.open_image(args.image)
+    else:
+        image = synthetic(*SIZES[args.size], 'RGB')
+    raw = image.width * image.height * len(image.getbands())
+    print(f"{image.width}x{image.height} {image.mode}, {raw / 2 ** 20:.1f} MB raw")
+
+    with tempfile.TemporaryDirectory(prefix="toolkit-export-") as folder:
+        print(f"{'format':<6} {'options':<44} {'KB':>9} {'ratio':>6} {'seconds':>8}")
+        for fmt in args.formats:
+            for overrides in SETTINGS[fmt]:
+                target = export.Target(os.path.join(folder, "out" + export.EXTENSIONS[fmt]),
+                                       fmt, **overrides)
+                report = export.encode(image, target)
+                options = ", ".join(f"{k}={v}" for k, v in overrides.items())
+                print(f"{fmt:<6} {options:<44} {report['bytes'] / 1024:>9.1f} "
+                      f"{raw / report['bytes']:>6.1f} {report['seconds']:>8.3f}")
+
+        if args.parallel:
+            targets = export.set_targets(os.path.join(folder, "set.png"))
+            for workers in (1, len(targets)):
+                start = time.perf_counter()
+                export.export_all(image, targets, workers=workers)
+                print(f"web set, {workers} worker(s): {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
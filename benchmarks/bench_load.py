@@ -0,0 +1,87 @@
+"""Time to first pixel and downscale throughput on large camera JPEGs.
+
+A synthetic JPEG (40 MP by default) is written once. The script compares:
+- a full decode (plus statistics, as the app used to do before showing
+  anything) against a screen-sized draft decode;
+- a single LANCZOS resize against reduce() followed by LANCZOS;
+- the batch path for a leading resize, which decodes a draft first.
+
+    python benchmarks/bench_load.py --size 7728x5152 --screen 1280x800 --targets 1920x1280 800x533
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import operations  # noqa: E402
+import stats  # noqa: E402
+from bench_operations import synthetic  # noqa: E402
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="7728x5152")
+    parser.add_argument("--screen", default="1280x800", type=operations.parse_size)
+    parser.add_argument("--targets", nargs="+", default=["1920x1280", "800x533"])
+    parser.add_argument("--quality", type=int, default=92)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = operations.parse_size(args.size)
+    workdir = tempfile.mkdtemp(prefix="toolkit-bench-")
+    try:
+        path = os.path.join(workdir, "camera.jpg")
+        synthetic(width, height, 'RGB').save(path, quality=args.quality)
+
+        def full_load():
+            # Fresh image each run so the statistics cache cannot help
+            stats.compute(operations.open_image(path))
+
+        full = best_time(full_load, args.repeat)
+        draft = best_time(lambda: operations.open_image(path, draft_size=args.screen), args.repeat)
+        print(f"time to first pixel: full decode + stats {full:.3f}s, "
+              f"draft decode {draft:.3f}s ({full / draft:.1f}x)")
+
+        image = operations.open_image(path)
+        megapixels = width * height / 1e6
+        print(f"{'target':>10} {'LANCZOS s':>10} {'reduce s':>9} {'speedup':>7} "
+              f"{'decode+resize s':>15} {'draft+resize s':>14} {'speedup':>7}")
+        for target in args.targets:
+            size = operations.parse_size(target)
+            single = best_time(lambda: image.resize(size, Image.Resampling.LANCZOS), args.repeat)
+            reduced = best_time(lambda: operations.resize(image, size), args.repeat)
+
+            chain = [("resize", (size,))]
+
+            def old_batch():
+                operations.open_image(path).resize(size, Image.Resampling.LANCZOS)
+
+            def new_batch():
+                operations.apply_chain(operations.open_image(path, operations.draft_size(chain)), chain)
+
+            before = best_time(old_batch, args.repeat)
+            after = best_time(new_batch, args.repeat)
+            print(f"{target:>10} {single:>10.3f} {reduced:>9.3f} {single / reduced:>6.1f}x "
+                  f"{before:>15.3f} {after:>14.3f} {before / after:>6.1f}x")
+        print(f"({megapixels:.0f} MP source)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""van Herk/Gil-Werman erosion and dilation against Pillow's MinFilter/MaxFilter.
+
+The engine's cost per pixel should stay flat as the structuring element
+grows; Pillow's rank filters sort every window, so they are skipped above
+--pil-max. Where both run, the outputs are checked to be identical.
+
+    python benchmarks/bench_morphology.py --size 3840x2160 --sizes 3 9 31 101
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import ImageFilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import morphology  # noqa: E402
+import operations  # noqa: E402
+from bench_operations import synthetic  # noqa: E402
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="1920x1080", type=operations.parse_size)
+    parser.add_argument("--mode", default="L", choices=['RGB', 'L'])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[3, 5, 9, 15, 31, 51, 101])
+    parser.add_argument("--pil-max", type=int, default=31,
+                        help="largest element to run Pillow's MinFilter/MaxFilter at (they are O(k^2))")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = args.size
+    image = synthetic(width, height, args.mode)
+    array = np.asarray(image)
+    megapixels = width * height / 1e6
+
+    print(f"{width}x{height} {args.mode}")
+    print(f"{'op':>7} {'size':>5} {'engine s':>9} {'MP/s':>7} {'Pillow s':>9} {'MP/s':>7} {'identical':>9}")
+    for size in args.sizes:
+        cases = [
+            ('erode', morphology.erode, ImageFilter.MinFilter),
+            ('dilate', morphology.dilate, ImageFilter.MaxFilter),
+        ]
+        for name, engine, pil_filter in cases:
+            ours, result = best_time(lambda: engine(array, size), args.repeat)
+            line = f"{name:>7} {size:>5} {ours:>9.3f} {megapixels / ours:>7.1f}"
+            if size <= args.pil_max:
+                theirs, reference = best_time(lambda: image.filter(pil_filter(size)), 1)
+                identical = np.array_equal(result, np.asarray(reference))
+                line += f" {theirs:>9.3f} {megapixels / theirs:>7.1f} {'yes' if identical else 'NO':>9}"
+            else:
+                line += f" {'-':>9} {'-':>7} {'-':>9}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
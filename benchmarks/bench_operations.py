@@ -0,0 +1,216 @@
+"""Headless benchmark of every operation over a sweep of image sizes.
+
+Each case runs in a fresh worker process and peak memory is the growth
+of the process's resident set while the operation runs, so PIL and
+NumPy allocations are both counted. Results can be saved as a JSON baseline and
+later runs compared against it.
+
+    python benchmarks/bench_operations.py --sizes vga 4k 24mp --save benchmarks/results/baseline.json
+    python benchmarks/bench_operations.py --compare benchmarks/results/baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import operations  # noqa: E402
+
+SIZES = {
+    'vga': (640, 480),
+    '4k': (3840, 2160),
+    '24mp': (6000, 4000),
+    '100mp': (12240, 8160),
+}
+
+# label -> (operation name, function of (width, height) returning its args)
+CASES = {
+    'negative': ('negative', lambda w, h: ()),
+    'smoothing': ('smoothing', lambda w, h: (5,)),
+    'box': ('box', lambda w, h: (5,)),
+    'median': ('median', lambda w, h: (5,)),
+    'sharpening': ('sharpening', lambda w, h: ()),
+    'resize_half': ('resize', lambda w, h: ((w // 2, h // 2),)),
+    'threshold': ('threshold', lambda w, h: (128,)),
+    'otsu': ('otsu', lambda w, h: ()),
+    'adaptive_mean': ('adaptive_mean', lambda w, h: (31,)),
+    'adaptive_gaussian': ('adaptive_gaussian', lambda w, h: (31,)),
+    'sauvola': ('sauvola', lambda w, h: (31,)),
+    'erode': ('erode', lambda w, h: (15,)),
+    'open': ('open', lambda w, h: (15,)),
+    'equalize': ('equalize', lambda w, h: ()),
+    'clahe': ('clahe', lambda w, h: (2.0, 8)),
+    'gamma': ('gamma', lambda w, h: (2.2,)),
+    'edges_sobel': ('edges', lambda w, h: ('sobel',)),
+    'edges_prewitt': ('edges', lambda w, h: ('prewitt',)),
+    'edges_canny': ('edges', lambda w, h: ('canny',)),
+}
+
+
+def _proc_status(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise OSError(field)
+
+
+class PeakMemory:
+    """Peak RSS growth over a block of code.
+
+    On Linux the kernel's high-water mark is reset first (clear_refs), so
+    the peak is exact even when earlier allocations went higher. Elsewhere
+    it falls back to the growth of ru_maxrss, which can under-report.
+    """
+
+    def __enter__(self):
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            self.exact = True
+            self.start = _proc_status('VmRSS')
+        except OSError:
+            self.exact = False
+            self.start = self._max_rss()
+        return self
+
+    def __exit__(self, *exc):
+        end = _proc_status('VmHWM') if self.exact else self._max_rss()
+        self.peak = max(0, end - self.start)
+
+    @staticmethod
+    def _max_rss():
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def synthetic(width, height, mode, seed=0):
+    """Smooth gradients plus noise: compressible like a photo, never constant.
+
+    Built in row blocks so generating a 100 MP image does not itself push
+    the process's peak memory far above the image size.
+    """
+    rng = np.random.default_rng(seed)
+    bands = 1 if mode == 'L' else 3
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    image = np.empty((height, width, bands), dtype=np.uint8)
+    for y0 in range(0, height, 256):
+        y1 = min(y0 + 256, height)
+        y = np.linspace(0, 255, height, dtype=np.float32)[y0:y1, None]
+        for b in range(bands):
+            plane = (x * (b + 1) / bands + y) / 2
+            plane += rng.normal(0, 12, (y1 - y0, width)).astype(np.float32)
+            image[y0:y1, :, b] = np.clip(plane, 0, 255)
+    if bands == 1:
+        return Image.fromarray(image[:, :, 0], 'L')
+    return Image.fromarray(image, 'RGB')
+
+
+def run_case(label, size_name, mode, repeat):
+    """Worker: time one case and measure its peak memory growth"""
+    width, height = SIZES[size_name]
+    name, make_args = CASES[label]
+    func = operations.OPERATIONS[name][0]
+    args = make_args(width, height)
+    image = synthetic(width, height, mode)
+    func(image.crop((0, 0, 64, 64)), *args)  # warm up imports and caches
+
+    times = []
+    with PeakMemory() as memory:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(image, *args)
+            times.append(time.perf_counter() - start)
+            del result
+
+    seconds = min(times)
+    return {
+        'operation': label,
+        'size': size_name,
+        'mode': mode,
+        'seconds': seconds,
+        'mp_per_s': width * height / 1e6 / seconds,
+        'peak_bytes': memory.peak,
+    }
+
+
+def case_key(result):
+    return f"{result['operation']}/{result['size']}/{result['mode']}"
+
+
+def compare(results, baseline, threshold):
+    """Cases whose time grew by more than threshold (a fraction) vs. baseline"""
+    previous = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        change = result['seconds'] / old['seconds'] - 1.0
+        result['change'] = change
+        if change > threshold:
+            regressions.append((case_key(result), old['seconds'], result['seconds'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=['vga', '4k', '24mp'], choices=list(SIZES))
+    parser.add_argument("--modes", nargs="+", default=['RGB', 'L'], choices=['RGB', 'L'])
+    parser.add_argument("--ops", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown fraction flagged as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'operation':<14} {'size':>6} {'mode':>4} {'seconds':>9} {'MP/s':>8} {'peak MB':>8}")
+    for size_name in args.sizes:
+        for mode in args.modes:
+            for label in args.ops:
+                # A fresh process per case keeps max RSS meaningful
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(run_case, label, size_name, mode, args.repeat).result()
+                results.append(result)
+                print(f"{label:<14} {size_name:>6} {mode:>4} {result['seconds']:>9.4f} "
+                      f"{result['mp_per_s']:>8.1f} {result['peak_bytes'] / 2 ** 20:>8.1f}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            status = 1
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for key, old, new, change in regressions:
+                print(f"  {key:<28} {old:.4f}s -> {new:.4f}s  (+{change:.0%})")
+        else:
+            print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'results': results,
+            }, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Core scaling of the banded single-image executor (parallel.apply).
+
+Every operation runs on 1, 2, 4, ... up to the CPU count of threads. With
+one thread it is a plain single-core call (banded filters inside run
+serially too). Each output is checked against the plain call, bit for bit.
+
+    python benchmarks/bench_parallel.py --size 100mp --ops median smoothing sharpening
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import edges  # noqa: E402
+import operations  # noqa: E402
+import parallel  # noqa: E402
+from bench_operations import CASES, SIZES, synthetic  # noqa: E402
+
+DEFAULT_OPS = ['median', 'smoothing', 'sharpening', 'adaptive_mean', 'edges_sobel', 'gamma']
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="24mp", choices=list(SIZES))
+    parser.add_argument("--mode", default="RGB", choices=["RGB", "L"])
+    parser.add_argument("--ops", nargs="+", default=DEFAULT_OPS, choices=list(CASES))
+    parser.add_argument("--workers", nargs="+", type=int, default=None,
+                        help="thread counts to try (default: 1, 2, 4, ... up to CPU count)")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= cpus], cpus})
+    width, height = SIZES[args.size]
+    image = synthetic(width, height, args.mode)
+    megapixels = width * height / 1e6
+    print(f"{width}x{height} {args.mode}, {cpus} CPU(s)")
+    print(f"{'operation':<18} {'threads':>7} {'seconds':>8} {'MP/s':>7} {'speedup':>7} {'identical':>9}")
+
+    for label in args.ops:
+        name, make_args = CASES[label]
+        func = operations.OPERATIONS[name][0]
+        op_args = make_args(width, height)
+        with edges.serial():
+            reference = np.asarray(func(image, *op_args))
+        base = None
+        for n in workers:
+            if n == 1:
+                def run():
+                    with edges.serial():
+                        return parallel.apply(func, image, op_args, workers=1)
+            else:
+                def run():
+                    return parallel.apply(func, image, op_args, workers=n)
+            seconds, result = best_time(run, args.repeat)
+            base = base or seconds
+            identical = np.array_equal(np.asarray(result), reference)
+            print(f"{label:<18} {n:>7} {seconds:>8.3f} {megapixels / seconds:>7.1f} "
+                  f"{base / seconds:>6.2f}x {'yes' if identical else 'NO':>9}")
+
+
+if __name__ == "__main__":
+    main()
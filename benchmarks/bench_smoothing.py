@@ -0,0 +1,70 @@
+"""Smoothing engine against Pillow's filters over kernel radii 1-50.
+
+Kernel size is 2 * radius + 1. The engine's cost per pixel should stay
+flat as the radius grows; Pillow's rank (median) filter grows with the
+window area, so it is skipped beyond --pil-median-max.
+
+    python benchmarks/bench_smoothing.py --size 3840x2160 --radii 1 2 5 10 20 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import ImageFilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import filters  # noqa: E402
+from bench_operations import synthetic  # noqa: E402
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--mode", default="RGB", choices=['RGB', 'L'])
+    parser.add_argument("--radii", nargs="+", type=int, default=[1, 2, 3, 5, 10, 20, 35, 50])
+    parser.add_argument("--pil-median-max", type=int, default=7,
+                        help="largest radius to run Pillow's MedianFilter at (it is O(k^2))")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.lower().split('x'))
+    image = synthetic(width, height, args.mode)
+    array = np.asarray(image)
+    megapixels = width * height / 1e6
+
+    print(f"{'filter':>8} {'radius':>6} {'engine s':>9} {'MP/s':>7} {'Pillow s':>9} {'MP/s':>7}")
+    for radius in args.radii:
+        size = 2 * radius + 1
+        cases = [
+            ('box', lambda: filters.box(array, size),
+             lambda: image.filter(ImageFilter.BoxBlur(radius))),
+            ('gaussian', lambda: filters.gaussian(array, size),
+             lambda: image.filter(ImageFilter.GaussianBlur(filters.gaussian_sigma(size)))),
+            ('median', lambda: filters.median(array, size),
+             lambda: image.filter(ImageFilter.MedianFilter(size))),
+        ]
+        for name, engine, pil in cases:
+            ours = best_time(engine, args.repeat)
+            line = f"{name:>8} {radius:>6} {ours:>9.3f} {megapixels / ours:>7.1f}"
+            if name != 'median' or radius <= args.pil_median_max:
+                theirs = best_time(pil, args.repeat)
+                line += f" {theirs:>9.3f} {megapixels / theirs:>7.1f}"
+            else:
+                line += f" {'-':>9} {'-':>7}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Startup time of the toolkit, cold and warm, recorded per release.
+
+Cold runs import main.py with an empty bytecode cache (everything is
+compiled from source); warm runs reuse a populated cache. Each run is a
+fresh interpreter. When a display is available the time until the main
+window has been drawn is measured as well.
+
+    python benchmarks/bench_startup.py --runs 10 --label v1.3 --output benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import main"
+
+WINDOW_SNIPPET = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import main
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print("nan")
+    raise SystemExit
+app = main.ImageToolkitApp(root)
+root.update()
+print(time.perf_counter() - start)
+root.destroy()
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_import(pycache_dir):
+    """One interpreter: total wall time and the parsed -X importtime table"""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_dir)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # main itself and the modules it imports directly
+        if match and len(match.group(3)) <= 3:
+            modules[match.group(4)] = int(match.group(2)) / 1e6
+    return wall, modules
+
+
+def run_window(pycache_dir):
+    """Seconds until the main window is drawn, or None without a display"""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_dir)
+    proc = subprocess.run([sys.executable, "-c", WINDOW_SNIPPET], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    try:
+        value = float(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+    return None if value != value else value
+
+
+def summarise(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'runs': len(samples),
+    }
+
+
+def measure(runs):
+    cold, warm, windows = [], [], []
+    slowest = {}
+    warm_cache = tempfile.mkdtemp(prefix="toolkit-pycache-")
+    try:
+        run_import(warm_cache)
+        for _ in range(runs):
+            cold_cache = tempfile.mkdtemp(prefix="toolkit-pycache-")
+            try:
+                wall, _ = run_import(cold_cache)
+            finally:
+                shutil.rmtree(cold_cache, ignore_errors=True)
+            cold.append(wall)
+
+            wall, modules = run_import(warm_cache)
+            warm.append(wall)
+            for name, seconds in modules.items():
+                slowest[name] = min(seconds, slowest.get(name, seconds))
+
+            window = run_window(warm_cache)
+            if window is not None:
+                windows.append(window)
+    finally:
+        shutil.rmtree(warm_cache, ignore_errors=True)
+
+    result = {
+        'cold_import': summarise(cold),
+        'warm_import': summarise(warm),
+        'slowest_imports': dict(sorted(slowest.items(), key=lambda kv: -kv[1])[:10]),
+    }
+    if windows:
+        result['window_drawn'] = summarise(windows)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--label", default=None, help="release label stored with the result")
+    parser.add_argument("--output", default=None,
+                        help="JSON file to append this result to (one entry per release)")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    result.update({
+        'label': args.label,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+    for key in ('cold_import', 'warm_import', 'window_drawn'):
+        if key in result:
+            s = result[key]
+            print(f"{key:>13}: median {s['median'] * 1000:7.1f} ms  "
+                  f"(min {s['min'] * 1000:.1f}, max {s['max'] * 1000:.1f}, n={s['runs']})")
+    print("slowest imports by cumulative time (warm):")
+    for name, seconds in result['slowest_imports'].items():
+        print(f"  {name:<30} {seconds * 1000:7.1f} ms")
+
+    if args.output:
+        history = []
+        if os.path.exists(args.output):
+            with open(args.output) as f:
+                history = json.load(f)
+        history.append(result)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(history, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Frame time of the viewport at several zoom levels while panning.
+
+Each zoom renders a pane-sized frame at a series of pan positions, the
+way dragging does, and reports the first frame (which builds any pyramid
+levels it needs) and the median of the rest. The last line is the old
+display path, which resized a whole pyramid level to fit on every update.
+Only the PIL side is timed; Tk's own photo update adds a few ms per frame.
+
+    python benchmarks/bench_viewport.py --size 100mp --pane 1600x1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import operations  # noqa: E402
+import viewer  # noqa: E402
+from bench_operations import SIZES, synthetic  # noqa: E402
+from pyramid import get_pyramid  # noqa: E402
+
+
+def fit_size(size, width, height):
+    """Size the old display path resized to: size fitted within width x height, never enlarged"""
+    w, h = size
+    scale = min(width / w, height / h, 1.0)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="100mp", choices=list(SIZES))
+    parser.add_argument("--mode", default="RGB", choices=["RGB", "L"])
+    parser.add_argument("--pane", default="1600x1000", type=operations.parse_size)
+    parser.add_argument("--zooms", nargs="+", type=float, default=[4.0, 1.0, 0.6, 0.25])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--filter", default="LANCZOS", choices=["LANCZOS", "BILINEAR"],
+                        help="downsampling filter (the viewport uses BILINEAR while dragging)")
+    args = parser.parse_args()
+
+    image = synthetic(*SIZES[args.size], args.mode)
+    width, height = args.pane
+    resample = Image.Resampling[args.filter]
+    print(f"{image.width}x{image.height} {image.mode} in a {width}x{height} pane")
+    print(f"{'zoom':>6} {'first ms':>9} {'median ms':>10} {'fps':>6}")
+
+    zooms = [viewer.fit_scale(image.size, width, height)] + args.zooms
+    for zoom in zooms:
+        times = []
+        for frame in range(args.frames):
+            # Pan diagonally across the image
+            t = frame / max(1, args.frames - 1)
+            center = viewer.clamp_center(image.size, width, height, zoom, (0.2 + 0.6 * t, 0.3 + 0.4 * t))
+            start = time.perf_counter()
+            viewer.render_view(image, width, height, zoom, center, resample)
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times[1:]) if len(times) > 1 else times[0]
+        print(f"{zoom * 100:>5.0f}% {times[0] * 1000:>9.1f} {median * 1000:>10.1f} {1 / median:>6.0f}")
+
+    start = time.perf_counter()
+    level = get_pyramid(image).level_for(width, height)
+    operations.to_8bit(level.resize(fit_size(level.size, width, height), Image.Resampling.LANCZOS))
+    print(f"old fit-to-pane path: {(time.perf_counter() - start) * 1000:.1f} ms (pyramid already built)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Load test for the HTTP server mode (python main.py serve).
+
+Concurrent clients, each on its own keep-alive connection, post the same
+synthetic image with an operation chain until the request budget is
+spent. Client-side latency percentiles and throughput are printed,
+followed by the server's own /metrics (queue depth, batch sizes, ...).
+With --spawn the script starts a server on a free local port and stops it
+afterwards; otherwise it targets --url.
+
+    python benchmarks/load_test.py --spawn -j 4 --clients 32 --requests 2000 --size 256x256
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --size 4000x3000
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import operations  # noqa: E402
+from bench_operations import synthetic  # noqa: E402
+from server import percentile  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn(workers, max_queue):
+    """Start a server subprocess and wait until it answers; returns (process, url)"""
+    port = free_port()
+    command = [sys.executable, os.path.join(ROOT, 'main.py'), 'serve', '--port', str(port)]
+    if workers:
+        command += ['-j', str(workers)]
+    if max_queue:
+        command += ['--max-queue', str(max_queue)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def client(url, path, body, count, latencies, statuses, lock):
+    """Post body count times on one keep-alive connection"""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            connection.request('POST', path, body=body,
+                               headers={'Content-Type': 'application/octet-stream'})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = 'error'
+        seconds = time.perf_counter() - start
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(seconds)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--spawn", action="store_true", help="start a local server for the run")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="server workers with --spawn")
+    parser.add_argument("--max-queue", type=int, default=None, help="server queue bound with --spawn")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="total requests")
+    parser.add_argument("--size", default="256x256", type=operations.parse_size)
+    parser.add_argument("--input-format", default="JPEG", choices=["JPEG", "PNG"])
+    parser.add_argument("--format", default="jpeg", help="output format requested")
+    parser.add_argument("--op", action="append", default=None, metavar="NAME[=VALUE]",
+                        help="operation to apply, repeatable (default: gamma=2.2, sharpening=1.5,2)")
+    args = parser.parse_args()
+
+    ops = args.op or ['gamma=2.2', 'sharpening=1.5,2']
+    path = '/process?' + urlencode([('op', op) for op in ops] + [('format', args.format)])
+    buffer = io.BytesIO()
+    synthetic(*args.size, 'RGB').save(buffer, format=args.input_format)
+    body = buffer.getvalue()
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process, url = spawn(args.workers, args.max_queue)
+    try:
+        per_client = [args.requests // args.clients + (i < args.requests % args.clients)
+                      for i in range(args.clients)]
+        latencies, statuses, lock = [], Counter(), threading.Lock()
+        threads = [threading.Thread(target=client, args=(url, path, body, n, latencies, statuses, lock))
+                   for n in per_client if n]
+        print(f"{args.requests} requests from {len(threads)} clients: "
+              f"{args.size[0]}x{args.size[1]} {args.input_format} ({len(body) / 1024:.0f} KB), "
+              f"ops {' '.join(ops)} -> {args.format}")
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        print(f"statuses: {', '.join(f'{k}: {v}' for k, v in sorted(statuses.items(), key=str))}")
+        print(f"throughput: {statuses[200] / elapsed:.1f} req/s  "
+              f"({statuses[200] * args.size[0] * args.size[1] / 1e6 / elapsed:.1f} MP/s) over {elapsed:.2f}s")
+        if latencies:
+            print("latency ms: " + "  ".join(f"p{q} {percentile(latencies, q) * 1000:.1f}"
+                                             for q in (50, 90, 95, 99)) +
+                  f"  max {latencies[-1] * 1000:.1f}")
+        parts = urlsplit(url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        connection.request('GET', '/metrics')
+        print("server metrics:")
+        print(json.dumps(json.loads(connection.getresponse().read()), indent=2))
+        connection.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
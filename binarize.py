@@ -0,0 +1,103 @@
+"""Automatic thresholding: Otsu from the histogram, adaptive methods from running sums.
+
+Otsu picks the global level that best separates a 256-bin histogram into
+two classes. Adaptive methods compare every pixel with statistics of the
+window around it: its mean minus an offset, a Gaussian-weighted mean
+minus an offset, or Sauvola's threshold from the window's mean and
+standard deviation. Window sums of the pixels and of their squares are
+running sums along each axis (a separable integral image), so the cost
+per pixel does not depend on the window size. Edge pixels are replicated.
+
+Inputs are 2-D uint8 arrays, or float32 arrays on the 0-255 scale for
+native-depth images. Results are uint8 arrays of 0 and 255, computed in
+horizontal bands on a thread pool via edges.run_bands.
+"""
+import numpy as np
+
+import edges
+import filters
+
+# Mean and Gaussian methods keep pixels brighter than the local mean minus this
+ADAPTIVE_OFFSET = 10
+SAUVOLA_K = 0.2
+SAUVOLA_RANGE = 128.0
+
+
+def otsu_level(hist):
+    """Otsu's threshold for a 256-bin histogram: levels >= it are foreground.
+
+    Maximises the between-class variance (mu_T * w0 - mu0)^2 / (w0 * w1)
+    over every split, in one vectorised pass over the histogram.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    mass = np.cumsum(hist * np.arange(len(hist)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mass[-1] * weight - mass * total) ** 2 / (weight * (total - weight))
+    between[~np.isfinite(between)] = 0
+    return int(np.argmax(between)) + 1
+
+
+def binary(mask):
+    """0/255 uint8 from a boolean array, without another allocation"""
+    out = mask.view(np.uint8)
+    out *= 255
+    return out
+
+
+def _window_sum(rows, size, power=1):
+    """Sums of rows (or of their squares, already squared) over size x size windows"""
+    bound = 255 ** power * size * size
+    return filters.box_sum(rows, size, filters.accumulator(rows.dtype, bound))
+
+
+def _window_mean(rows, size):
+    return np.multiply(_window_sum(rows, size), np.float32(1.0 / (size * size)), dtype=np.float32)
+
+
+def adaptive_mean(gray, size, offset=ADAPTIVE_OFFSET, workers=None):
+    """Foreground where a pixel exceeds its window mean minus offset"""
+    size = filters.kernel_size(size)
+
+    def band(rows):
+        threshold = _window_mean(rows, size)
+        threshold -= offset
+        return binary(rows > threshold)
+
+    return edges.run_bands(gray, band, size // 2, workers)
+
+
+def adaptive_gaussian(gray, size, offset=ADAPTIVE_OFFSET, workers=None):
+    """Foreground where a pixel exceeds its Gaussian-weighted mean minus offset.
+
+    The weighted mean is filters.gaussian (box passes, constant cost).
+    """
+    size = filters.kernel_size(size)
+    mean = filters.gaussian(gray, size, workers)
+    threshold = mean.astype(np.float32)
+    threshold -= offset
+    return binary(gray > threshold)
+
+
+def sauvola(gray, size, k=SAUVOLA_K, dynamic_range=SAUVOLA_RANGE, workers=None):
+    """Sauvola: threshold mean * (1 + k * (std / dynamic_range - 1)) per window"""
+    size = filters.kernel_size(size)
+    count = np.float32(1.0 / (size * size))
+
+    def band(rows):
+        mean = _window_mean(rows, size)
+        wide = rows.astype(np.uint32) if rows.dtype == np.uint8 else rows.astype(np.float64)
+        wide *= wide
+        squares = _window_sum(wide, size, power=2)
+        deviation = np.multiply(squares, count, dtype=np.float32)
+        deviation -= mean * mean
+        np.maximum(deviation, 0, out=deviation)
+        np.sqrt(deviation, out=deviation)
+        # threshold = mean * (1 + k * (std / R - 1)), built in place
+        deviation *= np.float32(k / dynamic_range)
+        deviation += np.float32(1 - k)
+        deviation *= mean
+        return binary(rows > deviation)
+
+    return edges.run_bands(gray, band, size // 2, workers)
@@ -0,0 +1,198 @@
+"""Caches keyed by image identity, by file identity or by computation"""
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from history import image_nbytes
+
+
+class IdentityCache:
+    """Small LRU of values derived from images, keyed by image identity.
+
+    History snapshots are never modified in place, so the identity of an
+    image is a valid key for anything computed from it. Entries are
+    dropped as soon as their image is freed, so ids are never confused
+    after reuse. The factory runs outside the lock, so a slow computation
+    on a worker thread never blocks lookups from the Tk thread.
+    """
+
+    def __init__(self, factory, max_entries=4):
+        self.factory = factory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def lookup(self, image):
+        """Cached value for image, or None"""
+        key = id(image)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is image:
+                self._entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def get(self, image):
+        """Cached value for image, computing it on a miss"""
+        value = self.lookup(image)
+        if value is not None:
+            return value
+        value = self.factory(image)
+        key = id(image)
+        ref = weakref.ref(image, lambda _, key=key: self._forget(key))
+        with self._lock:
+            self._entries[key] = (ref, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is None:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DecodedCache:
+    """LRU of decoded images keyed by file identity, bounded by a byte budget.
+
+    Keys are (absolute path, mtime, size), so a file that changes on disk
+    is decoded afresh. Concurrent requests for the same file (a prefetch
+    and the user opening it) share a single decode.
+    """
+
+    def __init__(self, loader, max_bytes=512 * 1024 ** 2):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def lookup(self, path):
+        """Cached image for path, or None (also when the file is gone)"""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get(self, path):
+        """Decoded image for path, decoding (or waiting for a decode) on a miss"""
+        key = self.key(path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    break
+            # Another thread is decoding this file; use its result (or retry if it failed)
+            event.wait()
+
+        try:
+            image = self.loader(path)
+            self._store(key, image)
+            return image
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+    def put(self, path, image):
+        """Cache an image decoded elsewhere"""
+        self._store(self.key(path), image)
+
+    def _store(self, key, image):
+        nbytes = image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # An older version of the same file can never be asked for again
+            for old in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self.nbytes -= self._entries.pop(old)[1]
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (image, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def pixel_hash(image):
+    """Digest of an image's mode, size and pixels (for keys that outlive the image)"""
+    digest = hashlib.blake2b(f"{image.mode} {image.width}x{image.height}".encode(), digest_size=16)
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU of computed images under arbitrary hashable keys, bounded by a byte budget.
+
+    Keys describe how a result was made, e.g. (state of the input,
+    operation, arguments), where the state is itself such a key or a
+    pixel_hash, so equal work is recognised even for a rebuilt input.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Cached image for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, image):
+        nbytes = image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (image, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,158 @@
+"""Histogram equalisation: global, and contrast-limited adaptive (CLAHE).
+
+Inputs are 2-D arrays of integer levels, uint8 (256 levels) or uint16
+(65,536 levels); results have the same type. Global equalisation maps
+every level through the image's normalised cumulative histogram.
+
+CLAHE cuts the image into a grid of tiles and equalises each through its
+own clipped histogram. Histograms of a whole row of tiles come from one
+bincount over (tile column, bin) keys. Counts above clip_limit times the
+mean bin height are cut off and spread evenly over all bins, which bounds
+how much any tile's mapping can stretch noise, and the cumulative sums
+become per-tile look-up tables. Each output pixel blends the tables of
+the four tiles whose centres surround it, bilinearly. The blend is done
+in two steps: for every row, the tables of the tile rows above and below
+are mixed into one table per tile column, and each pixel then reads two
+entries of it and mixes those by its horizontal weight. Rows run in
+chunks on a thread pool, so no per-pixel Python loop remains.
+
+16-bit tiles hold far fewer pixels than there are levels, so CLAHE bins
+them by their top 8 bits; a level's table value is interpolated within
+its bin, so the mapping stays smooth across all 65,536 levels.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import edges
+
+CLAHE_CLIP = 2.0
+CLAHE_TILES = 8
+# Histogram bins per tile; 16-bit levels share a bin with their 255 neighbours
+CLAHE_BINS = 256
+# Rows blended at a time, bounding the temporary index and value arrays
+CHUNK_ROWS = 256
+
+
+def equalize_lut(hist):
+    """Table mapping each level through the normalised cumulative histogram.
+
+    The darkest level present maps to 0 and the brightest to the top level.
+    """
+    levels = len(hist)
+    cdf = np.cumsum(hist, dtype=np.float64)
+    first = cdf[np.flatnonzero(hist)[0]] if cdf[-1] else 0.0
+    span = cdf[-1] - first
+    if span <= 0:
+        # A single level: nothing to stretch
+        return np.arange(levels, dtype=np.uint8 if levels == 256 else np.uint16)
+    values = np.clip((cdf - first) / span, 0, 1) * (levels - 1)
+    return np.rint(values).astype(np.uint8 if levels == 256 else np.uint16)
+
+
+def equalize(array):
+    """Global histogram equalisation of a uint8 or uint16 array"""
+    levels = 256 if array.dtype == np.uint8 else 65536
+    return equalize_lut(np.bincount(array.ravel(), minlength=levels))[array]
+
+
+def _tile_bounds(length, tiles):
+    """Start of each of tiles near-equal spans of length, plus the end"""
+    return np.arange(tiles + 1) * length // tiles
+
+
+def _neighbours(length, bounds):
+    """Per position: lower and upper tile (by centre) and the weight of the upper one"""
+    centres = (bounds[:-1] + bounds[1:] - 1) / 2
+    position = np.arange(length)
+    lower = np.clip(np.searchsorted(centres, position, side='right') - 1, 0, len(centres) - 1)
+    upper = np.minimum(lower + 1, len(centres) - 1)
+    gap = centres[upper] - centres[lower]
+    weight = np.where(gap > 0, (position - centres[lower]) / np.where(gap > 0, gap, 1), 0)
+    return lower, upper, np.clip(weight, 0, 1).astype(np.float32)
+
+
+def tile_histograms(bins, ys, xs, nbins):
+    """(tile rows, tile columns, nbins) histograms of a 2-D array of bin indices"""
+    columns = np.repeat(np.arange(len(xs) - 1, dtype=np.int32) * nbins, np.diff(xs))
+    hists = np.empty((len(ys) - 1, len(xs) - 1, nbins), dtype=np.float64)
+    for ty in range(len(ys) - 1):
+        keys = columns + bins[ys[ty]:ys[ty + 1]]
+        hists[ty] = np.bincount(keys.ravel(), minlength=(len(xs) - 1) * nbins).reshape(-1, nbins)
+    return hists
+
+
+def clip_histograms(hists, clip_limit):
+    """Clip every histogram at clip_limit times its mean bin and spread the excess evenly"""
+    if clip_limit <= 0:
+        return hists
+    nbins = hists.shape[-1]
+    limit = np.maximum(hists.sum(axis=-1, keepdims=True) * clip_limit / nbins, 1.0)
+    excess = np.maximum(hists - limit, 0).sum(axis=-1, keepdims=True)
+    return np.minimum(hists, limit) + excess / nbins
+
+
+def clahe(array, clip_limit=CLAHE_CLIP, tiles=CLAHE_TILES, workers=None):
+    """Contrast-limited adaptive histogram equalisation of a uint8 or uint16 array"""
+    height, width = array.shape
+    levels = 256 if array.dtype == np.uint8 else 65536
+    shift = int(math.log2(levels // CLAHE_BINS))
+    ys = _tile_bounds(height, max(1, min(int(tiles), height)))
+    xs = _tile_bounds(width, max(1, min(int(tiles), width)))
+    nx = len(xs) - 1
+    bins = array >> shift if shift else array
+
+    hists = clip_histograms(tile_histograms(bins, ys, xs, CLAHE_BINS), clip_limit)
+    scale = (levels - 1) / hists.sum(axis=-1, keepdims=True)
+    # Output below each bin and each bin's own height, on the output scale
+    below = ((np.cumsum(hists, axis=-1) - hists) * scale).astype(np.float32)
+    heights = (hists * scale).astype(np.float32)
+    if not shift:
+        # One level per bin: the table is the inclusive cumulative sum
+        below += heights
+    # Blends of the tables stay within the level range, so adding a half
+    # here turns the truncating store into rounding
+    below += np.float32(0.5)
+
+    row_lower, row_upper, row_weight = _neighbours(height, ys)
+    col_lower, col_upper, col_weight = _neighbours(width, xs)
+    col_lower = (col_lower * CLAHE_BINS).astype(np.int32)
+    col_step = (col_upper * CLAHE_BINS).astype(np.int32) - col_lower
+    out = np.empty_like(array)
+
+    def blend(tables, y0, y1, index):
+        # Mix the tile rows above and below into one table per tile column, per row
+        w = row_weight[y0:y1, None, None]
+        rows = tables[row_lower[y0:y1]] * (1 - w) + tables[row_upper[y0:y1]] * w
+        flat = rows.reshape(-1)
+        left = flat[index]
+        right = flat[index + col_step]
+        right -= left
+        right *= col_weight
+        left += right
+        return left
+
+    def process(y0):
+        y1 = min(y0 + CHUNK_ROWS, height)
+        chunk = bins[y0:y1]
+        index = (np.arange(y1 - y0, dtype=np.int32) * (nx * CLAHE_BINS))[:, None] + col_lower
+        index += chunk
+        values = blend(below, y0, y1, index)
+        if shift:
+            # Position of each level within its bin, counting the level itself
+            fraction = (array[y0:y1] & ((1 << shift) - 1)).astype(np.float32)
+            fraction += 1
+            fraction *= np.float32(1 / (1 << shift))
+            values += blend(heights, y0, y1, index) * fraction
+        out[y0:y1] = values
+
+    workers = workers or edges.default_workers()
+    starts = range(0, height, CHUNK_ROWS)
+    if workers == 1:
+        for y0 in starts:
+            process(y0)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(process, starts))
+    return out
@@ -0,0 +1,242 @@
+"""Sobel, Prewitt and Canny edge detectors.
+
+Everything is built from separable NumPy convolutions on float32 data and
+runs over horizontal bands on a thread pool; NumPy releases the GIL inside
+its array loops, so bands genuinely execute in parallel. Each band is
+read with enough halo rows that the stitched result is identical to
+processing the whole image at once.
+"""
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+# Derivative and smoothing halves of the separable 3x3 kernels
+DERIVATIVE = np.array([-1.0, 0.0, 1.0], dtype=np.float32)
+SMOOTHING = {
+    'sobel': np.array([1.0, 2.0, 1.0], dtype=np.float32),
+    'prewitt': np.array([1.0, 1.0, 1.0], dtype=np.float32),
+}
+
+# Default Gaussian smoothing ahead of Canny's gradients, and hysteresis
+# thresholds on the normalised gradient scale
+CANNY_SIGMA = 1.4
+CANNY_LOW = 20.0
+CANNY_HIGH = 50.0
+
+MIN_BAND_ROWS = 64
+
+_local = threading.local()
+
+
+def gaussian_kernel(sigma):
+    """Normalised 1-D Gaussian with radius ceil(3 * sigma)"""
+    radius = max(1, int(math.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernel = np.exp(-(x * x) / (2 * sigma * sigma))
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def convolve_rows(array, kernel):
+    """Correlate each row with a 1-D kernel, replicating edge pixels"""
+    radius = len(kernel) // 2
+    padded = np.pad(array, ((0, 0), (radius, radius)), mode='edge')
+    width = array.shape[1]
+    out = kernel[0] * padded[:, 0:width]
+    for i in range(1, len(kernel)):
+        out += kernel[i] * padded[:, i:i + width]
+    return out
+
+
+def convolve_columns(array, kernel):
+    """Correlate each column with a 1-D kernel, replicating edge pixels"""
+    radius = len(kernel) // 2
+    padded = np.pad(array, ((radius, radius), (0, 0)), mode='edge')
+    height = array.shape[0]
+    out = kernel[0] * padded[0:height]
+    for i in range(1, len(kernel)):
+        out += kernel[i] * padded[i:i + height]
+    return out
+
+
+def gradients(gray, method='sobel'):
+    """Gradient images (gx, gy), normalised so a full 0-255 step gives 255"""
+    smooth = SMOOTHING[method]
+    scale = np.float32(1.0 / smooth.sum())
+    gx = convolve_columns(convolve_rows(gray, DERIVATIVE), smooth)
+    gy = convolve_columns(convolve_rows(gray, smooth), DERIVATIVE)
+    gx *= scale
+    gy *= scale
+    return gx, gy
+
+
+def non_maximum_suppression(magnitude, gx, gy):
+    """Keep pixels that are maximal along their quantised gradient direction"""
+    angle = np.rad2deg(np.arctan2(gy, gx)) % 180.0
+    padded = np.pad(magnitude, 1, mode='constant')
+    h, w = magnitude.shape
+
+    def shifted(dy, dx):
+        return padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+
+    horizontal = (angle < 22.5) | (angle >= 157.5)
+    diagonal_down = (angle >= 22.5) & (angle < 67.5)
+    vertical = (angle >= 67.5) & (angle < 112.5)
+    diagonal_up = (angle >= 112.5) & (angle < 157.5)
+
+    keep = np.zeros(magnitude.shape, dtype=bool)
+    for mask, (dy, dx) in ((horizontal, (0, 1)), (diagonal_down, (1, 1)),
+                           (vertical, (1, 0)), (diagonal_up, (1, -1))):
+        keep |= mask & (magnitude >= shifted(dy, dx)) & (magnitude >= shifted(-dy, -dx))
+    return np.where(keep, magnitude, np.float32(0))
+
+
+def connected_components(mask):
+    """Label 8-connected components of a boolean mask.
+
+    Works on the set pixels only, so memory scales with their number rather
+    than the image size: neighbouring pairs are found by looking up each
+    pixel's flat-index offsets in the sorted pixel list, they become graph
+    edges, and labels are merged with vectorised hook-and-compress rounds
+    (pointer jumping), which converges in a logarithmic number of passes.
+    Returns (flat pixel indices, component root per pixel).
+    """
+    h, w = mask.shape
+    pixels = np.flatnonzero(mask)
+    n = len(pixels)
+    if n == 0:
+        return pixels, np.zeros(0, dtype=np.int64)
+    rows, cols = np.divmod(pixels, w)
+
+    sources, targets = [], []
+    for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        inside = (rows + dy < h) & (cols + dx >= 0) & (cols + dx < w)
+        u = np.flatnonzero(inside)
+        neighbours = pixels[u] + (dy * w + dx)
+        v = np.searchsorted(pixels, neighbours)
+        linked = pixels[np.minimum(v, n - 1)] == neighbours
+        sources.append(u[linked])
+        targets.append(v[linked])
+    del rows, cols
+    u = np.concatenate(sources)
+    v = np.concatenate(targets)
+
+    parent = np.arange(n)
+    while True:
+        pu, pv = parent[u], parent[v]
+        differ = pu != pv
+        if not differ.any():
+            break
+        low = np.minimum(pu[differ], pv[differ])
+        high = np.maximum(pu[differ], pv[differ])
+        np.minimum.at(parent, high, low)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return pixels, parent
+
+
+def hysteresis(magnitude, low, high):
+    """Keep weak edges only when connected to a strong edge"""
+    weak = magnitude >= low
+    pixels, roots = connected_components(weak)
+    strong_roots = np.zeros(len(pixels), dtype=bool)
+    strong_roots[roots[magnitude.ravel()[pixels] >= high]] = True
+    edges = np.zeros(magnitude.size, dtype=bool)
+    edges[pixels[strong_roots[roots]]] = True
+    return edges.reshape(magnitude.shape)
+
+
+@contextmanager
+def serial():
+    """Run banded work on the calling thread only (its caller already splits the image)"""
+    previous = getattr(_local, 'serial', False)
+    _local.serial = True
+    try:
+        yield
+    finally:
+        _local.serial = previous
+
+
+def default_workers():
+    return 1 if getattr(_local, 'serial', False) else os.cpu_count() or 1
+
+
+def band_rows(height, workers):
+    """(start, stop) row ranges splitting height into up to workers bands"""
+    rows = max(MIN_BAND_ROWS, math.ceil(height / max(1, workers)))
+    return [(y, min(y + rows, height)) for y in range(0, height, rows)]
+
+
+def run_bands(gray, func, halo, workers=None):
+    """Apply func over horizontal bands on a thread pool and stitch the results.
+
+    func must map an array to one of the same height. Each band is given
+    `halo` extra rows on either side, which are cropped off afterwards, so
+    as long as func reads no further than `halo` rows the output equals
+    func(gray).
+    """
+    height = gray.shape[0]
+    workers = workers or default_workers()
+    bands = band_rows(height, workers)
+
+    def process(rows):
+        y0, y1 = rows
+        top, bottom = max(0, y0 - halo), min(height, y1 + halo)
+        return func(gray[top:bottom])[y0 - top:y1 - top]
+
+    if len(bands) == 1 or workers == 1:
+        parts = [process(rows) for rows in bands]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(process, bands))
+    return np.concatenate(parts, axis=0)
+
+
+def gradient_magnitude(gray, method='sobel', workers=None):
+    """Banded Sobel or Prewitt gradient magnitude of a 2-D float32 array"""
+    def band(rows):
+        return np.hypot(*gradients(rows, method))
+    return run_bands(gray, band, 1, workers)
+
+
+def magnitude_direction(gray, method='sobel', workers=None):
+    """Banded gradient magnitude and direction (radians, arctan2(gy, gx)) of a 2-D float32 array"""
+    def band(rows):
+        gx, gy = gradients(rows, method)
+        return np.stack((np.hypot(gx, gy), np.arctan2(gy, gx)), axis=-1)
+    both = run_bands(gray, band, 1, workers)
+    return both[..., 0], both[..., 1]
+
+
+def canny(gray, sigma=CANNY_SIGMA, low=CANNY_LOW, high=CANNY_HIGH, workers=None):
+    """Canny edge map (boolean) of a 2-D float32 array.
+
+    Gaussian smoothing, Sobel gradients and non-maximum suppression run
+    per band; hysteresis is global because edges cross band boundaries.
+    Thresholds are on the normalised gradient scale (0-255 for a full step).
+    """
+    kernel = gaussian_kernel(sigma)
+
+    def band(rows):
+        smoothed = convolve_columns(convolve_rows(rows, kernel), kernel)
+        gx, gy = gradients(smoothed, 'sobel')
+        return non_maximum_suppression(np.hypot(gx, gy), gx, gy)
+
+    suppressed = run_bands(gray, band, len(kernel) // 2 + 2, workers)
+    return hysteresis(suppressed, low, high)
+
+
+def detect(image_array, method='sobel', workers=None, sigma=CANNY_SIGMA, low=CANNY_LOW,
+           high=CANNY_HIGH):
+    """Edge image (uint8, 0-255) for a grayscale array on the 0-255 scale"""
+    gray = image_array.astype(np.float32)
+    if method == 'canny':
+        return canny(gray, sigma, low, high, workers=workers).astype(np.uint8) * 255
+    magnitude = gradient_magnitude(gray, method, workers)
+    return np.clip(magnitude, 0, 255).astype(np.uint8)
@@ -0,0 +1,126 @@
+"""Export with tunable encoders, off the Tk thread.
+
+A target names a file, an optional bounding size and encoder options.
+Several targets are encoded in parallel on a thread pool: Pillow releases
+the GIL while compressing PNG, JPEG and WebP data, so each encode gets a
+core of its own. Every export returns a report of file size and time.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+import operations
+import profiling
+from scheduler import report_progress
+
+# Options each format accepts, with the defaults used when none are given
+ENCODER_OPTIONS = {
+    'PNG': {'compress_level': 6, 'optimize': False},
+    'JPEG': {'quality': 90, 'subsampling': '4:2:0', 'progressive': False, 'optimize': False},
+    'WEBP': {'quality': 90, 'lossless': False, 'method': 4},
+    'TIFF': {'compression': 'tiff_lzw'},
+}
+
+JPEG_SUBSAMPLING = ('4:4:4', '4:2:2', '4:2:0')
+# Inclusive range of the quality option per format
+QUALITY_RANGE = {'JPEG': (1, 100), 'WEBP': (0, 100)}
+TIFF_COMPRESSION = ('raw', 'tiff_lzw', 'tiff_adobe_deflate', 'packbits')
+
+# One-click set: (file name suffix, format, bounding size, encoder options)
+WEB_SET = [
+    ('', 'PNG', None, {}),
+    ('_web', 'JPEG', (2048, 2048), {'quality': 85, 'progressive': True, 'optimize': True}),
+    ('_thumb', 'JPEG', (256, 256), {'quality': 80}),
+]
+
+EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp', 'TIFF': '.tif'}
+
+
+def format_for(path):
+    """PIL format name for a file name's extension"""
+    fmt = Image.registered_extensions().get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown image file extension in '{os.path.basename(path)}'")
+    return fmt
+
+
+def encoder_options(fmt, **overrides):
+    """Default options for fmt with overrides applied (unknown options are rejected)"""
+    options = dict(ENCODER_OPTIONS.get(fmt, {}))
+    unknown = set(overrides) - set(options)
+    if unknown:
+        raise ValueError(f"{fmt} has no encoder option(s) {', '.join(sorted(unknown))}")
+    options.update(overrides)
+    if fmt in QUALITY_RANGE:
+        low, high = QUALITY_RANGE[fmt]
+        if not low <= options['quality'] <= high:
+            raise ValueError(f"{fmt} quality must be between {low} and {high}, not {options['quality']}")
+    return options
+
+
+class Target:
+    """One file to write: path, format, optional bounding size and encoder options"""
+
+    def __init__(self, path, fmt=None, size=None, **options):
+        self.path = path
+        self.format = fmt or format_for(path)
+        self.size = size
+        self.options = encoder_options(self.format, **options)
+
+
+def set_targets(path, options=None):
+    """Targets of WEB_SET next to path; options maps format -> base encoder options"""
+    stem = os.path.splitext(path)[0]
+    targets = []
+    for suffix, fmt, size, preset in WEB_SET:
+        merged = dict((options or {}).get(fmt, {}), **preset)
+        targets.append(Target(stem + suffix + EXTENSIONS[fmt], fmt, size, **merged))
+    return targets
+
+
+def encode(image, target):
+    """Write image for one target; returns its report"""
+    start = time.perf_counter()
+    with profiling.span('export', 'save', image=image, format=target.format,
+                        path=os.path.basename(target.path)) as span:
+        if target.size is not None and (image.width > target.size[0] or image.height > target.size[1]):
+            image = operations.fit(image, target.size)
+        prepared = operations.export_image(image, target.format)
+        if prepared is image:
+            # Image.save keeps per-call encoder state on the image object itself
+            prepared = image.copy()
+        prepared.save(target.path, format=target.format, **target.options)
+        span.output(prepared)
+    return {
+        'path': target.path,
+        'format': target.format,
+        'size': prepared.size,
+        'options': target.options,
+        'bytes': os.path.getsize(target.path),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def export_all(image, targets, workers=None):
+    """Encode image for every target in parallel; reports come back in target order"""
+    workers = workers or min(len(targets), os.cpu_count() or 1)
+    reports = [None] * len(targets)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(encode, image, target): i for i, target in enumerate(targets)}
+        for done, future in enumerate(as_completed(futures), 1):
+            report = reports[futures[future]] = future.result()
+            report_progress(done / len(targets), os.path.basename(report['path']))
+    return reports
+
+
+def format_report(reports):
+    """Size and time per exported file, as a fixed-width table"""
+    lines = [f"{'file':<24} {'size':>11} {'KB':>9} {'seconds':>8} {'MP/s':>7}"]
+    for r in reports:
+        width, height = r['size']
+        name = os.path.basename(r['path'])
+        lines.append(f"{name[-24:]:<24} {f'{width}x{height}':>11} {r['bytes'] / 1024:>9.1f} "
+                     f"{r['seconds']:>8.3f} {width * height / 1e6 / r['seconds']:>7.1f}")
+    return "\n".join(lines)
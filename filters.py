@@ -0,0 +1,254 @@
+"""Smoothing filters whose cost per pixel does not depend on the kernel size.
+
+Box filters are running sums: a cumulative sum along each axis followed by
+a difference, in exact integer arithmetic for integer images. The Gaussian
+is three box passes whose combined variance matches the requested kernel,
+or a short separable kernel when that is cheaper. The median counts, for
+every grey level, how many pixels of each window lie at or below it; each
+count is a box sum, so the cost grows with the number of levels (256 for
+8-bit data) but never with the window size. Unsharp masking adds back a
+multiple of the detail the Gaussian removes.
+
+All filters take a kernel size (odd, in pixels), replicate edge pixels and
+run over horizontal bands on a thread pool via edges.run_bands. A kernel
+of size k never reads more than k // 2 pixels from the output pixel.
+"""
+import math
+
+import numpy as np
+
+import edges
+
+# Kernel sizes up to this use a direct separable Gaussian; larger ones use box passes
+GAUSSIAN_TAPS_MAX = 9
+GAUSSIAN_PASSES = 3
+
+
+def kernel_size(size):
+    """Validated kernel size: a positive odd integer"""
+    size = int(size)
+    if size < 1 or size % 2 == 0:
+        raise ValueError(f"Kernel size must be a positive odd number, got {size}")
+    return size
+
+
+def gaussian_sigma(size):
+    """Standard deviation used for a Gaussian kernel of the given size.
+
+    Same rule as OpenCV's getGaussianKernel, so a kernel typed here matches
+    the one other tools would use.
+    """
+    return 0.3 * ((size - 1) * 0.5 - 1) + 0.8
+
+
+def gaussian_boxes(sigma, passes=GAUSSIAN_PASSES):
+    """Odd box widths whose repeated application approximates a Gaussian of sigma"""
+    ideal = math.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    lower = max(1, lower)
+    upper = lower + 2
+    m = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+              / (-4 * lower - 4))
+    return [lower if i < m else upper for i in range(passes)]
+
+
+def accumulator(dtype, bound=None):
+    """Type for running sums of dtype data whose window totals stay below bound.
+
+    Running sums may wrap around in uint32: a window difference is still
+    exact as long as the window total fits, and the narrower type halves
+    the memory traffic of every pass.
+    """
+    if np.issubdtype(dtype, np.floating):
+        return np.float64
+    if bound is not None and bound < 2 ** 32:
+        return np.uint32
+    return np.int64
+
+
+def _integer_total(dtype, count):
+    """Largest total of count values of dtype plus rounding room (None for floats)"""
+    if np.issubdtype(dtype, np.floating):
+        return None
+    return int(np.iinfo(dtype).max) * count + count
+
+
+def _box_sum_axis(array, size, axis, dtype):
+    """Sum over a window of size along one axis (running sum, edges replicated)"""
+    radius = size // 2
+    pad = [(0, 0)] * array.ndim
+    pad[axis] = (radius + 1, radius)
+    padded = np.pad(array, pad, mode='edge')
+    sums = np.cumsum(padded, axis=axis, dtype=dtype)
+    length = array.shape[axis]
+
+    def window(start):
+        index = [slice(None)] * array.ndim
+        index[axis] = slice(start, start + length)
+        return sums[tuple(index)]
+
+    return window(size) - window(0)
+
+
+def box_sum(array, size, dtype=None):
+    """Sum over every size x size window (rows and columns; trailing axes are channels)"""
+    dtype = dtype or accumulator(array.dtype)
+    if size == 1:
+        return array.astype(dtype)
+    return _box_sum_axis(_box_sum_axis(array, size, 1, dtype), size, 0, dtype)
+
+
+def _divide(sums, divisor, dtype):
+    """sums / divisor as dtype, rounding half up for integer results"""
+    if np.issubdtype(dtype, np.floating):
+        return (sums / divisor).astype(dtype)
+    sums += divisor // 2
+    sums //= divisor
+    return sums.astype(dtype)
+
+
+def box(array, size, workers=None):
+    """Exact box mean over a size x size window"""
+    size = kernel_size(size)
+    dtype = accumulator(array.dtype, _integer_total(array.dtype, size * size))
+
+    def band(rows):
+        return _divide(box_sum(rows, size, dtype), size * size, array.dtype)
+
+    return edges.run_bands(array, band, size // 2, workers)
+
+
+def _separable_gaussian(rows, size, sigma):
+    """Direct separable Gaussian with exactly size taps (2-D float32 array)"""
+    radius = size // 2
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-(x * x) / (2 * sigma * sigma))
+    kernel = (kernel / kernel.sum()).astype(np.float32)
+    return edges.convolve_columns(edges.convolve_rows(rows, kernel), kernel)
+
+
+def gaussian(array, size, workers=None):
+    """Gaussian smoothing with the sigma of a size x size kernel.
+
+    Small kernels are applied directly; larger ones as three box passes,
+    summed exactly and divided once at the end, so the support never
+    exceeds the kernel and the cost per pixel is constant.
+    """
+    size = kernel_size(size)
+    sigma = gaussian_sigma(size)
+    if size == 1:
+        return array.copy()
+
+    if size <= GAUSSIAN_TAPS_MAX:
+        def band(rows):
+            planes = rows[..., None] if rows.ndim == 2 else rows
+            out = np.empty(planes.shape, dtype=np.float32)
+            for c in range(planes.shape[2]):
+                out[..., c] = _separable_gaussian(planes[..., c].astype(np.float32), size, sigma)
+            out = out.reshape(rows.shape)
+            if np.issubdtype(array.dtype, np.floating):
+                return out.astype(array.dtype)
+            info = np.iinfo(array.dtype)
+            np.clip(out, info.min, info.max, out=out)
+            return np.rint(out, out=out).astype(array.dtype)
+        return edges.run_bands(array, band, size // 2, workers)
+
+    widths = [min(w, size) for w in gaussian_boxes(sigma)]
+    divisor = math.prod(w * w for w in widths)
+    dtype = accumulator(array.dtype, _integer_total(array.dtype, divisor))
+
+    def band(rows):
+        sums = rows
+        for width in widths:
+            sums = box_sum(sums, width, dtype)
+        return _divide(sums, divisor, array.dtype)
+
+    return edges.run_bands(array, band, sum(w // 2 for w in widths), workers)
+
+
+def _median_levels(plane, size):
+    """Median of a 2-D uint8 plane by per-level window counts.
+
+    The window count of pixels at or below a level is a box sum of a mask.
+    Several levels share each running sum: their masks are packed into
+    the lanes of a uint64, each lane just wide enough for a window count
+    (8, 16 or 32 bits). Sums wrap around, but a window difference never
+    exceeds its lane, so every lane comes out exact.
+    """
+    rank = (size * size + 1) // 2
+    radius = size // 2
+    bits = next(b for b in (8, 16, 32) if size * size < 1 << b)
+    lanes = 64 // bits
+    lane_mask = np.uint64((1 << bits) - 1)
+    padded = np.pad(plane, radius, mode='edge')
+    height, width = plane.shape
+
+    # The median is always a level present in the plane; the top one needs no test
+    levels = np.flatnonzero(np.bincount(plane.ravel(), minlength=256))
+    values = np.arange(256)
+
+    row_sums = np.zeros((padded.shape[0], padded.shape[1] + 1), dtype=np.uint64)
+    windows = np.empty((padded.shape[0], width), dtype=np.uint64)
+    column_sums = np.zeros((padded.shape[0] + 1, width), dtype=np.uint64)
+    counts = np.empty((height, width), dtype=np.uint64)
+    lane = np.empty((height, width), dtype=np.uint64)
+    below = np.zeros((height, width), dtype=bool)
+    index = np.zeros((height, width), dtype=np.uint8)
+
+    for start in range(0, len(levels) - 1, lanes):
+        group = levels[start:min(start + lanes, len(levels) - 1)]
+        table = np.zeros(256, dtype=np.uint64)
+        for i, level in enumerate(group):
+            table |= (values <= level).astype(np.uint64) << np.uint64(bits * i)
+        packed = table[padded]
+        np.cumsum(packed, axis=1, out=row_sums[:, 1:])
+        np.subtract(row_sums[:, size:], row_sums[:, :-size], out=windows)
+        np.cumsum(windows, axis=0, out=column_sums[1:])
+        np.subtract(column_sums[size:], column_sums[:-size], out=counts)
+        for i in range(len(group)):
+            np.right_shift(counts, np.uint64(bits * i), out=lane)
+            lane &= lane_mask
+            np.less(lane, rank, out=below)
+            # Windows still short of the median lie above this level
+            index += below
+        if not below.any():
+            break
+    return levels.astype(np.uint8)[index]
+
+
+def median(array, size, workers=None):
+    """Exact median over a size x size window of uint8 data"""
+    size = kernel_size(size)
+    if array.dtype != np.uint8:
+        raise ValueError("median() works on 8-bit data")
+    if size == 1:
+        return array.copy()
+
+    def band(rows):
+        if rows.ndim == 2:
+            return _median_levels(rows, size)
+        return np.stack([_median_levels(rows[..., c], size) for c in range(rows.shape[2])],
+                        axis=-1)
+
+    return edges.run_bands(array, band, size // 2, workers)
+
+
+def unsharp(array, size, amount, workers=None):
+    """Unsharp mask: array + amount * (array - gaussian), clipped for integer data"""
+    size = kernel_size(size)
+
+    def band(rows):
+        blurred = gaussian(rows, size, workers=1)
+        out = rows.astype(np.float32)
+        detail = out - blurred
+        detail *= np.float32(amount)
+        out += detail
+        if np.issubdtype(array.dtype, np.floating):
+            return out.astype(array.dtype)
+        info = np.iinfo(array.dtype)
+        np.clip(out, info.min, info.max, out=out)
+        return np.rint(out, out=out).astype(array.dtype)
+
+    return edges.run_bands(array, band, size // 2, workers)
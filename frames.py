@@ -0,0 +1,220 @@
+"""Streaming of multi-frame images: animated GIFs, multi-page TIFFs and sequences.
+
+Frames are decoded one at a time by a generator, run through an
+operation chain and written to the output as soon as they are done, so
+memory holds only the frames in flight however long the sequence is.
+With several workers, frames are processed on a process pool through a
+bounded window and still written in their original order.
+
+Outputs are streamed too: pages are appended to a TIFF one by one, GIF
+frames are encoded one by one (each with its own palette, durations
+kept), and a directory receives one numbered file per frame.
+
+    python main.py frames --op gamma=2.2 scan.tif scan_out.tif
+    python main.py frames --op edges=sobel -j 4 clip.gif clip_out.gif
+    python main.py frames --op negative --format png shots/ shots_out/
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import GifImagePlugin, Image, TiffImagePlugin
+
+import export
+import operations
+from batch import find_images
+
+
+def frame_count(path):
+    """Number of frames in a file, or of image files in a directory"""
+    if os.path.isdir(path):
+        return len(find_images(path))
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+def iter_frames(path):
+    """Yield ``(frame, info)`` lazily; info holds the frame's duration in ms, if any"""
+    if os.path.isdir(path):
+        for name in find_images(path):
+            yield operations.open_image(name), {}
+        return
+    with Image.open(path) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            img.seek(index)
+            img.load()
+            frame = operations.normalize_mode(img)
+            if frame is img:
+                # The next seek reuses img's pixel buffer
+                frame = img.copy()
+            info = {}
+            if img.info.get('duration'):
+                info['duration'] = img.info['duration']
+            yield frame, info
+
+
+def process_frames(frames, chain, workers=1):
+    """Yield ``(result, info)`` for each frame, in order.
+
+    With several workers, at most 2 * workers frames are in flight.
+    """
+    if workers <= 1:
+        for frame, info in frames:
+            yield operations.apply_chain(frame, chain), info
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for frame, info in frames:
+            pending.append((executor.submit(operations.apply_chain, frame, chain), info))
+            if len(pending) >= 2 * workers:
+                future, info = pending.popleft()
+                yield future.result(), info
+        while pending:
+            future, info = pending.popleft()
+            yield future.result(), info
+
+
+class TiffWriter:
+    """Appends pages to a multi-page TIFF as they arrive"""
+
+    def __init__(self, path, **options):
+        self.options = export.encoder_options('TIFF', **options)
+        self._tiff = TiffImagePlugin.AppendingTiffWriter(path, new=True)
+
+    def write(self, frame, info):
+        page = operations.export_image(frame, 'TIFF')
+        if page is frame:
+            # Image.save keeps per-call encoder state on the image object itself
+            page = frame.copy()
+        page.save(self._tiff, format='TIFF', **self.options)
+        self._tiff.newFrame()
+
+    def close(self):
+        self._tiff.close()
+
+
+class GifWriter:
+    """Encodes an animated GIF frame by frame, each frame with its own palette"""
+
+    def __init__(self, path, loop=0):
+        self.loop = loop
+        self._fp = open(path, 'wb')
+        self._started = False
+
+    def write(self, frame, info):
+        paletted = operations.to_8bit(frame).convert('RGB').quantize()
+        if not self._started:
+            header, _ = GifImagePlugin.getheader(paletted, info={'loop': self.loop})
+            self._fp.write(b''.join(header))
+            self._started = True
+        params = {'include_color_table': True}
+        if info.get('duration'):
+            params['duration'] = info['duration']
+        for chunk in GifImagePlugin.getdata(paletted, **params):
+            self._fp.write(chunk)
+
+    def close(self):
+        if self._started:
+            self._fp.write(b';')
+        self._fp.close()
+
+
+class SequenceWriter:
+    """Writes each frame as a numbered file in a directory"""
+
+    def __init__(self, path, fmt='png'):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.extension = '.' + fmt.lower().lstrip('.')
+        self.count = 0
+
+    def write(self, frame, info):
+        operations.save_image(frame, os.path.join(self.path, f"frame_{self.count:05d}{self.extension}"))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+def open_writer(path, fmt=None):
+    """Streaming writer for a .tif/.tiff or .gif file, or a directory"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.tif', '.tiff'):
+        return TiffWriter(path)
+    if extension == '.gif':
+        return GifWriter(path)
+    if os.path.isdir(path) or not extension:
+        return SequenceWriter(path, fmt or 'png')
+    raise ValueError(f"Cannot stream frames to '{os.path.basename(path)}'; "
+                     "use a .tif or .gif file or a directory")
+
+
+def stream(source, output, chain, workers=1, fmt=None, progress=None):
+    """Run chain over every frame of source, writing each to output as it is done"""
+    if os.path.abspath(source) == os.path.abspath(output):
+        raise ValueError("Output must differ from input")
+    total = frame_count(source)
+    start = time.perf_counter()
+    writer = open_writer(output, fmt)
+    done = 0
+    size = None
+    try:
+        for result, info in process_frames(iter_frames(source), chain, workers):
+            writer.write(result, info)
+            done += 1
+            size = size or result.size
+            if progress:
+                progress(done, total, time.perf_counter() - start)
+    finally:
+        writer.close()
+    return {'frames': done, 'size': size, 'seconds': time.perf_counter() - start}
+
+
+def print_progress(done, total, elapsed):
+    """Single-line progress report on stderr"""
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(f"\r{done}/{total} frames  {rate:.1f} frames/s")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py frames",
+        description="Apply an operation chain to every frame of a GIF, multi-page TIFF "
+                    "or directory of images, streaming frames to the output.")
+    parser.add_argument("input", help="multi-frame file, or a directory of frames")
+    parser.add_argument("output", help=".tif or .gif file, or a directory")
+    parser.add_argument("--op", action="append", default=[], metavar="NAME[=VALUE]",
+                        help="operation to apply, in order; repeatable "
+                             f"({', '.join(operations.OPERATIONS)})")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="worker processes (default: 1)")
+    parser.add_argument("--format", default=None,
+                        help="file extension when the output is a directory (default: png)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    return parser
+
+
+def main(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        chain = [operations.parse_op(spec) for spec in args.op]
+    except ValueError as e:
+        parser.error(str(e))
+    if not chain:
+        parser.error("at least one --op is required")
+
+    try:
+        summary = stream(args.input, args.output, chain, workers=args.workers, fmt=args.format,
+                         progress=None if args.quiet else print_progress)
+    except (OSError, ValueError) as e:
+        print(f"Failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Processed {summary['frames']} frames in {summary['seconds']:.2f}s")
+    return 0
@@ -0,0 +1,249 @@
+"""Memory-budgeted undo/redo history.
+
+Snapshots are shared, never copied: operations always return new images,
+so the history can hold references to the same buffers the app displays.
+Only the most recently used snapshots stay in RAM. When one is evicted it
+is either spilled to a temp file (every few steps, as a checkpoint) or
+dropped entirely and re-derived later by replaying its recorded operation
+from the nearest snapshot that is still available. Steps restored from a
+project reload their snapshot from the project instead of spilling.
+"""
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+
+from PIL import Image
+
+ORIGINAL = -1
+
+# Bytes per band for the modes the toolkit handles; anything else is 1
+BYTES_PER_BAND = {'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2, 'I;16L': 2, 'I;16N': 2}
+
+
+def image_nbytes(img):
+    """Approximate size of an image's pixel buffer"""
+    width, height = img.size
+    return width * height * len(img.getbands()) * BYTES_PER_BAND.get(img.mode, 1)
+
+
+class _Entry:
+    __slots__ = ('image', 'spill_path', 'reload', 'op', 'base', 'nbytes', 'mode', 'size')
+
+    def __init__(self, image, op, base, reload=None):
+        self.image = image
+        self.spill_path = None
+        self.reload = reload
+        self.op = op
+        self.base = base
+        # Sized when first materialized if there is no image yet
+        self.nbytes = image_nbytes(image) if image is not None else 0
+        self.mode = image.mode if image is not None else None
+        self.size = image.size if image is not None else None
+
+
+class History:
+    """Undo/redo stack with a RAM budget.
+
+    Every entry records how it was produced: ``op`` is ``(func, args)``
+    applied to the entry at index ``base`` (or ``ORIGINAL``), or ``None``
+    when the entry is simply the base image again (a reset).
+    """
+
+    def __init__(self, max_bytes=1024 ** 3, keep_recent=8, checkpoint_interval=5):
+        self.max_bytes = max_bytes
+        self.keep_recent = max(1, keep_recent)
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self._original = None
+        self._entries = []
+        self._resident = OrderedDict()
+        self._spill_dir = None
+        self._spill_counter = 0
+        self._finalizer = None
+        self.index = -1
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def ram_bytes(self):
+        """Bytes held by resident snapshots (shared buffers are not counted)"""
+        return sum(self._entries[i].nbytes for i in self._resident
+                   if self._entries[i].image is not self._original)
+
+    @property
+    def original(self):
+        return self._original
+
+    def reset(self, original):
+        """Start a fresh history rooted at original"""
+        self.close()
+        self._original = original
+        self.index = -1
+
+    def restore(self, original, steps, index):
+        """Rebuild a saved history without re-running it.
+
+        steps are ``(op, base, reload)``; reload is None or a function
+        returning the step's snapshot, which is called whenever the step is
+        needed and not resident. Other steps are replayed from their base.
+        """
+        self.reset(original)
+        for op, base, reload in steps:
+            self._entries.append(_Entry(None, op, base, reload))
+        self.index = min(index, len(self._entries) - 1)
+
+    def steps(self):
+        """Recorded ``(op, base)`` of every step"""
+        return [(entry.op, entry.base) for entry in self._entries]
+
+    def chain(self, index=None):
+        """``(op, args)`` steps leading from the original to step index (default: current).
+
+        Raises ValueError if a step on the way was recorded without its operation.
+        """
+        i = self.index if index is None else index
+        ops = []
+        while i != ORIGINAL:
+            entry = self._entries[i]
+            if entry.op is None:
+                raise ValueError(f"Step {i + 1} has no recorded operation to replay")
+            ops.append(entry.op)
+            i = entry.base
+        return ops[::-1]
+
+    def cached(self, i):
+        """Image of step i if it is held without replaying anything, else None"""
+        entry = self._entries[i]
+        if entry.image is not None:
+            return entry.image
+        if entry.reload is not None:
+            return entry.reload()
+        if entry.spill_path is not None:
+            return self._read_spill(entry)
+        return None
+
+    def close(self):
+        """Drop all snapshots and remove spill files"""
+        self._entries = []
+        self._resident.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self._spill_dir = None
+
+    def push(self, image, op=None, base=ORIGINAL):
+        """Add a new step after the current one, discarding any redo steps.
+
+        image may be None for a step that was never rendered on its own (it
+        was folded into a later fused step); it is replayed from base when
+        first needed.
+        """
+        for i in range(self.index + 1, len(self._entries)):
+            self._discard(i)
+        del self._entries[self.index + 1:]
+
+        self._entries.append(_Entry(image, op, base))
+        self.index = len(self._entries) - 1
+        if image is not None:
+            self._touch(self.index)
+            self._enforce_budget()
+        return image
+
+    def current(self):
+        """Image at the current step, or None if history is empty"""
+        if self.index < 0:
+            return None
+        image = self._materialize(self.index)
+        self._enforce_budget()
+        return image
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return self.index < len(self._entries) - 1
+
+    def undo(self):
+        """Step back; returns the new current image or None"""
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        return self.current()
+
+    def redo(self):
+        """Step forward; returns the new current image or None"""
+        if not self.can_redo():
+            return None
+        self.index += 1
+        return self.current()
+
+    # Internals
+    def _touch(self, i):
+        self._resident[i] = None
+        self._resident.move_to_end(i)
+
+    def _materialize(self, i):
+        if i == ORIGINAL:
+            return self._original
+        entry = self._entries[i]
+        if entry.image is None:
+            if entry.reload is not None:
+                entry.image = entry.reload()
+            elif entry.spill_path is not None:
+                entry.image = self._read_spill(entry)
+            else:
+                source = self._materialize(entry.base)
+                if entry.op is None:
+                    entry.image = source
+                else:
+                    func, args = entry.op
+                    entry.image = func(source, *args)
+            entry.nbytes = image_nbytes(entry.image)
+            entry.mode, entry.size = entry.image.mode, entry.image.size
+        self._touch(i)
+        return entry.image
+
+    def _enforce_budget(self):
+        while len(self._resident) > 1:
+            if len(self._resident) <= self.keep_recent and self.ram_bytes <= self.max_bytes:
+                break
+            victim = next((i for i in self._resident if i != self.index), None)
+            if victim is None:
+                break
+            self._evict(victim)
+
+    def _evict(self, i):
+        entry = self._entries[i]
+        del self._resident[i]
+        is_checkpoint = entry.op is not None and i % self.checkpoint_interval == 0
+        if is_checkpoint and entry.spill_path is None and entry.reload is None:
+            entry.spill_path = self._spill(entry.image)
+        entry.image = None
+
+    def _spill(self, image):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='image-toolkit-history-')
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        self._spill_counter += 1
+        path = os.path.join(self._spill_dir, f"{self._spill_counter}.raw")
+        with open(path, 'wb') as f:
+            f.write(image.tobytes())
+        return path
+
+    @staticmethod
+    def _read_spill(entry):
+        with open(entry.spill_path, 'rb') as f:
+            return Image.frombytes(entry.mode, entry.size, f.read())
+
+    def _discard(self, i):
+        self._resident.pop(i, None)
+        entry = self._entries[i]
+        entry.image = None
+        if entry.spill_path is not None:
+            try:
+                os.remove(entry.spill_path)
+            except OSError:
+                pass
+            entry.spill_path = None
@@ -1,12 +1,35 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageFilter
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import threading
+import os
+import sys
 import time
 
+import edges
+import export
+import frames
+import operations
+import parallel
+import profiling
+import project
+import stats
+from scheduler import Scheduler, checkpoint, report_progress
+from batch import sibling_images
+from cache import DecodedCache, ResultCache, pixel_hash
+from history import History, ORIGINAL
+from pyramid import get_pyramid
+from viewer import Viewport
+
+# Byte budget for decoded files kept for folder navigation
+DECODE_CACHE_BYTES = 512 * 1024 ** 2
+# Files after the current one decoded in the background (plus the one before)
+PREFETCH_AHEAD = 2
+# Byte budget for memoised preview results
+PREVIEW_CACHE_BYTES = 256 * 1024 ** 2
+# Quiet time after a slider moves before its preview runs
+LIVE_PREVIEW_DELAY_MS = 150
+# Sliders for kernel and window sizes, which must be odd
+ODD_SLIDERS = ('smoothing_scale', 'threshold_window_scale', 'morph_size_scale')
+
 class ImageToolkitApp:
     def __init__(self, master):
         self.master = master
@@ -30,14 +53,52 @@ class ImageToolkitApp:
         self.original_image = None
         self.current_image = None
         self.original_path = None
-        self.processing = False
+        
+        # Background jobs; callbacks are marshalled back onto the Tk thread.
+        # Lanes: 'load' for decoding files and projects, 'edit' for operations/previews/
+        # commits, 'prefetch' for decoding neighbouring files, 'save' for writing projects,
+        # 'export' for encoding result files.
+        self.scheduler = Scheduler(workers=2, dispatch=lambda func, *args: master.after(0, func, *args))
+        self.generation = 0  # bumped per loaded image; stale results are dropped
+        # Decoded files (the current one and prefetched neighbours)
+        self.decoded = DecodedCache(operations.open_image, max_bytes=DECODE_CACHE_BYTES)
+        self.committing = False
+        self.last_job = None
+        self.last_export = None
         
         self.edit_mode = tk.StringVar(value='enhanced')
-        self.history = []
-        self.history_index = -1
+        self.history = History()
         
-        self.original_tk_image = None
-        self.enhanced_tk_image = None
+        # Preview: operations run on a screen-sized proxy until committed
+        self.preview_mode = tk.BooleanVar(value=True)
+        self.pending_ops = []
+        self.pending_source = None
+        self.pending_base = ORIGINAL
+        self.pending_proxy = None
+        self.preview_image = None
+        # Per pending op: proxy result, its state key, the slider that made it
+        # (or None) and the result's size relative to the full-size result
+        self.pending_images = []
+        self.pending_keys = []
+        self.pending_controls = []
+        self.pending_scales = []
+        self.pending_root = None
+        self.pending_scale = 1.0
+        self.live_control = None
+        self.clicked_control = None
+        self.live_job = None
+        # Last odd value of each odd-only slider, to tell which way it is moving
+        self.odd_values = {}
+        # Edit requested while an image was loading, run once it has arrived
+        self.deferred_edit = None
+        # (input state, operation, args) -> proxy result
+        self.preview_cache = ResultCache(max_bytes=PREVIEW_CACHE_BYTES)
+        
+        # Live histogram window (one figure, updated in place)
+        self.hist_window = None
+        self.hist_canvas = None
+        self.hist_axes = None
+        self.hist_lines = {}
         
         self.setup_gui()
 
@@ -92,8 +153,8 @@ class ImageToolkitApp:
         canvas.pack(side="left", fill="both", expand=True, padx=5)
         scrollbar.pack(side="right", fill="y")
         
-        # Load content
-        self.create_sidebar_content(scrollable_frame)
+        # Load content once the window has been drawn, so it appears sooner
+        self.master.after_idle(self.create_sidebar_content, scrollable_frame)
 
     def create_sidebar_content(self, parent):
         """Create sidebar content sections"""
@@ -112,6 +173,9 @@ class ImageToolkitApp:
         # Parameters
         self.create_parameters_section(parent)
         
+        # Export
+        self.create_export_section(parent)
+        
         # Stats
         self.create_stats_section(parent)
 
@@ -158,6 +222,33 @@ class ImageToolkitApp:
         tk.Button(btn_frame, text="💾 Save Result", command=self.save_enhanced_image,
                  bg=self.colors['success'], fg='white', font=("Arial", 10, "bold"),
                  relief='raised', bd=2, padx=15, pady=8, width=12).pack(side='left')
+        
+        # Folder navigation (also Page Up / Page Down)
+        nav_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        nav_frame.pack(fill='x', pady=(0, 5))
+        
+        tk.Button(nav_frame, text="◀ Previous", command=lambda: self.show_sibling(-1),
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left', padx=(0, 5))
+        
+        tk.Button(nav_frame, text="Next ▶", command=lambda: self.show_sibling(1),
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left')
+        
+        self.master.bind('<Prior>', lambda e: self.show_sibling(-1))
+        self.master.bind('<Next>', lambda e: self.show_sibling(1))
+        
+        # Projects: original pixels, operation log and snapshots
+        project_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        project_frame.pack(fill='x', pady=(0, 5))
+        
+        tk.Button(project_frame, text="🗂 Open Project", command=self.open_project,
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left', padx=(0, 5))
+        
+        tk.Button(project_frame, text="📦 Save Project", command=self.save_project,
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left')
 
     def create_history_section(self, parent):
         """Create history controls section"""
@@ -177,6 +268,11 @@ class ImageToolkitApp:
                       value='original', bg=self.colors['sidebar'], fg='white',
                       selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
         
+        tk.Checkbutton(mode_frame, text="Fast Preview (full-res on Save/Commit)",
+                      variable=self.preview_mode, command=self.toggle_preview_mode,
+                      bg=self.colors['sidebar'], fg='white',
+                      selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
+        
         # Action buttons
         action_frame = tk.Frame(section, bg=self.colors['sidebar'])
         action_frame.pack(fill='x', pady=10)
@@ -192,6 +288,10 @@ class ImageToolkitApp:
         tk.Button(action_frame, text="🔄 Reset", command=self.reset_enhanced_image,
                  bg=self.colors['warning'], fg='white', font=("Arial", 10), width=8,
                  relief='raised', pady=5).pack(side='left')
+        
+        tk.Button(section, text="✅ Commit Full Resolution", command=self.commit_preview,
+                 bg=self.colors['success'], fg='white', font=("Arial", 10),
+                 relief='raised', pady=5).pack(fill='x', pady=(0, 5))
 
     def create_processing_section(self, parent):
         """Create image processing buttons section"""
@@ -213,6 +313,7 @@ class ImageToolkitApp:
             ("2. 🌊 Image Smoothing", self.apply_smoothing),
             ("3. 🔍 Image Sharpening", self.apply_sharpening),
             ("4. 📊 Histogram", self.show_histogram),
+            ("9. 🔲 Morphology", self.apply_morphology),
         ]
         
         buttons_right = [
@@ -220,16 +321,17 @@ class ImageToolkitApp:
             ("6. ⚫ Thresholding", self.apply_thresholding),
             ("7. 🌈 Log & Gamma", self.apply_log_gamma),
             ("8. 🎯 Edge Detection", self.apply_edge_detection),
+            ("10. 🌓 Equalize", self.apply_equalization),
         ]
         
         for text, command in buttons_left:
-            btn = tk.Button(left_col, text=text, command=command, anchor='w',
+            btn = tk.Button(left_col, text=text, command=lambda c=command: self.click(c), anchor='w',
                           bg='#2980b9', fg='white', font=("Arial", 9),
                           relief='raised', bd=1, padx=10, pady=8)
             btn.pack(fill='x', pady=2)
         
         for text, command in buttons_right:
-            btn = tk.Button(right_col, text=text, command=command, anchor='w',
+            btn = tk.Button(right_col, text=text, command=lambda c=command: self.click(c), anchor='w',
                           bg='#2980b9', fg='white', font=("Arial", 9),
                           relief='raised', bd=1, padx=10, pady=8)
             btn.pack(fill='x', pady=2)
@@ -238,26 +340,44 @@ class ImageToolkitApp:
         """Create parameters section"""
         section = self.create_section(parent, "⚙️ Parameters")
         
-        # Parameter entries
-        params = [
-            ("Smoothing Kernel:", "smoothing_entry", "3"),
-            ("Sharpening Factor:", "sharpening_entry", "1.5"),
-            ("Resize (WxH):", "resize_entry", "800x600"),
-            ("Threshold Value:", "threshold_entry", "128"),
-            ("Gamma Value:", "gamma_entry", "2.2"),
+        # Sliders preview their operation live (debounced) in preview mode
+        sliders = [
+            ("Smoothing Kernel:", "smoothing_scale", 1, 51, 1, 3, self.apply_smoothing),
+            ("Sharpen Strength:", "sharpen_amount_scale", 0.1, 5.0, 0.1, 1.5, self.apply_sharpening),
+            ("Sharpen Radius:", "sharpen_radius_scale", 1, 25, 1, 2, self.apply_sharpening),
+            ("Threshold Value:", "threshold_scale", 0, 255, 1, 128, self.apply_thresholding),
+            ("Threshold Window:", "threshold_window_scale", 3, 151, 1, 31, self.apply_thresholding),
+            ("Gamma Value:", "gamma_scale", 0.1, 5.0, 0.05, 2.2, self.apply_log_gamma),
+            ("Morph Element:", "morph_size_scale", 1, 101, 1, 3, self.apply_morphology),
+            ("CLAHE Clip Limit:", "clahe_clip_scale", 1.0, 10.0, 0.1, 2.0, self.apply_equalization),
+            ("CLAHE Tiles:", "clahe_tiles_scale", 2, 32, 1, 8, self.apply_equalization),
         ]
         
-        for label, attr_name, default in params:
+        for label, attr_name, low, high, step, default, control in sliders:
             frame = tk.Frame(section, bg=self.colors['sidebar'])
-            frame.pack(fill='x', pady=3)
+            frame.pack(fill='x', pady=1)
             
             tk.Label(frame, text=label, bg=self.colors['sidebar'], 
-                    fg='white', font=("Arial", 9)).pack(side='left')
+                    fg='white', font=("Arial", 9)).pack(side='left', anchor='s')
             
-            entry = tk.Entry(frame, width=10, font=("Arial", 9))
-            entry.insert(0, default)
-            entry.pack(side='right', padx=5)
-            setattr(self, attr_name, entry)
+            scale = tk.Scale(frame, from_=low, to=high, resolution=step, orient='horizontal',
+                             length=140, bg=self.colors['sidebar'], fg='white',
+                             highlightthickness=0, troughcolor='#34495e', font=("Arial", 8),
+                             command=lambda value, attr_name=attr_name, control=control:
+                                 self.slider_moved(attr_name, value, control))
+            scale.set(default)
+            scale.pack(side='right', padx=5)
+            setattr(self, attr_name, scale)
+        
+        frame = tk.Frame(section, bg=self.colors['sidebar'])
+        frame.pack(fill='x', pady=3)
+        
+        tk.Label(frame, text="Resize (WxH):", bg=self.colors['sidebar'], 
+                fg='white', font=("Arial", 9)).pack(side='left')
+        
+        self.resize_entry = tk.Entry(frame, width=10, font=("Arial", 9))
+        self.resize_entry.insert(0, "800x600")
+        self.resize_entry.pack(side='right', padx=5)
         
         # Edge detection
         edge_frame = tk.Frame(section, bg=self.colors['sidebar'])
@@ -277,16 +397,212 @@ class ImageToolkitApp:
                           value=value, bg=self.colors['sidebar'], fg='white',
                           font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=5)
 
+        canny_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        canny_frame.pack(fill='x', pady=3)
+
+        tk.Label(canny_frame, text="Canny (sigma,low,high):", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(side='left')
+
+        self.canny_entry = tk.Entry(canny_frame, width=12, font=("Arial", 9))
+        self.canny_entry.insert(0, f"{edges.CANNY_SIGMA},{edges.CANNY_LOW:g},{edges.CANNY_HIGH:g}")
+        self.canny_entry.pack(side='right', padx=5)
+
+        self.resize_fit = tk.BooleanVar(value=False)
+        tk.Checkbutton(section, text="Resize: fit within WxH (keep aspect)",
+                      variable=self.resize_fit, bg=self.colors['sidebar'], fg='white',
+                      selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
+        
+        # Smoothing filter
+        smooth_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        smooth_frame.pack(fill='x', pady=5)
+        
+        tk.Label(smooth_frame, text="Smoothing:", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(side='left')
+        
+        self.smoothing_method = tk.StringVar(value="gaussian")
+        smoothers = [("Gaussian", "gaussian"), ("Box", "box"), ("Median", "median")]
+        
+        smoother_frame = tk.Frame(smooth_frame, bg=self.colors['sidebar'])
+        smoother_frame.pack(side='right')
+        
+        for text, value in smoothers:
+            tk.Radiobutton(smoother_frame, text=text, variable=self.smoothing_method,
+                          value=value, bg=self.colors['sidebar'], fg='white',
+                          font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=5)
+        
+        # Thresholding method (window size applies to the adaptive ones)
+        threshold_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        threshold_frame.pack(fill='x', pady=5)
+        
+        tk.Label(threshold_frame, text="Threshold Method:", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(anchor='w')
+        
+        self.threshold_method = tk.StringVar(value="fixed")
+        thresholds = [("Fixed", "fixed"), ("Otsu", "otsu"), ("Mean", "mean"),
+                      ("Gaussian", "gaussian"), ("Sauvola", "sauvola")]
+        
+        method_frame = tk.Frame(threshold_frame, bg=self.colors['sidebar'])
+        method_frame.pack(anchor='w')
+        
+        for text, value in thresholds:
+            tk.Radiobutton(method_frame, text=text, variable=self.threshold_method,
+                          value=value, bg=self.colors['sidebar'], fg='white',
+                          font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=2)
+        
+        # Morphological operator (square element of Morph Element pixels)
+        morph_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        morph_frame.pack(fill='x', pady=5)
+        
+        tk.Label(morph_frame, text="Morphology:", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(anchor='w')
+        
+        self.morph_method = tk.StringVar(value="open")
+        morphs = [("Erode", "erode"), ("Dilate", "dilate"), ("Open", "open"),
+                  ("Close", "close"), ("Top-hat", "tophat"), ("Gradient", "gradient")]
+        
+        method_frame = tk.Frame(morph_frame, bg=self.colors['sidebar'])
+        method_frame.pack(anchor='w')
+        
+        for text, value in morphs:
+            tk.Radiobutton(method_frame, text=text, variable=self.morph_method,
+                          value=value, bg=self.colors['sidebar'], fg='white',
+                          font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=2)
+        
+        # Equalisation: one global histogram, or CLAHE's grid of tiles
+        equalize_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        equalize_frame.pack(fill='x', pady=5)
+        
+        tk.Label(equalize_frame, text="Equalize:", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(side='left')
+        
+        self.equalize_method = tk.StringVar(value="clahe")
+        equalizers = [("Global", "global"), ("CLAHE", "clahe")]
+        
+        equalizer_frame = tk.Frame(equalize_frame, bg=self.colors['sidebar'])
+        equalizer_frame.pack(side='right')
+        
+        for text, value in equalizers:
+            tk.Radiobutton(equalizer_frame, text=text, variable=self.equalize_method,
+                          value=value, bg=self.colors['sidebar'], fg='white',
+                          font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=5)
+        
+        # Tone curve used by Log & Gamma
+        tone_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        tone_frame.pack(fill='x', pady=5)
+        
+        tk.Label(tone_frame, text="Tone Curve:", bg=self.colors['sidebar'],
+                fg='white', font=("Arial", 9)).pack(side='left')
+        
+        self.tone_curve = tk.StringVar(value="gamma")
+        curves = [("Gamma", "gamma"), ("Log", "log")]
+        
+        curve_frame = tk.Frame(tone_frame, bg=self.colors['sidebar'])
+        curve_frame.pack(side='right')
+        
+        for text, value in curves:
+            tk.Radiobutton(curve_frame, text=text, variable=self.tone_curve,
+                          value=value, bg=self.colors['sidebar'], fg='white',
+                          font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=5)
+
+    def create_export_section(self, parent):
+        """Create encoder settings section"""
+        section = self.create_section(parent, "📤 Export")
+        
+        params = [
+            ("JPEG Quality (1-100):", "jpeg_quality_entry", "90"),
+            ("WebP Quality (1-100):", "webp_quality_entry", "90"),
+            ("PNG Compression (0-9):", "png_level_entry", "6"),
+        ]
+        
+        for label, attr_name, default in params:
+            frame = tk.Frame(section, bg=self.colors['sidebar'])
+            frame.pack(fill='x', pady=3)
+            
+            tk.Label(frame, text=label, bg=self.colors['sidebar'],
+                    fg='white', font=("Arial", 9)).pack(side='left')
+            
+            entry = tk.Entry(frame, width=10, font=("Arial", 9))
+            entry.insert(0, default)
+            entry.pack(side='right', padx=5)
+            setattr(self, attr_name, entry)
+        
+        # JPEG chroma subsampling and TIFF compression
+        self.jpeg_subsampling = tk.StringVar(value="4:2:0")
+        self.tiff_compression = tk.StringVar(value="tiff_lzw")
+        choices = [
+            ("Subsampling:", self.jpeg_subsampling, [("4:4:4", "4:4:4"), ("4:2:0", "4:2:0")]),
+            ("TIFF:", self.tiff_compression,
+             [("None", "raw"), ("LZW", "tiff_lzw"), ("Deflate", "tiff_adobe_deflate")]),
+        ]
+        
+        for label, variable, options in choices:
+            frame = tk.Frame(section, bg=self.colors['sidebar'])
+            frame.pack(fill='x', pady=5)
+            
+            tk.Label(frame, text=label, bg=self.colors['sidebar'],
+                    fg='white', font=("Arial", 9)).pack(side='left')
+            
+            option_frame = tk.Frame(frame, bg=self.colors['sidebar'])
+            option_frame.pack(side='right')
+            
+            for text, value in options:
+                tk.Radiobutton(option_frame, text=text, variable=variable,
+                              value=value, bg=self.colors['sidebar'], fg='white',
+                              font=("Arial", 8), selectcolor=self.colors['primary']).pack(side='left', padx=5)
+        
+        self.jpeg_progressive = tk.BooleanVar(value=False)
+        self.encoder_optimize = tk.BooleanVar(value=False)
+        self.webp_lossless = tk.BooleanVar(value=False)
+        checks = [
+            ("Progressive JPEG", self.jpeg_progressive),
+            ("Optimize PNG/JPEG (smaller, slower)", self.encoder_optimize),
+            ("Lossless WebP", self.webp_lossless),
+        ]
+        for text, variable in checks:
+            tk.Checkbutton(section, text=text, variable=variable,
+                          bg=self.colors['sidebar'], fg='white',
+                          selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
+        
+        tk.Button(section, text="📤 Export Web Set (PNG + web JPEG + thumbnail)",
+                 command=self.export_web_set, bg=self.colors['success'], fg='white',
+                 font=("Arial", 10), relief='raised', pady=5).pack(fill='x', pady=(5, 5))
+        
+        tk.Button(section, text="🎞 Process All Frames (GIF / multi-page TIFF)",
+                 command=self.process_all_frames, bg='#8e44ad', fg='white',
+                 font=("Arial", 10), relief='raised', pady=5).pack(fill='x', pady=(0, 5))
+
     def create_stats_section(self, parent):
         """Create statistics section"""
         section = self.create_section(parent, "📊 Quick Stats")
         
-        self.stats_text = tk.Text(section, height=8, width=35, bg='#2c3e50', 
+        self.stats_text = tk.Text(section, height=16, width=35, bg='#2c3e50', 
                                  fg='white', font=("Arial", 9), relief='flat',
                                  wrap=tk.WORD)
         self.stats_text.pack(fill='x', pady=5)
         self.stats_text.insert('1.0', "No image loaded\n\nLoad an image to see statistics")
         self.stats_text.config(state='disabled')
+        
+        # Profiling: timings are always recorded; memory and cProfile cost extra
+        self.profile_memory = tk.BooleanVar(value=False)
+        self.profile_cprofile = tk.BooleanVar(value=False)
+        tk.Checkbutton(section, text="Track memory (tracemalloc)", variable=self.profile_memory,
+                      command=lambda: profiling.profiler.set_memory(self.profile_memory.get()),
+                      bg=self.colors['sidebar'], fg='white',
+                      selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
+        tk.Checkbutton(section, text="Record cProfile", variable=self.profile_cprofile,
+                      command=self.toggle_cprofile, bg=self.colors['sidebar'], fg='white',
+                      selectcolor=self.colors['primary']).pack(anchor='w', pady=2)
+        
+        profile_frame = tk.Frame(section, bg=self.colors['sidebar'])
+        profile_frame.pack(fill='x', pady=5)
+        
+        tk.Button(profile_frame, text="Export Trace", command=self.export_trace,
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left', padx=(0, 5))
+        
+        tk.Button(profile_frame, text="Export cProfile", command=self.export_cprofile,
+                 bg='#7f8c8d', fg='white', font=("Arial", 9), width=12,
+                 relief='raised', pady=3).pack(side='left')
 
     def create_section(self, parent, title):
         """Create a section with title"""
@@ -313,19 +629,17 @@ class ImageToolkitApp:
         
         # Original Image Panel
         self.original_frame = self.create_image_panel(image_area, "Original Image", 0)
-        self.original_label = tk.Label(self.original_frame, 
-                                      text="📷\nNo image loaded\n\nClick 'Load Image' to begin", 
-                                      bg='#34495e', fg='white', font=("Arial", 14),
-                                      justify='center')
-        self.original_label.pack(fill='both', expand=True)
+        self.original_view = Viewport(self.original_frame,
+                                      "📷\nNo image loaded\n\nClick 'Load Image' to begin")
+        self.original_view.pack(fill='both', expand=True)
         
         # Enhanced Image Panel
         self.enhanced_frame = self.create_image_panel(image_area, "Enhanced Image", 1)
-        self.enhanced_label = tk.Label(self.enhanced_frame, 
-                                      text="✨\nProcessed image\nwill appear here", 
-                                      bg='#34495e', fg='white', font=("Arial", 14),
-                                      justify='center')
-        self.enhanced_label.pack(fill='both', expand=True)
+        self.enhanced_view = Viewport(self.enhanced_frame, "✨\nProcessed image\nwill appear here")
+        self.enhanced_view.pack(fill='both', expand=True)
+        
+        # Wheel zooms and dragging pans both panes together
+        self.original_view.link(self.enhanced_view)
 
     def create_image_panel(self, parent, title, column):
         """Create individual image panel"""
@@ -350,294 +664,891 @@ class ImageToolkitApp:
     # Core Application Methods
     def load_image(self):
         """Load an image file"""
-        if self.processing:
-            return
-            
         file_path = filedialog.askopenfilename(
-            filetypes=(("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff"), 
+            filetypes=(("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff *.tif"), 
                       ("All files", "*.*"))
         )
         
         if file_path:
-            self.show_loading("Loading image...")
-            threading.Thread(target=self.load_image_thread, args=(file_path,), daemon=True).start()
+            self.open_path(file_path)
 
-    def load_image_thread(self, file_path):
-        """Thread for loading image"""
+    def open_path(self, file_path):
+        """Load a file, straight from the decoded cache when it is there"""
+        self.show_loading("Loading image...")
+        if self.decoded.lookup(file_path) is not None:
+            self.scheduler.submit(self.load_image_thread, file_path, key='load',
+                                  on_done=lambda image: self.finish_load(image, file_path),
+                                  on_error=self.load_error)
+            return
+        target = self.original_view.size()
+        self.scheduler.submit(self.load_draft_thread, file_path, target, key='load',
+                              on_done=lambda result: self.show_draft(*result, file_path),
+                              on_error=self.load_error)
+
+    def show_sibling(self, step):
+        """Open the previous/next image in the current file's folder"""
+        if self.original_path is None:
+            return
+        try:
+            files = sibling_images(self.original_path)
+            index = files.index(os.path.abspath(self.original_path))
+        except (OSError, ValueError):
+            return
+        if 0 <= index + step < len(files):
+            self.open_path(files[index + step])
+
+    def prefetch_neighbours(self):
+        """Decode the files around the current one in the background"""
         try:
-            self.processing = True
-            image = Image.open(file_path).convert("RGB")
-            self.master.after(0, self.finish_load, image, file_path)
-        except Exception as e:
-            self.master.after(0, lambda: messagebox.showerror("Error", f"Failed to load image: {e}"))
-            self.master.after(0, self.hide_loading)
-            self.processing = False
-
-    def finish_load(self, image, file_path):
-        """Finish image loading"""
+            files = sibling_images(self.original_path)
+            index = files.index(os.path.abspath(self.original_path))
+        except (OSError, ValueError):
+            return
+        order = [index + 1, index - 1] + [index + i for i in range(2, PREFETCH_AHEAD + 1)]
+        paths = [files[i] for i in order if 0 <= i < len(files)]
+        target = self.original_view.size()
+        self.scheduler.submit(self.prefetch_thread, paths, target, key='prefetch')
+
+    def prefetch_thread(self, paths, target):
+        """Decode files into the cache and warm their stats and display pyramid"""
+        for path in paths:
+            checkpoint()
+            with profiling.span('prefetch', 'load', path=os.path.basename(path)) as span:
+                image = self.decoded.get(path)
+                span.output(image)
+            self.warm_stats(image)
+            get_pyramid(image).level_for(*target)
+
+    def warm_stats(self, image):
+        """Compute an image's stats ahead of display (cached per image)"""
+        with profiling.span('stats', 'stats', image=image):
+            stats.image_stats(image)
+
+    def load_draft_thread(self, file_path, target):
+        """Decode a screen-sized draft first (JPEG DCT scaling) for a fast first look"""
+        with profiling.span('load.draft', 'load', path=os.path.basename(file_path)) as span:
+            image = operations.open_image(file_path, draft_size=target)
+            span.output(image)
+        complete = image.size == operations.image_size(file_path)
+        if complete:
+            self.decoded.put(file_path, image)
+            self.warm_stats(image)
+        return image, complete
+
+    def show_draft(self, image, complete, file_path):
+        """Show the draft, then decode full resolution unless the draft already is"""
+        if complete:
+            self.finish_load(image, file_path)
+            return
+        self.original_view.fit()
+        self.display_image(image, self.original_view)
+        self.scheduler.submit(self.load_image_thread, file_path, key='load',
+                              on_done=lambda image: self.finish_load(image, file_path),
+                              on_error=self.load_error)
+
+    def load_image_thread(self, file_path):
+        """Decode an image on a worker (16-bit and float stay at full depth)"""
+        with profiling.span('load', 'load', path=os.path.basename(file_path)) as span:
+            image = self.decoded.get(file_path)
+            span.output(image)
+        self.warm_stats(image)
+        return image
+
+    def load_error(self, error):
+        """Handle load error"""
+        profiling.profiler.error('load', error)
+        self.deferred_edit = None
+        messagebox.showerror("Error", f"Failed to load image: {error}")
+        self.hide_loading()
+
+    def finish_load(self, image, file_path, history=None):
+        """Finish image loading (history is given when a project was opened)"""
+        # Anything still running belongs to the previous image
+        self.scheduler.cancel('edit')
+        self.generation += 1
+        self.committing = False
         self.original_image = image
         self.original_path = file_path
-        self.reset_history()
+        if history is None:
+            self.reset_history()
+        else:
+            self.clear_preview()
+            self.history.close()
+            self.history = history
+            self.current_image = history.current()
         
         self.path_entry.config(state='normal')
         self.path_entry.delete(0, tk.END)
         self.path_entry.insert(0, file_path)
         self.path_entry.config(state='readonly')
         
-        self.display_image(self.original_image, self.original_label)
-        self.update_stats()
+        self.original_view.fit()
+        self.display_image(self.original_image, self.original_view)
+        if self.current_image is not None:
+            self.display_image(self.current_image, self.enhanced_view)
+        self.on_image_changed()
         self.hide_loading()
-        self.processing = False
+        self.prefetch_neighbours()
+        self.run_deferred_edit()
 
-    def display_image(self, img, label):
-        """Display image in label"""
-        if img is None:
+    def open_project(self):
+        """Open a project: pixels are mapped and the history restored as saved"""
+        path = filedialog.askdirectory(title="Open Project")
+        if not path:
+            return
+        if not project.is_project(path):
+            messagebox.showerror("Error", f"{path} is not a project")
             return
+        self.show_loading("Opening project...")
+        self.scheduler.submit(self.open_project_thread, path, key='load',
+                              on_done=lambda history: self.finish_load(history.original, path, history),
+                              on_error=self.load_error)
 
-        try:
-            # Get container size
-            container = label.master
-            container.update_idletasks()
-            width = container.winfo_width() - 20
-            height = container.winfo_height() - 20
-            
-            if width < 50 or height < 50:
-                width, height = 400, 300
+    def open_project_thread(self, path):
+        """Map a project's pixels and rebuild its history on a worker"""
+        with profiling.span('project.open', 'load', path=os.path.basename(path)) as span:
+            original, steps, index, _ = project.load_project(path)
+            history = History()
+            history.restore(original, steps, index)
+            current = history.current()
+            span.output(original)
+        self.warm_stats(current if current is not None else original)
+        return history
 
-            # Resize image
-            img_copy = img.copy()
-            img_copy.thumbnail((width, height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            tk_img = ImageTk.PhotoImage(img_copy)
-            
-            # Update label
-            label.config(image=tk_img, text="")
-            
-            # Keep reference
-            if label == self.original_label:
-                self.original_tk_image = tk_img
-            else:
-                self.enhanced_tk_image = tk_img
-                
-        except Exception as e:
-            print(f"Display error: {e}")
+    def save_project(self):
+        """Save original, operation log and cached snapshots (committing any preview first)"""
+        if self.pending_ops:
+            self.commit_preview(then=self.save_project)
+            return
+        if self.original_image is None:
+            messagebox.showwarning("Warning", "Please load an image first.")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=project.PROJECT_EXTENSION,
+            filetypes=[("Toolkit projects", "*" + project.PROJECT_EXTENSION)])
+        if not path:
+            return
+        steps = project.history_steps(self.history)
+        self.show_loading("Saving project...")
+        self.scheduler.submit(project.save_project, path, self.original_image, steps,
+                              self.history.index, self.original_path,
+                              key='save', cancellable=False,
+                              on_done=lambda _: self.finish_save_project(),
+                              on_error=self.save_project_error)
+
+    def finish_save_project(self):
+        self.hide_loading()
+        messagebox.showinfo("Success", "Project saved successfully!")
+
+    def save_project_error(self, error):
+        profiling.profiler.error('project.save', error)
+        self.hide_loading()
+        messagebox.showerror("Error", f"Failed to save project: {error}")
+
+    def display_image(self, img, view):
+        """Display image in a viewport, keeping its zoom and pan"""
+        if img is not None:
+            view.show(img)
 
     def show_loading(self, message):
         """Show loading message"""
-        self.enhanced_label.config(text=f"⏳ {message}\n\nPlease wait...", fg='#f39c12')
+        self.enhanced_view.message(f"⏳ {message}\n\nPlease wait...", fg='#f39c12')
 
     def hide_loading(self):
         """Hide loading message"""
-        if not self.current_image:
-            self.enhanced_label.config(text="✨\nProcessed image\nwill appear here", fg='white')
+        if not self.current_image and not self.preview_image:
+            self.enhanced_view.message("✨\nProcessed image\nwill appear here")
+
+    def displayed_image(self):
+        """Image shown in the enhanced pane, falling back to the original"""
+        for image in (self.preview_image, self.current_image, self.original_image):
+            if image is not None:
+                return image
+        return None
+
+    def on_image_changed(self):
+        """Refresh everything derived from the displayed image"""
+        self.update_stats()
+        self.refresh_histogram()
 
     def update_stats(self):
         """Update statistics"""
-        if self.original_image:
-            stats = f"Image Size: {self.original_image.size}\n"
-            stats += f"Mode: {self.original_image.mode}\n"
-            stats += f"Format: {self.original_image.format or 'Unknown'}\n"
+        image = self.displayed_image()
+        if image:
+            text = f"Image Size: {image.size}\n"
+            text += f"Mode: {image.mode}\n"
             
-            if self.original_image.mode == 'L':
-                stats += "\nGrayscale Image"
+            if image.mode == 'L':
+                text += "Grayscale Image\n\n"
+            elif image.mode == 'I;16':
+                text += "Grayscale Image (16-bit)\n\n"
+            elif image.mode == 'F':
+                text += "Grayscale Image (32-bit float)\n\n"
             else:
-                stats += "\nColor Image (RGB)"
+                text += "Color Image (RGB)\n\n"
+            text += stats.format_summary(stats.image_stats(image))
+            
+            job = self.last_job
+            if job is not None:
+                text += (f"\n\nLast job: {job.name}\n"
+                         f"Queued {job.wait_seconds * 1000:.0f} ms, ran {job.run_seconds * 1000:.0f} ms")
+            text += "\n\n" + profiling.profiler.format_summary()
             
             self.stats_text.config(state='normal')
             self.stats_text.delete('1.0', tk.END)
-            self.stats_text.insert('1.0', stats)
+            self.stats_text.insert('1.0', text)
             self.stats_text.config(state='disabled')
 
+    def toggle_cprofile(self):
+        profiling.profiler.cprofile = self.profile_cprofile.get()
+
+    def export_trace(self):
+        """Save the session's spans as a Chrome/Perfetto trace"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if file_path:
+            try:
+                profiling.profiler.save_trace(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save trace: {e}")
+
+    def export_cprofile(self):
+        """Save the recorded cProfile data (open with pstats or snakeviz)"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".prof", filetypes=[("cProfile data", "*.prof")])
+        if file_path:
+            try:
+                profiling.profiler.save_cprofile(file_path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Error", f"Failed to save profile: {e}")
+
     def reset_history(self):
         """Reset history"""
-        self.history = []
-        self.history_index = -1
+        self.clear_preview()
+        self.history.reset(self.original_image)
         self.current_image = None
-        self.enhanced_label.config(image='', text="✨\nProcessed image\nwill appear here")
+        self.enhanced_view.clear("✨\nProcessed image\nwill appear here")
 
     def reset_enhanced_image(self):
         """Reset enhanced image"""
         if self.original_image:
-            self.current_image = self.original_image.copy()
-            self.apply_to_history(self.current_image)
+            self.clear_preview()
+            self.apply_to_history(self.original_image)
 
     def save_enhanced_image(self):
-        """Save enhanced image"""
+        """Save enhanced image (committing any preview first)"""
+        if self.pending_ops:
+            self.commit_preview(then=self.save_enhanced_image)
+            return
         if self.current_image:
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".png",
-                filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
+                filetypes=[("PNG files", "*.png"), ("TIFF files", "*.tif *.tiff"),
+                           ("JPEG files", "*.jpg"), ("WebP files", "*.webp"),
+                           ("All files", "*.*")]
             )
             if file_path:
                 try:
-                    self.current_image.save(file_path)
-                    messagebox.showinfo("Success", "Image saved successfully!")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to save image: {e}")
+                    fmt = export.format_for(file_path)
+                    target = export.Target(file_path, fmt, **self.encoder_settings().get(fmt, {}))
+                except ValueError as e:
+                    messagebox.showerror("Input Error", str(e))
+                    return
+                self.start_export([target])
+
+    def export_web_set(self):
+        """Export full-resolution PNG, a web JPEG and a thumbnail in parallel"""
+        if self.pending_ops:
+            self.commit_preview(then=self.export_web_set)
+            return
+        if self.current_image is None:
+            messagebox.showwarning("Warning", "Please process an image first.")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".png", filetypes=[("PNG files", "*.png")])
+        if file_path:
+            try:
+                targets = export.set_targets(file_path, self.encoder_settings())
+            except ValueError as e:
+                messagebox.showerror("Input Error", str(e))
+                return
+            self.start_export(targets)
+
+    def process_all_frames(self):
+        """Replay the current chain on every frame of the loaded file, streaming the output"""
+        if self.pending_ops:
+            self.commit_preview(then=self.process_all_frames)
+            return
+        if self.original_path is None or not os.path.isfile(self.original_path):
+            messagebox.showwarning("Warning", "Please load an image file first.")
+            return
+        try:
+            chain = [(operations.OP_NAMES[func], args) for func, args in self.history.chain()]
+        except (KeyError, ValueError):
+            messagebox.showerror("Error", "The current result cannot be replayed on other frames.")
+            return
+        if not chain:
+            messagebox.showwarning("Warning", "Please process an image first.")
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".tif",
+            filetypes=[("Multi-page TIFF", "*.tif *.tiff"), ("Animated GIF", "*.gif")])
+        if not file_path:
+            return
+        self.show_loading("Processing frames...")
+        
+        def progress(done, total, elapsed):
+            report_progress(done / total, f"frame {done}/{total}")
+        
+        self.scheduler.submit(frames.stream, self.original_path, file_path, chain, 1, None, progress,
+                              key='export', cancellable=False,
+                              on_done=self.finish_frames,
+                              on_error=self.frames_error,
+                              on_progress=self.frames_progress)
+
+    def frames_progress(self, job, fraction, message):
+        self.show_loading(f"Processing frames... {fraction:.0%} ({message})")
+
+    def finish_frames(self, summary):
+        self.hide_loading()
+        messagebox.showinfo("Frames complete",
+                            f"Processed {summary['frames']} frames in {summary['seconds']:.2f}s")
+
+    def frames_error(self, error):
+        profiling.profiler.error('frames', error)
+        self.hide_loading()
+        messagebox.showerror("Error", f"Failed to process frames: {error}")
+
+    def encoder_settings(self):
+        """Encoder options per format from the Export section"""
+        try:
+            jpeg_quality = int(self.jpeg_quality_entry.get())
+            webp_quality = int(self.webp_quality_entry.get())
+            png_level = int(self.png_level_entry.get())
+        except ValueError:
+            raise ValueError("Quality and compression settings must be integers")
+        if not (1 <= jpeg_quality <= 100 and 1 <= webp_quality <= 100):
+            raise ValueError("Quality must be between 1-100")
+        if not 0 <= png_level <= 9:
+            raise ValueError("PNG compression must be between 0-9")
+        optimize = self.encoder_optimize.get()
+        return {
+            'PNG': {'compress_level': png_level, 'optimize': optimize},
+            'JPEG': {'quality': jpeg_quality, 'subsampling': self.jpeg_subsampling.get(),
+                     'progressive': self.jpeg_progressive.get(), 'optimize': optimize},
+            'WEBP': {'quality': webp_quality, 'lossless': self.webp_lossless.get()},
+            'TIFF': {'compression': self.tiff_compression.get()},
+        }
+
+    def start_export(self, targets):
+        """Encode the current image for each target on workers"""
+        self.show_loading("Exporting...")
+        self.scheduler.submit(export.export_all, self.current_image, targets,
+                              key='export', cancellable=False,
+                              on_done=self.finish_export,
+                              on_error=self.export_error,
+                              on_progress=self.export_progress)
+
+    def export_progress(self, job, fraction, message):
+        """Show export progress"""
+        self.show_loading(f"Exporting... {fraction:.0%} ({message})")
+
+    def finish_export(self, reports):
+        """Report size and encode time of every exported file"""
+        self.last_export = reports
+        self.hide_loading()
+        messagebox.showinfo("Export complete", export.format_report(reports))
+
+    def export_error(self, error):
+        profiling.profiler.error('export', error)
+        self.hide_loading()
+        messagebox.showerror("Error", f"Failed to save image: {error}")
 
     # History Management
-    def apply_to_history(self, new_image):
-        """Apply to history"""
-        if self.history_index < len(self.history) - 1:
-            self.history = self.history[:self.history_index + 1]
-            
-        self.history.append(new_image.copy())
-        self.history_index = len(self.history) - 1
-        self.current_image = new_image
-        self.display_image(self.current_image, self.enhanced_label)
+    def apply_to_history(self, new_image, op=None, base=ORIGINAL):
+        """Apply to history (op/base let evicted steps be replayed)"""
+        with profiling.span('history.push', 'history', image=new_image):
+            self.current_image = self.history.push(new_image, op, base)
+        self.display_image(self.current_image, self.enhanced_view)
+        self.on_image_changed()
 
     def undo_operation(self):
         """Undo operation"""
-        if self.history_index > 0:
-            self.history_index -= 1
-            self.current_image = self.history[self.history_index].copy()
-            self.display_image(self.current_image, self.enhanced_label)
+        if self.pending_ops:
+            self.pending_ops.pop()
+            self.pending_images.pop()
+            self.pending_keys.pop()
+            self.pending_controls.pop()
+            self.pending_scales.pop()
+            self.refresh_preview()
+            return
+        image = self.history.undo()
+        if image is not None:
+            self.current_image = image
+            self.display_image(self.current_image, self.enhanced_view)
+            self.on_image_changed()
 
     def redo_operation(self):
         """Redo operation"""
-        if self.history_index < len(self.history) - 1:
-            self.history_index += 1
-            self.current_image = self.history[self.history_index].copy()
-            self.display_image(self.current_image, self.enhanced_label)
+        if self.pending_ops:
+            return
+        image = self.history.redo()
+        if image is not None:
+            self.current_image = image
+            self.display_image(self.current_image, self.enhanced_view)
+            self.on_image_changed()
 
     # Image Processing Operations
     def get_source_image(self):
-        """Get source image"""
-        if self.edit_mode.get() == 'original':
-            return self.original_image.copy() if self.original_image else None
-        else:
-            return self.current_image if self.current_image else (
-                self.original_image.copy() if self.original_image else None)
+        """Get source image and its history index (images are never modified in place)"""
+        if self.original_image is None:
+            return None, ORIGINAL
+        if self.edit_mode.get() == 'enhanced' and self.current_image is not None:
+            return self.current_image, self.history.index
+        return self.original_image, ORIGINAL
 
     def apply_operation(self, operation_func, *args):
-        """Apply operation"""
-        if self.processing:
+        """Apply operation (a newer request supersedes one still running)"""
+        if self.committing:
+            return
+        if self.scheduler.busy('load'):
+            # Applies to the image being loaded; a later request replaces it
+            self.deferred_edit = (operation_func, args, self.live_control, self.clicked_control)
+            return
+        self.run_operation(operation_func, args)
+
+    def run_operation(self, operation_func, args):
+        """Preview or process an operation on the current source image"""
+        if self.preview_mode.get():
+            self.apply_preview(operation_func, args, self.live_control, self.clicked_control)
             return
             
-        source_image = self.get_source_image()
+        source_image, base = self.get_source_image()
         if source_image is None:
             messagebox.showwarning("Warning", "Please load an image first.")
             return
 
         self.show_loading("Processing image...")
-        threading.Thread(target=self.process_thread, 
-                        args=(operation_func, source_image, args), 
-                        daemon=True).start()
+        generation = self.generation
+        job = self.scheduler.submit(
+            self.process_thread, operation_func, source_image, args, key='edit',
+            on_done=lambda result: self.finish_processing(result, (operation_func, args), base,
+                                                          generation, job),
+            on_error=self.processing_error)
 
-    def process_thread(self, operation_func, source_image, args):
-        """Process in thread"""
+    def run_deferred_edit(self):
+        """Apply the edit requested while the image was loading"""
+        if self.deferred_edit is None:
+            return
+        operation_func, args, self.live_control, self.clicked_control = self.deferred_edit
+        self.deferred_edit = None
         try:
-            self.processing = True
-            result = operation_func(source_image, *args)
-            self.master.after(0, self.finish_processing, result)
-        except Exception as e:
-            self.master.after(0, lambda: self.processing_error(str(e)))
+            # The load job may not have left its lane yet, so apply_operation would defer again
+            self.run_operation(operation_func, args)
         finally:
-            self.processing = False
+            self.live_control = self.clicked_control = None
+
+    def process_thread(self, operation_func, source_image, args):
+        """Run an operation on a worker (banded over all cores when it is local)"""
+        checkpoint()
+        with profiling.span(operation_func.__name__, image=source_image) as span:
+            result = parallel.apply(operation_func, source_image, args)
+            span.output(result)
+        checkpoint()
+        self.warm_stats(result)
+        return result
 
-    def finish_processing(self, result):
+    def finish_processing(self, result, op, base, generation, job):
         """Finish processing"""
-        self.apply_to_history(result)
+        if generation != self.generation:
+            return
+        self.last_job = job
+        self.apply_to_history(result, op, base)
+        self.hide_loading()
+
+    # Preview Proxy
+    def apply_preview(self, operation_func, args, control=None, replaces=None):
+        """Run an operation on the screen-sized proxy and queue it for commit.
+
+        A live preview from the slider that made the last pending op
+        replaces that op instead of stacking another one; so does a click
+        on that slider's apply button (replaces), which confirms the step,
+        so a further click stacks a new one. Results are memoised by
+        (input state, operation, args), so returning to an earlier slider
+        value is a cache hit.
+
+        Sizes in pixels (windows, radii, sigmas) are scaled to the proxy;
+        args themselves, as committed later, stay at full size.
+        """
+        if not self.pending_ops or self.edit_mode.get() == 'original':
+            source_image, base = self.get_source_image()
+            if source_image is None:
+                messagebox.showwarning("Warning", "Please load an image first.")
+                return
+            self.clear_preview()
+            self.pending_source, self.pending_base = source_image, base
+            self.pending_proxy = get_pyramid(source_image).level_for(
+                *self.enhanced_view.size())
+            self.pending_root = pixel_hash(self.pending_proxy)
+            self.pending_scale = self.pending_proxy.width / source_image.width
+
+        depth = len(self.pending_ops)
+        replaces = replaces or control
+        if replaces is not None and depth and self.pending_controls[-1] == replaces:
+            depth -= 1
+        proxy = self.pending_images[depth - 1] if depth else self.pending_proxy
+        scale = self.pending_scales[depth - 1] if depth else self.pending_scale
+        proxy_args = operations.scale_args(operation_func, args, scale)
+        key = (self.pending_keys[depth - 1] if depth else self.pending_root,
+               operation_func, proxy_args)
+        op = (operation_func, args)
+        if operation_func in (operations.resize, operations.fit):
+            # The proxy is resized to the requested size itself
+            scale = 1.0
+        generation = self.generation
+
+        cached = self.preview_cache.lookup(key)
+        if cached is not None:
+            # A newer result must not be overwritten by a slower, older request
+            self.scheduler.cancel('edit')
+            self.finish_preview(cached, op, key, depth, control, scale, generation, None)
+            return
+
+        self.show_loading("Previewing...")
+        job = self.scheduler.submit(
+            self.process_thread, operation_func, proxy, proxy_args, key='edit',
+            on_done=lambda result: self.finish_preview(result, op, key, depth, control, scale,
+                                                       generation, job),
+            on_error=self.processing_error)
+
+    def finish_preview(self, result, op, key, depth, control, scale, generation, job):
+        """Finish preview"""
+        if generation != self.generation or depth > len(self.pending_ops):
+            return
+        if job is not None:
+            self.last_job = job
+            self.preview_cache.put(key, result)
+        for pending, value in ((self.pending_ops, op), (self.pending_images, result),
+                               (self.pending_keys, key), (self.pending_controls, control),
+                               (self.pending_scales, scale)):
+            del pending[depth:]
+            pending.append(value)
+        self.preview_image = result
+        self.display_image(self.preview_image, self.enhanced_view)
+        self.on_image_changed()
+        self.hide_loading()
+
+    def refresh_preview(self):
+        """Show the last remaining pending result on the proxy"""
+        if not self.pending_ops:
+            self.clear_preview()
+            if self.current_image is not None:
+                self.display_image(self.current_image, self.enhanced_view)
+            else:
+                self.enhanced_view.clear("✨\nProcessed image\nwill appear here")
+            self.on_image_changed()
+            return
+        self.preview_image = self.pending_images[-1]
+        self.display_image(self.preview_image, self.enhanced_view)
+        self.on_image_changed()
+
+    def clear_preview(self):
+        """Discard pending preview operations"""
+        self.pending_ops = []
+        self.pending_source = None
+        self.pending_base = ORIGINAL
+        self.pending_proxy = None
+        self.preview_image = None
+        self.pending_images = []
+        self.pending_keys = []
+        self.pending_controls = []
+        self.pending_scales = []
+        self.pending_root = None
+        self.pending_scale = 1.0
+
+    def slider_moved(self, attr_name, value, control):
+        """Slider command: keep kernel sizes odd, then schedule the slider's preview"""
+        if attr_name in ODD_SLIDERS:
+            size = int(float(value))
+            if size % 2 == 0:
+                # Tk's resolution counts from zero, so odd steps are set by hand,
+                # rounding the way the slider is moving
+                size += -1 if size < self.odd_values.get(attr_name, size) else 1
+                getattr(self, attr_name).set(size)
+            self.odd_values[attr_name] = size
+        self.schedule_live_preview(control)
+
+    def schedule_live_preview(self, control):
+        """Preview a slider's operation once the slider has been still for a moment"""
+        if self.live_job is not None:
+            self.master.after_cancel(self.live_job)
+        self.live_job = self.master.after(LIVE_PREVIEW_DELAY_MS, self.live_preview, control)
+
+    def live_preview(self, control):
+        """Run a slider's apply function as a live preview (preview mode only)"""
+        self.live_job = None
+        if self.original_image is None or not self.preview_mode.get():
+            return
+        self.live_control = control
+        try:
+            control()
+        finally:
+            self.live_control = None
+
+    def click(self, control):
+        """Run a button's apply function; it takes over a live step from its own sliders"""
+        self.clicked_control = control
+        try:
+            control()
+        finally:
+            self.clicked_control = None
+
+    def toggle_preview_mode(self):
+        """Leaving preview mode commits whatever is pending"""
+        if not self.preview_mode.get():
+            self.commit_preview()
+
+    def commit_preview(self, then=None):
+        """Render pending operations at full resolution and push them to history"""
+        if self.committing:
+            return
+        if not self.pending_ops:
+            if then:
+                then()
+            return
+
+        # Previews still in flight would land after the commit; drop them
+        self.scheduler.cancel('edit')
+        self.committing = True
+        self.show_loading("Rendering full resolution...")
+        ops = list(self.pending_ops)
+        generation = self.generation
+        job = self.scheduler.submit(
+            self.commit_thread, self.pending_source, ops, key='edit', cancellable=False,
+            on_done=lambda results: self.finish_commit(results, ops, then, generation, job),
+            on_error=self.commit_error,
+            on_progress=self.commit_progress)
+
+    @staticmethod
+    def fused_ops(ops, mode):
+        """(func, args, steps covered) for ops, with runs of point operations fused into one pass"""
+        if mode in operations.NATIVE_MODES:
+            return [(func, args, 1) for func, args in ops]
+        names = [operations.OP_NAMES.get(func) for func, _ in ops]
+        fused = []
+        i = 0
+        for name, args in operations.fuse_chain([(name, args) for name, (_, args) in zip(names, ops)]):
+            if name == operations.FUSED_STEP:
+                count = 0
+                while i + count < len(ops) and names[i + count] in operations.POINT_LUTS:
+                    count += 1
+                fused.append((operations.point_lut, args, count))
+            else:
+                count = 1
+                fused.append((ops[i][0], args, 1))
+            i += count
+        return fused
+
+    def commit_thread(self, source_image, ops):
+        """Render the pending chain at full resolution on a worker.
+
+        Steps folded into a fused pass have no image of their own; their
+        result is None and history replays them if they are ever needed.
+        """
+        results = []
+        image = source_image
+        for func, args, count in self.fused_ops(ops, source_image.mode):
+            checkpoint()
+            with profiling.span(func.__name__, image=image) as span:
+                image = parallel.apply(func, image, args)
+                span.output(image)
+            results.extend([None] * (count - 1) + [image])
+            report_progress(len(results) / len(ops))
+        self.warm_stats(image)
+        return results
+
+    def commit_progress(self, job, fraction, message):
+        """Show commit progress"""
+        if self.committing:
+            self.show_loading(f"Rendering full resolution... {fraction:.0%}")
+
+    def finish_commit(self, results, ops, then, generation, job):
+        """Finish commit"""
+        if generation != self.generation:
+            return
+        self.committing = False
+        self.last_job = job
+        base = self.pending_base
+        self.clear_preview()
+        for result, op in zip(results, ops):
+            if result is None:
+                self.history.push(None, op, base)
+            else:
+                self.apply_to_history(result, op, base)
+            base = self.history.index
         self.hide_loading()
+        if then:
+            then()
 
-    def processing_error(self, error_msg):
+    def commit_error(self, error):
+        """Handle commit error"""
+        self.committing = False
+        self.processing_error(error)
+
+    def processing_error(self, error):
         """Handle processing error"""
-        messagebox.showerror("Processing Error", f"Error during processing:\n{error_msg}")
+        profiling.profiler.error('operation', error)
+        messagebox.showerror("Processing Error", f"Error during processing:\n{error}")
         self.hide_loading()
-        self.processing = False
 
     # Image Processing Functions
     def apply_negative(self):
-        def operation(img):
-            array = np.array(img)
-            return Image.fromarray(255 - array)
-        self.apply_operation(operation)
+        self.apply_operation(operations.negative)
 
     def apply_smoothing(self):
-        def operation(img):
-            try:
-                kernel_size = max(3, int(self.smoothing_entry.get()))
-                if kernel_size % 2 == 0:
-                    kernel_size += 1
-                return img.filter(ImageFilter.GaussianBlur(kernel_size // 3))
-            except ValueError:
-                return img.filter(ImageFilter.BLUR)
-        self.apply_operation(operation)
+        kernel_size = int(self.smoothing_scale.get())
+        filters = {
+            "gaussian": operations.smoothing,
+            "box": operations.box_smoothing,
+            "median": operations.median_smoothing,
+        }
+        self.apply_operation(filters[self.smoothing_method.get()], kernel_size)
 
     def apply_sharpening(self):
-        def operation(img):
-            return img.filter(ImageFilter.SHARPEN)
-        self.apply_operation(operation)
+        self.apply_operation(operations.sharpening, float(self.sharpen_amount_scale.get()),
+                             int(self.sharpen_radius_scale.get()))
 
     def show_histogram(self):
-        if self.original_image:
-            gray_img = self.original_image.convert('L')
-            array = np.array(gray_img)
-            
-            hist_window = tk.Toplevel(self.master)
-            hist_window.title("Image Histogram")
-            hist_window.geometry("500x400")
-            
-            fig, ax = plt.subplots(figsize=(5, 3))
-            ax.hist(array.flatten(), bins=256, range=(0, 255), color='skyblue', alpha=0.7)
-            ax.set_title("Image Histogram")
-            ax.set_xlabel("Pixel Intensity")
-            ax.set_ylabel("Frequency")
-            ax.grid(True, alpha=0.3)
+        """Open (or raise) the live histogram of the displayed image"""
+        if self.displayed_image() is None:
+            return
+        if self.hist_window is not None:
+            self.hist_window.lift()
+            self.refresh_histogram()
+            return
+        
+        # matplotlib is imported on first use; it dominates startup time otherwise
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
             
-            canvas = FigureCanvasTkAgg(fig, hist_window)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.hist_window = tk.Toplevel(self.master)
+        self.hist_window.title("Image Histogram")
+        self.hist_window.geometry("500x400")
+        self.hist_window.protocol("WM_DELETE_WINDOW", self.close_histogram)
+        
+        fig = Figure(figsize=(5, 3))
+        self.hist_axes = fig.add_subplot()
+        self.hist_axes.set_title("Image Histogram")
+        self.hist_axes.set_xlabel("Pixel Intensity")
+        self.hist_axes.set_ylabel("Frequency")
+        self.hist_axes.set_xlim(0, 255)
+        self.hist_axes.grid(True, alpha=0.3)
+        self.hist_lines = {}
+        
+        self.hist_canvas = FigureCanvasTkAgg(fig, self.hist_window)
+        self.hist_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.refresh_histogram()
+
+    def refresh_histogram(self):
+        """Update the open histogram figure in place from cached histograms"""
+        image = self.displayed_image()
+        if self.hist_window is None or image is None:
+            return
+        hists = stats.image_stats(image)['histograms']
+        colors = {'R': 'red', 'G': 'green', 'B': 'blue', 'Luminance': 'gray', 'L': 'gray'}
+        names = [name for name in hists if name in colors and not (name == 'L' and 'Luminance' in hists)]
+        
+        if set(names) != set(self.hist_lines):
+            for line in self.hist_lines.values():
+                line.remove()
+            self.hist_lines = {}
+            for name in names:
+                self.hist_lines[name], = self.hist_axes.plot(
+                    range(256), hists[name], color=colors[name], alpha=0.7,
+                    linewidth=2 if name == 'Luminance' else 1, label=name)
+            self.hist_axes.legend(loc='upper right', fontsize=8)
+        else:
+            for name in names:
+                self.hist_lines[name].set_ydata(hists[name])
+        
+        self.hist_axes.relim()
+        self.hist_axes.autoscale_view(scalex=False)
+        self.hist_canvas.draw_idle()
+
+    def close_histogram(self):
+        """Forget the histogram figure when its window closes"""
+        self.hist_window.destroy()
+        self.hist_window = None
+        self.hist_canvas = None
+        self.hist_axes = None
+        self.hist_lines = {}
 
     def apply_resize(self):
-        def operation(img):
-            try:
-                width, height = map(int, self.resize_entry.get().lower().split('x'))
-                return img.resize((width, height), Image.Resampling.LANCZOS)
-            except ValueError:
-                messagebox.showerror("Input Error", "Please enter resize dimensions as 'WxH' (e.g., 800x600)")
-                return img
-        self.apply_operation(operation)
+        try:
+            size = operations.parse_size(self.resize_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter resize dimensions as 'WxH' (e.g., 800x600)")
+            return
+        self.apply_operation(operations.resize, size, self.resize_fit.get())
 
     def apply_thresholding(self):
-        def operation(img):
-            try:
-                threshold = int(self.threshold_entry.get())
-                gray = img.convert('L')
-                array = np.array(gray)
-                binary = np.where(array >= threshold, 255, 0)
-                return Image.fromarray(binary.astype('uint8')).convert('RGB')
-            except ValueError:
-                messagebox.showerror("Input Error", "Threshold value must be an integer between 0-255")
-                return img
-        self.apply_operation(operation)
+        method = self.threshold_method.get()
+        if method == "otsu":
+            self.apply_operation(operations.otsu_threshold)
+            return
+        if method != "fixed":
+            window = int(self.threshold_window_scale.get())
+            adaptive = {
+                "mean": operations.adaptive_mean_threshold,
+                "gaussian": operations.adaptive_gaussian_threshold,
+                "sauvola": operations.sauvola_threshold,
+            }
+            self.apply_operation(adaptive[method], window)
+            return
+        self.apply_operation(operations.thresholding, int(self.threshold_scale.get()))
+
+    def apply_morphology(self):
+        func = operations.OPERATIONS[self.morph_method.get()][0]
+        self.apply_operation(func, int(self.morph_size_scale.get()))
+
+    def apply_equalization(self):
+        if self.equalize_method.get() == "global":
+            self.apply_operation(operations.equalization)
+            return
+        self.apply_operation(operations.clahe, float(self.clahe_clip_scale.get()),
+                             int(self.clahe_tiles_scale.get()))
 
     def apply_log_gamma(self):
-        def operation(img):
-            try:
-                gamma = float(self.gamma_entry.get())
-                array = np.array(img, dtype=np.float32) / 255.0
-                corrected = np.power(array, 1.0 / gamma)
-                result = (corrected * 255).astype(np.uint8)
-                return Image.fromarray(result)
-            except ValueError:
-                messagebox.showerror("Input Error", "Gamma value must be a number")
-                return img
-        self.apply_operation(operation)
+        if self.tone_curve.get() == "log":
+            self.apply_operation(operations.log_transform)
+            return
+        self.apply_operation(operations.log_gamma, float(self.gamma_scale.get()))
 
     def apply_edge_detection(self):
-        def operation(img):
-            method = self.edge_method.get()
-            if method == "sobel":
-                return img.filter(ImageFilter.FIND_EDGES)
-            elif method == "prewitt":
-                return img.filter(ImageFilter.EDGE_ENHANCE)
-            else:
-                return img.filter(ImageFilter.EDGE_ENHANCE_MORE)
-        self.apply_operation(operation)
+        method = self.edge_method.get()
+        if method != "canny":
+            self.apply_operation(operations.edge_detection, method)
+            return
+        try:
+            _, args = operations.parse_op(f"edges=canny,{self.canny_entry.get()}")
+        except ValueError as e:
+            messagebox.showerror("Input Error", f"Canny parameters are 'sigma,low,high' (e.g., 1.4,20,50): {e}")
+            return
+        self.apply_operation(operations.edge_detection, *args)
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import batch
+        sys.exit(batch.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "tiled":
+        import tiled
+        sys.exit(tiled.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "frames":
+        sys.exit(frames.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import server
+        sys.exit(server.main(sys.argv[2:]))
+
     root = tk.Tk()
     app = ImageToolkitApp(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""Grey-level morphology with a square structuring element, at constant cost per pixel.
+
+Erosion and dilation take the minimum or maximum over a size x size
+window. A square element is separable, so each is a running min or max
+down the columns and then along the rows, computed with the van Herk /
+Gil-Werman algorithm: the line is cut into blocks of the element size, a
+prefix extreme runs forwards through every block and a suffix extreme
+backwards, and every window, which spans the tail of one block and the
+head of the next, is the extreme of one suffix and one prefix value. That
+is three comparisons per pixel and axis whatever the element size. Small
+elements compare their few shifted copies directly, which is quicker.
+Opening, closing, top-hat and gradient are built from the two.
+
+Binary images (0 and 255) need no special case: min and max of 0/255
+values are binary erosion and dilation. Edge pixels are replicated, which
+for these operators is the same as ignoring pixels outside the image.
+Inputs are uint8, uint16 or float32 arrays, 2-D or with trailing
+channels; work runs in horizontal bands on a thread pool via
+edges.run_bands.
+"""
+import numpy as np
+
+import edges
+import filters
+
+# Up to this element size, comparing the size shifted copies of each line
+# directly (a few vectorised passes over contiguous memory) is quicker
+# than van Herk/Gil-Werman's block bookkeeping
+DIRECT_MAX = 21
+
+
+def _shifted(array, size, axis, ufunc):
+    """ufunc over windows of size along axis by comparing shifted copies"""
+    radius = size // 2
+    length = array.shape[axis]
+    pad = [(0, 0)] * array.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(array, pad, mode='edge')
+
+    def window(start):
+        index = [slice(None)] * array.ndim
+        index[axis] = slice(start, start + length)
+        return tuple(index)
+
+    out = padded[window(0)].copy()
+    for start in range(1, size):
+        ufunc(out, padded[window(start)], out=out)
+    return out
+
+
+def _van_herk(plane, size, ufunc):
+    """ufunc over windows of size down the columns of a 2-D plane (van Herk/Gil-Werman)"""
+    radius = size // 2
+    length = plane.shape[0]
+    # Pad to whole blocks of rows, with room for the last window
+    extra = -(length + 2 * radius) % size
+    padded = np.pad(plane, ((radius, radius + extra), (0, 0)), mode='edge')
+    blocks = padded.reshape(-1, size, plane.shape[1])
+    prefix = np.empty_like(blocks)
+    suffix = np.empty_like(blocks)
+    prefix[:, 0] = blocks[:, 0]
+    suffix[:, -1] = blocks[:, -1]
+    for j in range(1, size):
+        ufunc(prefix[:, j - 1], blocks[:, j], out=prefix[:, j])
+        ufunc(suffix[:, size - j], blocks[:, size - 1 - j], out=suffix[:, size - 1 - j])
+    prefix = prefix.reshape(padded.shape)
+    suffix = suffix.reshape(padded.shape)
+    # Window i covers padded rows i .. i + size - 1: the suffix from i and the prefix up to the end
+    out = suffix[:length]
+    ufunc(out, prefix[size - 1:size - 1 + length], out=out)
+    return out
+
+
+def _extreme_plane(plane, size, ufunc):
+    # Columns first; rows are columns of the transposed plane, where blocks are contiguous
+    down = _van_herk(plane, size, ufunc)
+    return np.ascontiguousarray(_van_herk(np.ascontiguousarray(down.T), size, ufunc).T)
+
+
+def _extreme(array, size, ufunc):
+    """ufunc over every size x size window (trailing axes are channels)"""
+    if size == 1:
+        return array.copy()
+    if size <= DIRECT_MAX:
+        return _shifted(_shifted(array, size, 1, ufunc), size, 0, ufunc)
+    if array.ndim == 2:
+        return _extreme_plane(array, size, ufunc)
+    return np.stack([_extreme_plane(array[..., c], size, ufunc) for c in range(array.shape[2])],
+                    axis=-1)
+
+
+def erode(array, size, workers=None):
+    """Minimum over every size x size window"""
+    size = filters.kernel_size(size)
+    return edges.run_bands(array, lambda rows: _extreme(rows, size, np.minimum),
+                           size // 2, workers)
+
+
+def dilate(array, size, workers=None):
+    """Maximum over every size x size window"""
+    size = filters.kernel_size(size)
+    return edges.run_bands(array, lambda rows: _extreme(rows, size, np.maximum),
+                           size // 2, workers)
+
+
+def _open(rows, size):
+    return _extreme(_extreme(rows, size, np.minimum), size, np.maximum)
+
+
+def _close(rows, size):
+    return _extreme(_extreme(rows, size, np.maximum), size, np.minimum)
+
+
+def opening(array, size, workers=None):
+    """Erosion then dilation: removes bright specks smaller than the element"""
+    size = filters.kernel_size(size)
+    return edges.run_bands(array, lambda rows: _open(rows, size), 2 * (size // 2), workers)
+
+
+def closing(array, size, workers=None):
+    """Dilation then erosion: fills dark holes and gaps smaller than the element"""
+    size = filters.kernel_size(size)
+    return edges.run_bands(array, lambda rows: _close(rows, size), 2 * (size // 2), workers)
+
+
+def top_hat(array, size, workers=None):
+    """White top-hat, array minus its opening: bright detail smaller than the element"""
+    size = filters.kernel_size(size)
+
+    def band(rows):
+        # The opening never exceeds the image, so unsigned data cannot wrap
+        return rows - _open(rows, size)
+
+    return edges.run_bands(array, band, 2 * (size // 2), workers)
+
+
+def gradient(array, size, workers=None):
+    """Morphological gradient, dilation minus erosion: outlines of edges"""
+    size = filters.kernel_size(size)
+
+    def band(rows):
+        return _extreme(rows, size, np.maximum) - _extreme(rows, size, np.minimum)
+
+    return edges.run_bands(array, band, size // 2, workers)
@@ -0,0 +1,630 @@
+"""GUI-free image operations shared by the desktop app and the batch mode"""
+import os
+
+from PIL import Image, ImageFilter
+import numpy as np
+
+import binarize
+import contrast
+import edges
+import filters
+import morphology
+
+
+# Images are worked on at their native depth: 16-bit grayscale stays
+# 'I;16' and floating point stays 'F' (nominal range 0-1). Everything else
+# is 8-bit RGB, except binary results of thresholding, which are a single
+# 8-bit band ('L'). Rounding to 8 bits happens only for display and for
+# export to formats that cannot hold the native depth.
+NATIVE_MODES = ('I;16', 'F')
+
+# Formats that can store a native mode as-is (PIL format name -> modes)
+NATIVE_FORMATS = {
+    'PNG': ('I;16',),
+    'TIFF': ('I;16', 'F'),
+}
+
+
+def normalize_mode(img):
+    """Working copy of a decoded image: 'I;16', 'F' or 'RGB'"""
+    if img.mode == 'F' or img.mode == 'I;16':
+        return img
+    if img.mode.startswith('I'):
+        # 'I', 'I;16B', ... : native-endian 16-bit, clipped like any 16-bit store
+        array = np.clip(np.asarray(img), 0, 65535).astype(np.uint16)
+        return Image.fromarray(array)
+    return img.convert('RGB')
+
+
+def open_image(path, draft_size=None):
+    """Decode an image file, keeping 16-bit and float data at full depth.
+
+    With draft_size (width, height), JPEGs are decoded at the smallest DCT
+    scale (1/2, 1/4 or 1/8) that still covers it; other formats ignore it.
+    """
+    with Image.open(path) as img:
+        if draft_size is not None:
+            img.draft(img.mode, draft_size)
+        img.load()
+        return normalize_mode(img)
+
+
+def image_size(path):
+    """(width, height) from the file header, without decoding pixels"""
+    with Image.open(path) as img:
+        return img.size
+
+
+def draft_size(chain):
+    """Size a chain's input can be drafted to, if it starts by shrinking"""
+    if chain and chain[0][0] in ("resize", "fit") and chain[0][1]:
+        return chain[0][1][0]
+    return None
+
+
+def to_8bit(img):
+    """8-bit view of a native-depth image, rounded (other images unchanged)"""
+    if img.mode == 'I;16':
+        return Image.fromarray(DISPLAY_LUT_16[np.asarray(img)])
+    if img.mode == 'F':
+        array = np.asarray(img) * np.float32(255)
+        np.clip(array, 0, 255, out=array)
+        return Image.fromarray(np.rint(array, out=array).astype(np.uint8))
+    return img
+
+
+def to_16bit(img):
+    """'I;16' copy of a float image, rounded"""
+    array = np.clip(np.asarray(img, dtype=np.float32), 0, 1) * np.float32(65535)
+    return Image.fromarray(np.rint(array, out=array).astype(np.uint16))
+
+
+def gray_levels(img):
+    """Grayscale float32 array on the 0-255 scale, without losing native precision"""
+    if img.mode == 'I;16':
+        return np.asarray(img, dtype=np.float32) / np.float32(257)
+    if img.mode == 'F':
+        return np.asarray(img, dtype=np.float32) * np.float32(255)
+    return np.asarray(img.convert('L'), dtype=np.float32)
+
+
+def _from_float(array, mode):
+    """Image of mode 'I;16' or 'F' from a float32 array on that mode's scale"""
+    if mode == 'I;16':
+        np.clip(array, 0, 65535, out=array)
+        return Image.fromarray(np.rint(array, out=array).astype(np.uint16))
+    return Image.fromarray(array)
+
+
+def export_image(img, fmt):
+    """img as it should be written in PIL format fmt.
+
+    Native depths are kept where the format allows; float data goes to
+    16 bits if the format can hold that, and is rounded to 8 bits otherwise.
+    """
+    if img.mode not in NATIVE_MODES:
+        return img
+    modes = NATIVE_FORMATS.get(fmt, ())
+    if img.mode in modes:
+        return img
+    if img.mode == 'F' and 'I;16' in modes:
+        return to_16bit(img)
+    return to_8bit(img)
+
+
+def save_image(img, path, **params):
+    """Save img to path at the deepest precision the file format supports"""
+    fmt = params.pop('format', None) or Image.registered_extensions().get(
+        os.path.splitext(path)[1].lower())
+    export_image(img, fmt).save(path, format=fmt, **params)
+
+
+# Point operations are per-value maps, so each one is a look-up table:
+# 256 entries for 8-bit data (any run of them composes into a single
+# table) and 65,536 entries for 16-bit data. Float data is mapped in place.
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+# The classic c * log(1 + r) curve on 8-bit levels, used at every depth
+LOG_GAIN = 255.0
+
+
+def _ramp(levels):
+    """Table inputs normalised to 0-1"""
+    return np.arange(levels, dtype=np.float64) / (levels - 1)
+
+
+def _quantise(values, levels):
+    """Round 0-1 table outputs to uint8 (256 levels) or uint16 entries"""
+    dtype = np.uint8 if levels == 256 else np.uint16
+    return np.rint(values * (levels - 1)).astype(dtype)
+
+
+def negative_lut(levels=256):
+    return _quantise(1.0 - _ramp(levels), levels)
+
+
+def threshold_lut(threshold=128):
+    return np.where(IDENTITY_LUT >= threshold, 255, 0).astype(np.uint8)
+
+
+def gamma_lut(gamma=2.2, levels=256):
+    return _quantise(np.power(_ramp(levels), 1.0 / gamma), levels)
+
+
+def log_lut(levels=256):
+    return _quantise(np.log1p(LOG_GAIN * _ramp(levels)) / np.log1p(LOG_GAIN), levels)
+
+
+DISPLAY_LUT_16 = _quantise(_ramp(65536), 256)
+
+
+def apply_lut(img, lut):
+    """Map every band of an 8-bit image through a 256-entry table in one pass"""
+    return img.point(lut.tolist() * len(img.getbands()))
+
+
+def _negative_float(array):
+    np.subtract(1.0, array, out=array)
+
+
+def _gamma_float(array, gamma=2.2):
+    np.maximum(array, 0, out=array)
+    np.power(array, 1.0 / gamma, out=array)
+
+
+def _log_float(array):
+    np.maximum(array, 0, out=array)
+    array *= LOG_GAIN
+    np.log1p(array, out=array)
+    array /= np.log1p(LOG_GAIN)
+
+
+def map_levels(img, lut_func, float_func, *args):
+    """Apply a point operation at the image's own depth"""
+    if img.mode == 'I;16':
+        return Image.fromarray(lut_func(*args, levels=65536)[np.asarray(img)])
+    if img.mode == 'F':
+        array = np.array(img, dtype=np.float32)
+        float_func(array, *args)
+        return Image.fromarray(array)
+    return apply_lut(img, lut_func(*args))
+
+
+def _kernel_native(img, image_filter):
+    """A built-in PIL kernel filter on a 16-bit or float image (NumPy, edges replicated)"""
+    (width, height), scale, offset, kernel = image_filter.filterargs
+    array = np.asarray(img, dtype=np.float32)
+    rows, cols = array.shape
+    padded = np.pad(array, ((height // 2,) * 2, (width // 2,) * 2), mode='edge')
+    out = np.zeros_like(array)
+    for i, weight in enumerate(kernel):
+        if weight:
+            y, x = divmod(i, width)
+            out += np.float32(weight / scale) * padded[y:y + rows, x:x + cols]
+    return _from_float(out, img.mode)
+
+
+def negative(img):
+    """Invert every channel"""
+    return map_levels(img, negative_lut, _negative_float)
+
+
+# Up to this kernel size Pillow's rank filter beats counting all 256 levels
+MEDIAN_PIL_MAX = 7
+
+
+def _filter_array(img, func, *args):
+    """Run an array filter on img's pixels, keeping its mode"""
+    return Image.fromarray(func(np.asarray(img), *args))
+
+
+def smoothing(img, kernel_size=3):
+    """Gaussian smoothing with exactly the given (odd) kernel size"""
+    return _filter_array(img, filters.gaussian, kernel_size)
+
+
+def box_smoothing(img, kernel_size=3):
+    """Exact mean over a kernel_size x kernel_size window"""
+    return _filter_array(img, filters.box, kernel_size)
+
+
+def median_smoothing(img, kernel_size=3):
+    """Exact median over a kernel_size x kernel_size window"""
+    kernel_size = filters.kernel_size(kernel_size)
+    if img.mode == 'I;16':
+        # Pillow ranks float images exactly; 16-bit values survive the round trip
+        ranked = img.convert('F').filter(ImageFilter.MedianFilter(kernel_size))
+        return Image.fromarray(np.asarray(ranked).astype(np.uint16))
+    if img.mode == 'F' or kernel_size <= MEDIAN_PIL_MAX:
+        return img.filter(ImageFilter.MedianFilter(kernel_size))
+    return _filter_array(img, filters.median, kernel_size)
+
+
+def blur(img):
+    """Plain box blur (fallback when no kernel size is given)"""
+    if img.mode in NATIVE_MODES:
+        return _kernel_native(img, ImageFilter.BLUR)
+    return img.filter(ImageFilter.BLUR)
+
+
+def sharpening(img, amount=1.5, radius=2):
+    """Unsharp mask: add amount times the detail lost to a Gaussian of this radius"""
+    return _filter_array(img, filters.unsharp, 2 * int(radius) + 1, amount)
+
+
+# Large downscales first shrink by an integer factor with Image.reduce()
+# (a box average) until within this factor of the target, then finish with
+# LANCZOS; the result is practically indistinguishable from a single pass.
+REDUCING_GAP = 2.0
+
+
+def fit_within(size, width, height):
+    """Largest size with the aspect ratio of size that fits width x height"""
+    w, h = size
+    scale = min(width / w, height / h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def resize(img, size, fit=False):
+    """Resize to an exact (width, height), or to fit within it keeping aspect"""
+    width, height = size
+    if width < 1 or height < 1:
+        raise ValueError(f"Size must be positive, not {width}x{height}")
+    if fit:
+        width, height = fit_within(img.size, width, height)
+    # Image.reduce has no 16-bit path
+    gap = None if img.mode == 'I;16' else REDUCING_GAP
+    return img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=gap)
+
+
+def fit(img, size):
+    """Resize to fit within (width, height), keeping the aspect ratio"""
+    return resize(img, size, fit=True)
+
+
+def thresholding(img, threshold=128):
+    """Binarise the grayscale image at a fixed threshold (0-255 at any depth)"""
+    if img.mode in NATIVE_MODES:
+        return Image.fromarray(binarize.binary(gray_levels(img) >= threshold))
+    return apply_lut(img.convert('L'), threshold_lut(threshold))
+
+
+def otsu_threshold(img):
+    """Binarise at the level Otsu's method picks from the 256-bin histogram"""
+    if img.mode in NATIVE_MODES:
+        gray = gray_levels(img)
+        hist = np.bincount(np.clip(gray, 0, 255).astype(np.uint8).ravel(), minlength=256)
+        return Image.fromarray(binarize.binary(gray >= binarize.otsu_level(hist)))
+    gray = img.convert('L')
+    return apply_lut(gray, threshold_lut(binarize.otsu_level(gray.histogram())))
+
+
+def _binarize_gray(img):
+    """uint8 grayscale, or 0-255 float32 levels at native depth"""
+    if img.mode in NATIVE_MODES:
+        return gray_levels(img)
+    return np.asarray(img.convert('L'))
+
+
+def adaptive_mean_threshold(img, window_size=31):
+    """Binarise against the mean of each pixel's window (minus a small offset)"""
+    return Image.fromarray(binarize.adaptive_mean(_binarize_gray(img), window_size))
+
+
+def adaptive_gaussian_threshold(img, window_size=31):
+    """Binarise against the Gaussian-weighted mean of each pixel's window"""
+    return Image.fromarray(binarize.adaptive_gaussian(_binarize_gray(img), window_size))
+
+
+def sauvola_threshold(img, window_size=31):
+    """Sauvola binarisation from each window's mean and standard deviation"""
+    return Image.fromarray(binarize.sauvola(_binarize_gray(img), window_size))
+
+
+def erosion(img, size=3):
+    """Minimum over a size x size square: shrinks bright regions"""
+    return _filter_array(img, morphology.erode, size)
+
+
+def dilation(img, size=3):
+    """Maximum over a size x size square: grows bright regions"""
+    return _filter_array(img, morphology.dilate, size)
+
+
+def opening(img, size=3):
+    """Erosion then dilation: removes bright specks smaller than the square"""
+    return _filter_array(img, morphology.opening, size)
+
+
+def closing(img, size=3):
+    """Dilation then erosion: fills dark holes and gaps smaller than the square"""
+    return _filter_array(img, morphology.closing, size)
+
+
+def top_hat(img, size=3):
+    """Image minus its opening: bright detail smaller than the square"""
+    return _filter_array(img, morphology.top_hat, size)
+
+
+def morph_gradient(img, size=3):
+    """Dilation minus erosion: region outlines"""
+    return _filter_array(img, morphology.gradient, size)
+
+
+def _on_levels(img, func):
+    """Run an equaliser on img's integer levels; colour images by luminance alone"""
+    if img.mode == 'RGB':
+        # Hue and saturation are left alone, so colours do not shift
+        y, cb, cr = img.convert('YCbCr').split()
+        return Image.merge('YCbCr', (Image.fromarray(func(np.asarray(y))), cb, cr)).convert('RGB')
+    if img.mode == 'F':
+        levels = np.rint(np.clip(np.asarray(img), 0, 1) * np.float32(65535)).astype(np.uint16)
+        return Image.fromarray(func(levels).astype(np.float32) / np.float32(65535))
+    return Image.fromarray(func(np.asarray(img)))
+
+
+def equalization(img):
+    """Global histogram equalisation"""
+    return _on_levels(img, contrast.equalize)
+
+
+def clahe(img, clip_limit=contrast.CLAHE_CLIP, tiles=contrast.CLAHE_TILES):
+    """Contrast-limited adaptive equalisation over a tiles x tiles grid"""
+    return _on_levels(img, lambda levels: contrast.clahe(levels, clip_limit, tiles))
+
+
+def log_gamma(img, gamma=2.2):
+    """Gamma correction with exponent 1/gamma"""
+    return map_levels(img, gamma_lut, _gamma_float, gamma)
+
+
+def log_transform(img):
+    """Logarithmic tone curve c * log(1 + r), brightening shadows"""
+    return map_levels(img, log_lut, _log_float)
+
+
+def check_edge_args(method="sobel", sigma=edges.CANNY_SIGMA, low=edges.CANNY_LOW,
+                    high=edges.CANNY_HIGH):
+    """Raise ValueError for an unknown method or unusable Canny parameters"""
+    if method not in ("sobel", "prewitt", "canny"):
+        raise ValueError(f"Unknown edge method '{method}'")
+    if not sigma > 0:
+        raise ValueError(f"Canny sigma must be positive, not {sigma}")
+    if not 0 <= low <= high:
+        raise ValueError(f"Canny thresholds need 0 <= low <= high, not {low}, {high}")
+
+
+def edge_detection(img, method="sobel", sigma=edges.CANNY_SIGMA, low=edges.CANNY_LOW,
+                   high=edges.CANNY_HIGH):
+    """Sobel or Prewitt gradient magnitude, or a Canny edge map (sigma, low, high as in edges.canny)"""
+    check_edge_args(method, sigma, low, high)
+    array = edges.detect(gray_levels(img), method, sigma=sigma, low=low, high=high)
+    return Image.fromarray(array).convert('RGB')
+
+
+def parse_size(text):
+    """Parse 'WxH' into a (width, height) tuple of positive sizes"""
+    width, height = map(int, text.lower().split('x'))
+    if width < 1 or height < 1:
+        raise ValueError(f"Size must be positive, not {width}x{height}")
+    return width, height
+
+
+# name -> (function, parameter parser); parser is None for parameterless ops
+OPERATIONS = {
+    "negative": (negative, None),
+    "smoothing": (smoothing, int),
+    "box": (box_smoothing, int),
+    "median": (median_smoothing, int),
+    "sharpening": (sharpening, (float, int)),
+    "resize": (resize, parse_size),
+    "fit": (fit, parse_size),
+    "threshold": (thresholding, int),
+    "otsu": (otsu_threshold, None),
+    "adaptive_mean": (adaptive_mean_threshold, int),
+    "adaptive_gaussian": (adaptive_gaussian_threshold, int),
+    "sauvola": (sauvola_threshold, int),
+    "erode": (erosion, int),
+    "dilate": (dilation, int),
+    "open": (opening, int),
+    "close": (closing, int),
+    "tophat": (top_hat, int),
+    "gradient": (morph_gradient, int),
+    "equalize": (equalization, None),
+    "clahe": (clahe, (float, int)),
+    "gamma": (log_gamma, float),
+    "log": (log_transform, None),
+    "edges": (edge_detection, (str, float, float, float)),
+}
+
+# function -> name, for recording steps so they can be replayed by name
+OP_NAMES = {func: name for name, (func, _) in OPERATIONS.items()}
+
+
+def parse_op(spec):
+    """Parse 'name' or 'name=value' into a picklable (name, args) step"""
+    name, _, value = spec.partition('=')
+    name = name.strip().lower()
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+    func, parser = OPERATIONS[name]
+    if parser is None:
+        if value:
+            raise ValueError(f"Operation '{name}' takes no value")
+        return name, ()
+    if not value:
+        return name, ()
+    if isinstance(parser, tuple):
+        # Several comma-separated values, trailing ones optional
+        values = value.split(',')
+        if len(values) > len(parser):
+            raise ValueError(f"Operation '{name}' takes at most {len(parser)} values")
+        args = tuple(p(v) for p, v in zip(parser, values))
+    else:
+        args = (parser(value),)
+    if name in PIXEL_ARGS and PIXEL_ARGS[name][1] == 'kernel':
+        # Rejected here, so a chain never fails part-way through
+        filters.kernel_size(args[0])
+    elif name == "edges":
+        check_edge_args(*args)
+    return name, args
+
+
+# Pixels of context each operation reads around an output pixel, so a
+# tile processed with this much halo matches the whole-image result.
+# None means the operation is not local (it cannot run tile by tile).
+HALOS = {
+    "negative": 0,
+    "threshold": 0,
+    "gamma": 0,
+    "log": 0,
+    "sharpening": lambda amount=1.5, radius=2: int(radius),
+    "edges": lambda method="sobel", *canny: None if method == "canny" else 1,
+    "smoothing": lambda kernel_size=3: filters.kernel_size(kernel_size) // 2,
+    "box": lambda kernel_size=3: filters.kernel_size(kernel_size) // 2,
+    "median": lambda kernel_size=3: filters.kernel_size(kernel_size) // 2,
+    "adaptive_mean": lambda window_size=31: filters.kernel_size(window_size) // 2,
+    "adaptive_gaussian": lambda window_size=31: filters.kernel_size(window_size) // 2,
+    "sauvola": lambda window_size=31: filters.kernel_size(window_size) // 2,
+    "erode": lambda size=3: filters.kernel_size(size) // 2,
+    "dilate": lambda size=3: filters.kernel_size(size) // 2,
+    "gradient": lambda size=3: filters.kernel_size(size) // 2,
+    "open": lambda size=3: 2 * (filters.kernel_size(size) // 2),
+    "close": lambda size=3: 2 * (filters.kernel_size(size) // 2),
+    "tophat": lambda size=3: 2 * (filters.kernel_size(size) // 2),
+    "otsu": None,
+    "equalize": None,
+    "clahe": None,
+    "resize": None,
+    "fit": None,
+}
+
+
+# Arguments that are lengths in pixels: name -> (argument index, kind).
+# A 'kernel' is an odd window size, a 'radius' a whole number of pixels
+# and a 'sigma' a Gaussian standard deviation.
+PIXEL_ARGS = {
+    "smoothing": (0, 'kernel'),
+    "box": (0, 'kernel'),
+    "median": (0, 'kernel'),
+    "adaptive_mean": (0, 'kernel'),
+    "adaptive_gaussian": (0, 'kernel'),
+    "sauvola": (0, 'kernel'),
+    "erode": (0, 'kernel'),
+    "dilate": (0, 'kernel'),
+    "open": (0, 'kernel'),
+    "close": (0, 'kernel'),
+    "tophat": (0, 'kernel'),
+    "gradient": (0, 'kernel'),
+    "sharpening": (1, 'radius'),
+    "edges": (1, 'sigma'),
+}
+
+
+def scale_args(func, args, scale):
+    """args for running func on a copy of the image resized by scale.
+
+    Window sizes, radii and sigmas shrink with the image, so a preview on
+    a downscaled proxy looks like the full-size result. Sobel and Prewitt
+    (a fixed 3x3 stencil) and the smallest windows cannot shrink further,
+    so their previews are approximate.
+    """
+    name = OP_NAMES.get(func)
+    if scale == 1 or name not in PIXEL_ARGS:
+        return args
+    index, kind = PIXEL_ARGS[name]
+    # Fill in defaults up to the scaled argument
+    values = list(args) + list(func.__defaults__[len(args):index + 1])
+    value = values[index] * scale
+    if kind == 'kernel':
+        value = max(1, 2 * round((value - 1) / 2) + 1)
+    elif kind == 'radius':
+        value = max(1, round(value))
+    values[index] = value
+    return tuple(values)
+
+
+def chain_halo(chain):
+    """Total halo needed by a chain; raises ValueError for non-local steps"""
+    total = 0
+    for name, args in chain:
+        halo = HALOS[name]
+        if callable(halo):
+            halo = halo(*args)
+        if halo is None:
+            raise ValueError(f"Operation '{name}' cannot run tile by tile")
+        total += halo
+    return total
+
+
+POINT_LUTS = {
+    "negative": negative_lut,
+    "threshold": threshold_lut,
+    "gamma": gamma_lut,
+    "log": log_lut,
+}
+
+FUSED_STEP = "point_lut"
+
+
+def point_lut(img, pre_lut, post_lut=None):
+    """Fused point step.
+
+    pre_lut is applied to every band. If a threshold was part of the run,
+    the image is then reduced to grayscale and post_lut is applied to the
+    single band, exactly as thresholding() does.
+    """
+    if pre_lut is not None:
+        img = apply_lut(img, np.frombuffer(pre_lut, dtype=np.uint8))
+    if post_lut is not None:
+        img = apply_lut(img.convert('L'), np.frombuffer(post_lut, dtype=np.uint8))
+    return img
+
+
+def fuse_chain(chain):
+    """Collapse each run of point operations into a single FUSED_STEP.
+
+    Results are identical to running the steps one by one; tables are
+    stored as bytes so fused chains stay picklable for worker processes.
+    """
+    fused = []
+    run = []
+
+    def flush():
+        if len(run) == 1:
+            fused.append(run[0])
+        elif run:
+            pre, post = None, None
+            for name, args in run:
+                lut = POINT_LUTS[name](*args)
+                if name == "threshold":
+                    # Grayscale conversion happens here; later tables apply to L
+                    post = lut if post is None else lut[post]
+                elif post is not None:
+                    post = lut[post]
+                else:
+                    pre = lut if pre is None else lut[pre]
+            fused.append((FUSED_STEP, (
+                None if pre is None else pre.tobytes(),
+                None if post is None else post.tobytes())))
+        run.clear()
+
+    for step in chain:
+        if step[0] in POINT_LUTS:
+            run.append(step)
+        else:
+            flush()
+            fused.append(step)
+    flush()
+    return fused
+
+
+def apply_chain(img, chain, fuse=True):
+    """Apply a sequence of (name, args) steps to an image"""
+    # Fused tables are 8-bit; native-depth images run step by step
+    if fuse and img.mode not in NATIVE_MODES:
+        chain = fuse_chain(chain)
+    for name, args in chain:
+        func = point_lut if name == FUSED_STEP else OPERATIONS[name][0]
+        img = func(img, *args)
+    return img
@@ -0,0 +1,87 @@
+"""One operation on one large image, spread over all cores.
+
+The image is split into horizontal bands. Each band is cropped with as
+many extra rows as the operation reads around a pixel (operations.HALOS),
+processed on a thread of its own, and pasted without its halo into a
+single preallocated result, so no full-size intermediate is built. Pillow's
+filters, point tables and resampling and NumPy's array loops release the
+GIL, so the bands genuinely run at once, and since every output pixel
+sees exactly the pixels it would see in the whole image the result is
+bit-identical to a single call. Banded NumPy filters inside the operation
+run serially meanwhile (edges.serial) rather than oversubscribing cores.
+Operations that are not local (Otsu, resize, Canny) run whole. There are
+a few bands per thread, and when called from a scheduler job each band
+first checks whether the job has been cancelled, so a superseded run stops
+after the bands already under way rather than finishing the image.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import edges
+import operations
+from scheduler import current_job
+
+# Below this many rows per band the halo and thread overhead outweigh the gain
+MIN_BAND_ROWS = 256
+# Bands per thread: points at which a cancelled job stops, and slack for uneven bands
+BANDS_PER_WORKER = 4
+
+
+def halo_for(func, args):
+    """Rows of context func reads around a pixel, or None if it cannot be split"""
+    if func is operations.point_lut:
+        return 0
+    name = operations.OP_NAMES.get(func)
+    if name is None:
+        return None
+    halo = operations.HALOS[name]
+    if callable(halo):
+        halo = halo(*args)
+    return halo
+
+
+def bands_for(height, workers, halo):
+    """Row ranges for workers bands, each much taller than its halo"""
+    rows = max(MIN_BAND_ROWS, 4 * halo)
+    return edges.band_rows(height, min(workers, max(1, height // rows)))
+
+
+def apply(func, image, args=(), workers=None):
+    """func(image, *args) computed band by band on up to workers threads"""
+    workers = workers or os.cpu_count() or 1
+    halo = halo_for(func, args)
+    if halo is None or workers == 1:
+        return func(image, *args)
+    bands = bands_for(image.height, workers * BANDS_PER_WORKER, halo)
+    if len(bands) == 1:
+        return func(image, *args)
+
+    width, height = image.size
+    result = []
+    lock = threading.Lock()
+    # Band threads are not the job's thread, so the job is looked up here
+    job = current_job()
+
+    def process(rows):
+        if job is not None:
+            job.check()
+        y0, y1 = rows
+        top, bottom = max(0, y0 - halo), min(height, y1 + halo)
+        with edges.serial():
+            part = func(image.crop((0, top, width, bottom)), *args)
+        if part.size != (width, bottom - top):
+            raise ValueError(f"{func.__name__} changed the size of a band")
+        if top != y0 or bottom != y1:
+            part = part.crop((0, y0 - top, width, y1 - top))
+        with lock:
+            if not result:
+                result.append(Image.new(part.mode, image.size))
+        # Bands are disjoint, so pastes from different threads never overlap
+        result[0].paste(part, (0, y0))
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(bands))) as executor:
+        list(executor.map(process, bands))
+    return result[0]
@@ -0,0 +1,233 @@
+"""Profiling and tracing of the toolkit's work.
+
+Spans record wall time, CPU time, peak traced memory and image
+dimensions for loads, operations, history pushes, display and saves.
+Recent spans feed a rolling summary; a session can be exported as a
+Chrome/Perfetto trace (chrome://tracing or ui.perfetto.dev) or, when
+enabled, as a cProfile dump of the code that ran inside spans.
+
+CPU time is process-wide, so it includes the helper threads an operation
+starts (banded filters), and overlapping spans count each other's work.
+Memory comes from tracemalloc, which sees Python and NumPy allocations
+but not Pillow's own pixel buffers; overlapping spans report the peak
+since the earliest of them started.
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+
+class Span:
+    """One timed piece of work (or, with wall None, an instant such as an error)"""
+    __slots__ = ('name', 'category', 'thread', 'thread_name', 'start', 'wall', 'cpu', 'peak', 'args')
+
+    def __init__(self, name, category, args):
+        thread = threading.current_thread()
+        self.name = name
+        self.category = category
+        self.thread = thread.ident
+        self.thread_name = thread.name
+        self.start = time.perf_counter()
+        self.wall = None
+        self.cpu = None
+        self.peak = None
+        self.args = args
+
+    def input(self, image):
+        self.args['input'] = describe(image)
+
+    def output(self, image):
+        self.args['output'] = describe(image)
+
+
+def describe(image):
+    return f"{image.width}x{image.height} {image.mode}"
+
+
+class _Snapshot:
+    """Stats of a cProfile.Profile taken without disabling it (for pstats)"""
+
+    def __init__(self, profile):
+        profile.snapshot_stats()
+        self.stats = profile.stats
+
+    def create_stats(self):
+        pass
+
+
+class Profiler:
+    """Collects spans from any thread; memory and cProfile tracking are opt-in"""
+
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+        self.origin = time.perf_counter()
+        self.cprofile = False
+        self._lock = threading.Lock()
+        self._memory_spans = 0
+        self._profiles = {}
+        self._local = threading.local()
+
+    @property
+    def memory(self):
+        return tracemalloc.is_tracing()
+
+    def set_memory(self, enabled):
+        """Start or stop tracemalloc (it slows allocation-heavy code down)"""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self._profiles = {}
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category='operation', image=None, **args):
+        """Time the enclosed block; yields the Span so output dimensions can be added"""
+        record = Span(name, category, args)
+        if image is not None:
+            record.input(image)
+        memory = tracemalloc.is_tracing()
+        if memory:
+            with self._lock:
+                if self._memory_spans == 0:
+                    tracemalloc.reset_peak()
+                self._memory_spans += 1
+            base = tracemalloc.get_traced_memory()[0]
+        profile = self._enter_profile()
+        cpu = time.process_time()
+        record.start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.args['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.wall = time.perf_counter() - record.start
+            record.cpu = time.process_time() - cpu
+            self._exit_profile(profile)
+            if memory:
+                record.peak = max(0, tracemalloc.get_traced_memory()[1] - base)
+                with self._lock:
+                    self._memory_spans -= 1
+            with self._lock:
+                self.spans.append(record)
+
+    def error(self, name, error):
+        """Record a failure as an instant event"""
+        record = Span(name, 'error', {'error': f"{type(error).__name__}: {error}"})
+        with self._lock:
+            self.spans.append(record)
+
+    def _enter_profile(self):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        if depth or not self.cprofile:
+            return None
+        with self._lock:
+            profile = self._profiles.setdefault(threading.get_ident(), cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler at a time
+            return None
+        return profile
+
+    def _exit_profile(self, profile):
+        self._local.depth -= 1
+        if profile is not None:
+            profile.disable()
+
+    # Reports
+    def summary(self, last=200):
+        """Per-name totals over the most recent spans, slowest total first"""
+        with self._lock:
+            spans = list(self.spans)[-last:]
+        rows = {}
+        for span in spans:
+            if span.wall is None:
+                continue
+            row = rows.setdefault(span.name, {'name': span.name, 'count': 0, 'wall': 0.0,
+                                              'cpu': 0.0, 'peak': None, 'size': None})
+            row['count'] += 1
+            row['wall'] += span.wall
+            row['cpu'] += span.cpu
+            if span.peak is not None:
+                row['peak'] = max(row['peak'] or 0, span.peak)
+            row['size'] = span.args.get('output') or span.args.get('input') or row['size']
+        return sorted(rows.values(), key=lambda row: -row['wall'])
+
+    def format_summary(self, limit=5, last=200):
+        """Rolling summary for the Quick Stats panel"""
+        rows = self.summary(last)[:limit]
+        if not rows:
+            return "Profile: no work recorded yet"
+        lines = [f"Profile (last {last} spans):"]
+        for row in rows:
+            line = (f"{row['name']} ×{row['count']}: {row['wall'] / row['count'] * 1000:.0f} ms avg, "
+                    f"cpu {row['cpu'] / row['count'] * 1000:.0f} ms")
+            if row['peak'] is not None:
+                line += f", peak {row['peak'] / 2 ** 20:.1f} MB"
+            lines.append(line)
+        errors = sum(1 for span in list(self.spans)[-last:] if span.category == 'error')
+        if errors:
+            lines.append(f"{errors} error(s)")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Trace Event Format dict (complete and instant events, thread names)"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events, threads = [], {}
+        for span in spans:
+            threads[span.thread] = span.thread_name
+            event = {
+                'name': span.name,
+                'cat': span.category,
+                'pid': pid,
+                'tid': span.thread,
+                'ts': (span.start - self.origin) * 1e6,
+                'args': dict(span.args),
+            }
+            if span.wall is None:
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=span.wall * 1e6)
+                event['args']['cpu_ms'] = round(span.cpu * 1000, 3)
+                if span.peak is not None:
+                    event['args']['peak_bytes'] = span.peak
+            events.append(event)
+        for tid, name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def save_cprofile(self, path):
+        """Write the merged cProfile data of every thread (pstats format)"""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        if not profiles:
+            raise ValueError("No cProfile data recorded; enable cProfile first")
+        stats = pstats.Stats(_Snapshot(profiles[0]))
+        for profile in profiles[1:]:
+            stats.add(_Snapshot(profile))
+        stats.dump_stats(path)
+
+
+# Shared by the app and the modules it calls
+profiler = Profiler()
+span = profiler.span
@@ -0,0 +1,203 @@
+"""Project files: a saved session as raw pixels plus an operation log.
+
+A project is a directory (``name.itproj``) holding:
+
+    project.json    format version, source file, current step and the
+                    operation log (name, arguments and base of each step)
+    original-*.npy  the original pixels
+    step-*.npy      optional snapshots of individual steps
+
+Pixels are plain NPY arrays laid out exactly as Pillow holds them in
+memory (RGB padded to four bytes per pixel), so reopening needs no
+decoding. 8-bit grayscale and 16-bit files are memory-mapped in place
+(read-only images backed by the file). RGB and float files are read with
+a single copy: Pillow maps padded RGB only as an 'RGBX' image and cannot
+map float pixels at all. Steps without a snapshot are replayed from
+their recorded operation the first time they are shown. Saving over an
+open project keeps the files it still maps and writes only new ones.
+"""
+import json
+import os
+import secrets
+import weakref
+
+import numpy as np
+from PIL import Image
+
+import operations
+import profiling
+from history import ORIGINAL
+
+PROJECT_EXTENSION = '.itproj'
+MANIFEST = 'project.json'
+FORMAT_VERSION = 1
+
+# mode -> (dtype, bands on disk); Pillow stores RGB pixels in four bytes
+PIXEL_LAYOUT = {
+    'L': (np.uint8, 1),
+    'RGB': (np.uint8, 4),
+    'I;16': (np.dtype('<u2'), 1),
+    'F': (np.float32, 1),
+}
+
+# id(image) -> (weakref to a mapped image, file it maps)
+_mapped = {}
+
+
+def is_project(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def write_pixels(path, image):
+    """Store an image's pixels as an NPY array in Pillow's memory layout"""
+    if image.mode not in PIXEL_LAYOUT:
+        raise ValueError(f"Cannot store {image.mode} images in a project")
+    dtype, bands = PIXEL_LAYOUT[image.mode]
+    rawmode = 'RGBX' if image.mode == 'RGB' else image.mode
+    width, height = image.size
+    shape = (height, width, bands) if bands > 1 else (height, width)
+    np.save(path, np.frombuffer(image.tobytes('raw', rawmode), dtype=dtype).reshape(shape))
+
+
+def map_pixels(path, mode):
+    """Image of a memory-mapped NPY file (backed by it directly where Pillow can map the mode)"""
+    array = np.load(path, mmap_mode='r')
+    dtype, bands = PIXEL_LAYOUT[mode]
+    height, width = array.shape[:2]
+    expected = (height, width, bands) if bands > 1 else (height, width)
+    if array.shape != expected or array.dtype != np.dtype(dtype):
+        raise ValueError(f"{os.path.basename(path)} does not hold {mode} pixels")
+    if mode == 'RGB':
+        # Pillow would map the padded pixels only as an 'RGBX' image
+        image = Image.frombytes(mode, (width, height), array, 'raw', 'RGBX')
+    else:
+        # Mapped images keep the array, and with it the mapping, alive; modes
+        # Pillow cannot map (float) are unpacked into the image's own memory
+        image = Image.frombuffer(mode, (width, height), array, 'raw', mode, 0, 1)
+    _mapped[id(image)] = (weakref.ref(image, lambda _, key=id(image): _mapped.pop(key, None)),
+                          os.path.abspath(path))
+    return image
+
+
+def _mapped_file(image):
+    entry = _mapped.get(id(image))
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+    return None
+
+
+def _encode_op(op):
+    if op is None:
+        return None, []
+    func, args = op
+    return operations.OP_NAMES.get(func), list(args)
+
+
+def _decode_args(value):
+    """JSON lists back to the tuples the operations take"""
+    if isinstance(value, list):
+        return tuple(_decode_args(v) for v in value)
+    return value
+
+
+def history_steps(history, snapshots=True):
+    """``(op, base, snapshot)`` for every step; call on the thread that owns history.
+
+    A snapshot is included only when history holds it without replaying
+    anything, and never when it is just another step's image.
+    """
+    steps = []
+    for i, (op, base) in enumerate(history.steps()):
+        image = history.cached(i) if snapshots and op is not None else None
+        if image is history.original:
+            image = None
+        steps.append((op, base, image))
+    return steps
+
+
+def save_project(path, original, steps, index, source=None):
+    """Write a project directory (steps as returned by history_steps)"""
+    with profiling.span('project.save', 'save', image=original, path=os.path.basename(path)):
+        _save_project(path, original, steps, index, source)
+
+
+def _save_project(path, original, steps, index, source):
+    path = os.path.abspath(path)
+    os.makedirs(path, exist_ok=True)
+    keep = {MANIFEST}
+
+    def store(image, stem):
+        existing = _mapped_file(image)
+        if existing is not None and os.path.dirname(existing) == path:
+            name = os.path.basename(existing)
+        else:
+            name = f"{stem}-{secrets.token_hex(4)}.npy"
+            write_pixels(os.path.join(path, name), image)
+        keep.add(name)
+        return name
+
+    records = []
+    for i, (op, base, image) in enumerate(steps):
+        name, args = _encode_op(op)
+        if op is not None and name is None and image is None:
+            raise ValueError(f"Step {i + 1} cannot be saved without a snapshot")
+        records.append({
+            'op': name,
+            'args': args,
+            'base': base,
+            'snapshot': store(image, f"step-{i}") if image is not None else None,
+            'mode': image.mode if image is not None else None,
+        })
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'source': source,
+        'mode': original.mode,
+        'size': list(original.size),
+        'original': store(original, 'original'),
+        'index': index,
+        'steps': records,
+    }
+    staging = os.path.join(path, MANIFEST + '.tmp')
+    with open(staging, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, os.path.join(path, MANIFEST))
+
+    # Files of earlier saves (ones still mapped elsewhere may refuse on Windows)
+    for name in os.listdir(path):
+        if name.endswith('.npy') and name not in keep:
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+
+def load_project(path):
+    """Map a project: returns (original, steps, index, source).
+
+    steps are ``(op, base, reload)`` tuples for History.restore; reload
+    maps the step's snapshot, or is None when the step is replayed.
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported project format {manifest.get('format')!r}")
+
+    original = map_pixels(os.path.join(path, manifest['original']), manifest['mode'])
+    steps = []
+    for i, record in enumerate(manifest['steps']):
+        op = None
+        if record['op'] is not None:
+            if record['op'] not in operations.OPERATIONS:
+                raise ValueError(f"Unknown operation '{record['op']}' in step {i + 1}")
+            op = (operations.OPERATIONS[record['op']][0], _decode_args(record['args']))
+        base = record['base']
+        if not ORIGINAL <= base < i:
+            raise ValueError(f"Step {i + 1} has an invalid base {base}")
+        reload = None
+        if record['snapshot'] is not None:
+            snapshot = os.path.join(path, record['snapshot'])
+            reload = lambda snapshot=snapshot, mode=record['mode']: map_pixels(snapshot, mode)
+        steps.append((op, base, reload))
+    return original, steps, manifest['index'], manifest.get('source')
+
@@ -0,0 +1,75 @@
+"""Multi-resolution image pyramids for fast display and preview"""
+import threading
+import weakref
+
+from PIL import Image
+
+from cache import IdentityCache
+
+
+def half(image):
+    """Both sides halved by 2x2 box averaging"""
+    if image.mode == 'I;16':
+        # Image.reduce has no 16-bit path; a BOX resize averages the same pixels
+        return image.resize((max(1, image.width // 2), max(1, image.height // 2)),
+                            Image.Resampling.BOX)
+    return image.reduce(2)
+
+
+class Pyramid:
+    """Lazily built chain of 2x box-reduced copies of an image.
+
+    Level 0 is the image itself; each further level halves both sides
+    with Image.reduce(2), which is far cheaper than resampling the full
+    image every time a screen-sized copy is needed. Level 0 is held
+    weakly so a pyramid never keeps a full-resolution image alive.
+    """
+
+    def __init__(self, image):
+        self._image_ref = weakref.ref(image)
+        self.size = image.size
+        self.levels = []
+        self._lock = threading.RLock()
+
+    @property
+    def image(self):
+        return self._image_ref()
+
+    def level(self, n):
+        """Level n, building intermediate levels on demand"""
+        if n == 0:
+            return self.image
+        with self._lock:
+            while len(self.levels) < n:
+                last = self.levels[-1] if self.levels else self.image
+                if min(last.size) < 2:
+                    break
+                self.levels.append(half(last))
+            return self.levels[min(n, len(self.levels)) - 1] if self.levels else self.image
+
+    def level_for(self, width, height):
+        """Smallest level still covering a width x height box"""
+        n = 0
+        w, h = self.size
+        while w // 2 >= width and h // 2 >= height and min(w, h) >= 2:
+            w, h = w // 2, h // 2
+            n += 1
+        return self.level(n)
+
+    def level_for_scale(self, scale):
+        """Smallest level with at least scale times the full resolution"""
+        n = 0
+        w, h = self.size
+        while scale * 2 ** (n + 1) <= 1 and min(w, h) >= 2:
+            w, h = w // 2, h // 2
+            n += 1
+        return self.level(n)
+
+
+# Room for both panes plus the prefetched neighbours of the current file
+_cache = IdentityCache(Pyramid, max_entries=8)
+
+
+def get_pyramid(image):
+    """Cached pyramid for image"""
+    return _cache.get(image)
@@ -0,0 +1,237 @@
+"""Cancellable job scheduler for background work.
+
+Jobs run on a bounded pool of worker threads. Jobs that share a key form
+a lane: they run one at a time, in order. Submitting to a lane cancels
+the stale jobs already in it (a newer parameter tweak supersedes the old
+run), and a request identical to one still pending is coalesced into it.
+Completion, error and progress callbacks are passed through a dispatch
+function, which the GUI points at ``master.after`` so they run on the Tk
+thread.
+"""
+import threading
+import time
+from collections import deque
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+
+def current_job():
+    """Job running on this thread, or None"""
+    return getattr(_local, 'job', None)
+
+
+def checkpoint():
+    """Abort the current job here if it has been cancelled"""
+    job = current_job()
+    if job is not None:
+        job.check()
+
+
+def report_progress(fraction, message=None):
+    """Report progress of the current job (no-op outside a job)"""
+    job = current_job()
+    if job is not None:
+        job.report(fraction, message)
+
+
+def _same_args(a, b):
+    """Argument tuples match; images and other objects compare by identity"""
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x is y:
+            continue
+        if isinstance(x, (int, float, str, bytes, tuple)) and type(x) is type(y) and x == y:
+            continue
+        return False
+    return True
+
+
+class Job:
+    """A unit of background work with cancellation, progress and timing"""
+
+    def __init__(self, scheduler, func, args, key, cancellable, on_done, on_error, on_progress):
+        self.scheduler = scheduler
+        self.func = func
+        self.args = args
+        self.key = key
+        self.cancellable = cancellable
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+
+    @property
+    def name(self):
+        return getattr(self.func, '__name__', repr(self.func))
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def wait_seconds(self):
+        return (self.started_at or time.perf_counter()) - self.queued_at
+
+    @property
+    def run_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def cancel(self):
+        self._cancelled.set()
+        self.scheduler._discard(self)
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, fraction, message=None):
+        if self.on_progress is not None and not self.cancelled:
+            self.scheduler.dispatch(self.on_progress, self, fraction, message)
+
+
+class Scheduler:
+    """Bounded worker pool with per-key lanes, supersession and coalescing"""
+
+    def __init__(self, workers=2, dispatch=None, history=50):
+        self.workers = max(1, workers)
+        self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self.finished = deque(maxlen=history)
+        self._queue = deque()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def submit(self, func, *args, key=None, cancellable=True, coalesce=True,
+               on_done=None, on_error=None, on_progress=None):
+        """Queue func(*args); returns the Job (an existing one when coalesced)"""
+        with self._cond:
+            if key is not None:
+                for job in self._lane(key):
+                    if coalesce and job.func == func and _same_args(job.args, args) and not job.cancelled:
+                        return job
+                for job in self._lane(key):
+                    if job.cancellable:
+                        job._cancelled.set()
+                        if job.state == QUEUED:
+                            self._queue.remove(job)
+                            job.state = CANCELLED
+            job = Job(self, func, args, key, cancellable, on_done, on_error, on_progress)
+            self._queue.append(job)
+            self._ensure_threads()
+            self._cond.notify()
+            return job
+
+    def cancel(self, key=None):
+        """Cancel every queued or running job (in one lane, if key is given)"""
+        with self._cond:
+            jobs = list(self._queue) + list(self._running.values())
+            for job in jobs:
+                if key is None or job.key == key:
+                    job._cancelled.set()
+                    if job.state == QUEUED:
+                        self._queue.remove(job)
+                        job.state = CANCELLED
+
+    def busy(self, key=None):
+        """Whether any job (in one lane, if key is given) is queued or running"""
+        with self._cond:
+            if key is None:
+                return bool(self._queue or self._running)
+            return any(True for _ in self._lane(key))
+
+    def shutdown(self):
+        """Cancel everything and let the worker threads exit"""
+        self.cancel()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    # Internals
+    def _lane(self, key):
+        for job in list(self._running.values()) + list(self._queue):
+            if job.key == key:
+                yield job
+
+    def _discard(self, job):
+        with self._cond:
+            if job.state == QUEUED and job in self._queue:
+                self._queue.remove(job)
+                job.state = CANCELLED
+
+    def _ensure_threads(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < min(self.workers, len(self._queue) + len(self._running)):
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"scheduler-{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self):
+        """Oldest queued job whose lane is free (called with the lock held)"""
+        busy_keys = {job.key for job in self._running.values() if job.key is not None}
+        for job in self._queue:
+            if job.key is None or job.key not in busy_keys:
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopping:
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                self._queue.remove(job)
+                job.state = RUNNING
+                job.started_at = time.perf_counter()
+                self._running[id(job)] = job
+            self._run(job)
+            with self._cond:
+                del self._running[id(job)]
+                self._cond.notify_all()
+
+    def _run(self, job):
+        _local.job = job
+        try:
+            job.check()
+            job.result = job.func(*job.args)
+            job.check()
+            job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.state = CANCELLED if job.cancelled else FAILED
+        finally:
+            _local.job = None
+            job.finished_at = time.perf_counter()
+            self.finished.append(job)
+
+        if job.state == DONE and job.on_done is not None:
+            self.dispatch(self._deliver, job, job.on_done, job.result)
+        elif job.state == FAILED and job.on_error is not None:
+            self.dispatch(self._deliver, job, job.on_error, job.error)
+
+    @staticmethod
+    def _deliver(job, callback, value):
+        # A job superseded after it finished must not deliver a stale result
+        if not job.cancelled:
+            callback(value)
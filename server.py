@@ -0,0 +1,481 @@
+"""Headless HTTP service that runs operation chains on posted images.
+
+    python main.py serve --port 8080 -j 4
+
+POST /process with the image file as the request body and the chain as
+repeated ``op`` query parameters (the batch syntax) returns the result:
+
+    curl --data-binary @in.jpg -o out.png \\
+        'http://127.0.0.1:8080/process?op=gamma=2.2&op=sharpening=1.5,2'
+
+``format`` picks the output format (png, jpeg, webp or tiff; default png)
+and ``quality`` the JPEG or WebP quality. GET /metrics reports queue
+depth, latency percentiles and throughput as JSON; GET /operations lists
+the operation names.
+
+Jobs run on a bounded process pool, and once max-queue requests are
+waiting new ones are turned away with 503 instead of piling up. No body
+is held twice: a small one is read straight into a single buffer, and a
+large one is spooled to a temporary file in chunks, decoded from there by
+the worker, whose result is written to a second file and streamed back.
+Requests are handed to the pool in arrival order as workers free up; small
+ones that queued meanwhile go out together as one task, so a burst of
+thumbnails pays the inter-process round trip once rather than per image.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+import edges
+import export
+import operations
+
+# Bodies up to this size are kept in memory and may be batched
+SMALL_REQUEST_BYTES = 1 << 20
+# Larger bodies are refused (413) before any of them is read
+MAX_BODY_BYTES = 1 << 30
+CHUNK_BYTES = 1 << 16
+MAX_BATCH = 16
+MAX_QUEUE = 64
+LATENCY_WINDOW = 2048
+THROUGHPUT_WINDOW_S = 60.0
+FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'jpg': 'JPEG', 'webp': 'WEBP', 'tiff': 'TIFF', 'tif': 'TIFF'}
+CONTENT_TYPES = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'TIFF': 'image/tiff'}
+
+_serial = False
+
+
+def _init_worker(serial):
+    global _serial
+    _serial = serial
+
+
+def _decode(source, chain):
+    return operations.open_image(source, operations.draft_size(chain))
+
+
+def _encode(image, fp, fmt, options):
+    operations.export_image(image, fmt).save(fp, format=fmt, **options)
+
+
+# Bodies for failed jobs; the exception text may name spool files, so it is only logged
+ERROR_BODIES = {400: "Cannot read or process the image\n", 500: "Internal server error\n"}
+
+
+def _status_for(error):
+    """HTTP status for a failed job: the client's fault or ours"""
+    if isinstance(error, (OSError, ValueError, Image.DecompressionBombError)):
+        return 400
+    return 500
+
+
+def process_bytes(chain, fmt, options, data):
+    """Encoded result of chain on an image file held in memory"""
+    with edges.serial() if _serial else contextlib.nullcontext():
+        result = operations.apply_chain(_decode(io.BytesIO(data), chain), chain)
+        out = io.BytesIO()
+        _encode(result, out, fmt, options)
+    return out.getvalue()
+
+
+def process_batch(jobs):
+    """Run several small jobs as one task: ``(status, bytes or message)`` per job"""
+    results = []
+    for job in jobs:
+        try:
+            results.append((200, process_bytes(*job)))
+        except Exception as e:
+            results.append((_status_for(e), str(e)))
+    return results
+
+
+def process_file(chain, fmt, options, source, target):
+    """Run chain on the image file source, writing the encoded result to target"""
+    with edges.serial() if _serial else contextlib.nullcontext():
+        result = operations.apply_chain(_decode(source, chain), chain)
+        with open(target, 'wb') as fp:
+            _encode(result, fp, fmt, options)
+    return os.path.getsize(target)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values, or None if empty"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, round(q / 100 * (len(values) - 1)))]
+
+
+class Metrics:
+    """Request counters, recent latencies and completion times, safe from any thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.finished = deque()
+        self.requests = self.completed = self.failed = self.rejected = 0
+        self.batches = self.batched = 0
+        self.bytes_in = self.bytes_out = 0
+
+    def count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def done(self, seconds, ok):
+        now = time.monotonic()
+        with self.lock:
+            self.latencies.append(seconds)
+            if ok:
+                self.completed += 1
+                self.finished.append(now)
+            else:
+                self.failed += 1
+            while self.finished and self.finished[0] < now - THROUGHPUT_WINDOW_S:
+                self.finished.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            while self.finished and self.finished[0] < now - THROUGHPUT_WINDOW_S:
+                self.finished.popleft()
+            latencies = sorted(self.latencies)
+            window = min(THROUGHPUT_WINDOW_S, now - self.started)
+            return {
+                'uptime_s': round(now - self.started, 1),
+                'requests': self.requests,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'latency_ms': {f'p{q}': round(percentile(latencies, q) * 1000, 2) if latencies else None
+                               for q in (50, 90, 95, 99)},
+                'throughput_rps': round(len(self.finished) / window, 2) if window > 0 else 0.0,
+                'batches': self.batches,
+                'mean_batch_size': round(self.batched / self.batches, 2) if self.batches else None,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            }
+
+
+class Job:
+    """One request's work: an in-memory body (data) or a spooled one (path)"""
+
+    def __init__(self, chain, fmt, options, data=None, path=None):
+        self.chain = chain
+        self.format = fmt
+        self.options = options
+        self.data = data
+        self.path = path
+        self.output = path + '.out' if path else None
+        self.future = Future()
+
+
+class Service:
+    """Bounded process pool fed in arrival order, batching small jobs that wait"""
+
+    def __init__(self, workers=None, max_queue=None, max_batch=MAX_BATCH):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue or MAX_QUEUE
+        self.max_batch = max_batch
+        self.metrics = Metrics()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.workers > 1,))
+        self.queue = deque()
+        self.accepted = 0
+        self.running = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.dispatcher = threading.Thread(target=self._dispatch, name='dispatcher', daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, job):
+        """Queue job; False if the queue is full"""
+        with self.cond:
+            if self.closed or self.accepted >= self.max_queue:
+                return False
+            self.accepted += 1
+            self.queue.append(job)
+            self.cond.notify()
+        return True
+
+    def release(self):
+        """A request has been answered; its place in the queue frees up"""
+        with self.cond:
+            self.accepted -= 1
+
+    def depth(self):
+        with self.cond:
+            return {'queue_depth': self.accepted, 'waiting': len(self.queue),
+                    'running_tasks': self.running, 'workers': self.workers,
+                    'max_queue': self.max_queue}
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                while not self.closed and (not self.queue or self.running >= self.workers):
+                    self.cond.wait()
+                if self.closed:
+                    return
+                jobs = [self.queue.popleft()]
+                if jobs[0].data is not None:
+                    while (self.queue and self.queue[0].data is not None
+                           and len(jobs) < self.max_batch):
+                        jobs.append(self.queue.popleft())
+                self.running += 1
+            try:
+                if jobs[0].path is not None:
+                    job = jobs[0]
+                    future = self.pool.submit(process_file, job.chain, job.format, job.options,
+                                              job.path, job.output)
+                else:
+                    future = self.pool.submit(process_batch, [
+                        (job.chain, job.format, job.options, job.data) for job in jobs])
+                    self.metrics.count('batches')
+                    self.metrics.count('batched', len(jobs))
+            except Exception as e:
+                self._finished(None)
+                for job in jobs:
+                    job.future.set_exception(e)
+                continue
+            future.add_done_callback(lambda f, jobs=jobs: self._finished(f, jobs))
+
+    def _finished(self, future, jobs=()):
+        with self.cond:
+            self.running -= 1
+            self.cond.notify()
+        if future is None:
+            return
+        error = future.exception()
+        if error is not None:
+            for job in jobs:
+                job.future.set_exception(error)
+        elif jobs[0].path is not None:
+            jobs[0].future.set_result((200, future.result()))
+        else:
+            for job, result in zip(jobs, future.result()):
+                job.future.set_result(result)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'DigitalImageToolkit'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def log_error(self, format, *args):
+        # Failures are logged with or without --verbose
+        super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type='text/plain; charset=utf-8'):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        view = memoryview(body)
+        for start in range(0, len(view), CHUNK_BYTES):
+            self.wfile.write(view[start:start + CHUNK_BYTES])
+
+    def send_file(self, path, content_type):
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        with open(path, 'rb') as fp:
+            while chunk := fp.read(CHUNK_BYTES):
+                self.wfile.write(chunk)
+        return size
+
+    def send_json(self, payload, status=200):
+        self.send_body(status, json.dumps(payload, indent=2) + "\n", 'application/json')
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            self.send_json({**self.service.depth(), **self.service.metrics.snapshot()})
+        elif path == '/operations':
+            self.send_json(sorted(operations.OPERATIONS))
+        else:
+            self.send_body(404, "Not found\n")
+
+    def read_body(self, length, spool):
+        """Read the request body in chunks into one buffer, or into the file spool"""
+        if spool is None:
+            data = bytearray(length)
+            view = memoryview(data)
+            got = 0
+            while got < length:
+                n = self.rfile.readinto(view[got:])
+                if not n:
+                    raise ConnectionError("request body ended early")
+                got += n
+            return data
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(CHUNK_BYTES, remaining))
+            if not chunk:
+                raise ConnectionError("request body ended early")
+            spool.write(chunk)
+            remaining -= len(chunk)
+        return None
+
+    def parse_request_options(self):
+        query = parse_qs(urlsplit(self.path).query)
+        chain = [operations.parse_op(spec) for spec in query.get('op', [])]
+        name = query.get('format', ['png'])[0].lower()
+        if name not in FORMATS:
+            raise ValueError(f"Unknown format '{name}' ({', '.join(FORMATS)})")
+        fmt = FORMATS[name]
+        overrides = {}
+        if 'quality' in query:
+            overrides['quality'] = int(query['quality'][0])
+        return chain, fmt, export.encoder_options(fmt, **overrides)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/process':
+            self.send_body(404, "Not found\n")
+            return
+        start = time.perf_counter()
+        self.service.metrics.count('requests')
+        try:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            self.close_connection = True
+            self.send_body(411, "Content-Length required\n")
+            return
+        if length < 0:
+            self.close_connection = True
+            self.send_body(400, "Invalid Content-Length\n")
+            return
+        if length > self.server.max_body:
+            self.close_connection = True
+            self.send_body(413, f"Body larger than {self.server.max_body} bytes\n")
+            return
+        try:
+            chain, fmt, options = self.parse_request_options()
+        except ValueError as e:
+            self.close_connection = True
+            self.send_body(400, f"{e}\n")
+            return
+
+        spool = None
+        try:
+            if length > SMALL_REQUEST_BYTES:
+                spool = tempfile.NamedTemporaryFile(prefix='dit-', suffix='.in', delete=False)
+            with spool if spool is not None else contextlib.nullcontext():
+                data = self.read_body(length, spool)
+            self.service.metrics.count('bytes_in', length)
+            job = Job(chain, fmt, options, data=data, path=spool.name if spool else None)
+            if not self.service.submit(job):
+                self.service.metrics.count('rejected')
+                self.send_body(503, "Queue full, retry later\n")
+                return
+            try:
+                status, result = job.future.result()
+            except Exception as e:
+                status, result = _status_for(e), str(e)
+            finally:
+                self.service.release()
+            if status != 200:
+                self.service.metrics.done(time.perf_counter() - start, ok=False)
+                self.log_error("%s failed with %d: %s", self.path, status, result)
+                self.send_body(status, ERROR_BODIES[status])
+                return
+            content_type = CONTENT_TYPES[fmt]
+            if job.output is not None:
+                sent = self.send_file(job.output, content_type)
+            else:
+                sent = len(result)
+                self.send_body(200, result, content_type)
+            self.service.metrics.count('bytes_out', sent)
+            self.service.metrics.done(time.perf_counter() - start, ok=True)
+        finally:
+            if spool is not None:
+                for name in (spool.name, spool.name + '.out'):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(name)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # A burst of clients connecting at once must not overflow the listen backlog
+    request_queue_size = 256
+
+
+def make_server(host, port, workers=None, max_queue=None, max_batch=MAX_BATCH, verbose=False,
+                max_body=MAX_BODY_BYTES):
+    """HTTP server bound to (host, port) with its own Service; call serve_forever()"""
+    server = Server((host, port), Handler)
+    server.verbose = verbose
+    server.max_body = max_body
+    server.service = Service(workers, max_queue, max_batch)
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Serve the toolkit's operations over HTTP: POST an image to "
+                    "/process?op=NAME[=VALUE]&... and get the result back; "
+                    "GET /metrics for queue depth, latency and throughput.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help=f"requests accepted at once before answering 503 (default: {MAX_QUEUE})")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help=f"small requests sent to a worker as one task (default: {MAX_BATCH})")
+    parser.add_argument("--max-body", type=int, default=MAX_BODY_BYTES >> 20, metavar="MB",
+                        help=f"largest request body accepted, in MB (default: {MAX_BODY_BYTES >> 20})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    return parser
+
+
+def main(argv):
+    args = build_parser().parse_args(argv)
+    try:
+        server = make_server(args.host, args.port, args.workers, args.max_queue,
+                             args.max_batch, args.verbose, args.max_body << 20)
+    except OSError as e:
+        print(f"Failed: {e}", file=sys.stderr)
+        return 1
+    service = server.service
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"with {service.workers} worker(s), queue {service.max_queue}")
+    # Shut the pool down on SIGTERM too, so no worker process outlives the server
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
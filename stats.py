@@ -0,0 +1,130 @@
+"""Histogram and statistics engine.
+
+Histograms are computed once per image with np.bincount and cached by
+image identity; every statistic is then derived from the histogram
+instead of re-reading the pixels. 16-bit and float images get a
+65,536-bin histogram, so their statistics keep native precision.
+"""
+import numpy as np
+
+from cache import IdentityCache
+from operations import NATIVE_MODES
+
+PERCENTILES = (1, 5, 50, 95, 99)
+HISTOGRAM_CHUNK = 1 << 16
+
+
+def histograms(img):
+    """256-bin histogram per channel plus a luminance histogram.
+
+    The channels of each chunk of pixels are counted by a single bincount,
+    offsetting every channel into its own block of 256 bins; chunking keeps
+    the widened index array small on very large images.
+    """
+    bands = img.getbands()
+    array = np.asarray(img).reshape(-1, len(bands))
+    offsets = np.arange(len(bands), dtype=np.intp) * 256
+
+    counts = np.zeros(len(bands) * 256, dtype=np.int64)
+    for start in range(0, array.shape[0], HISTOGRAM_CHUNK):
+        block = array[start:start + HISTOGRAM_CHUNK].astype(np.intp)
+        block += offsets
+        counts += np.bincount(block.reshape(-1), minlength=len(counts))
+
+    result = dict(zip(bands, counts.reshape(len(bands), 256)))
+    if bands == ('L',):
+        result['Luminance'] = result['L']
+    else:
+        luminance = np.asarray(img.convert('L')).reshape(-1)
+        result['Luminance'] = np.bincount(luminance, minlength=256)
+    return result
+
+
+def native_histogram(img):
+    """65,536-bin histogram of an 'I;16' or 'F' image (floats quantised over 0-1)"""
+    if img.mode == 'F':
+        array = np.clip(np.asarray(img), 0, 1) * np.float32(65535)
+        array = np.rint(array, out=array).astype(np.uint16)
+    else:
+        array = np.asarray(img)
+    return np.bincount(array.reshape(-1), minlength=65536)
+
+
+def describe(hist, scale=1):
+    """Mean, std, min, max, percentiles and entropy (bits) of a histogram.
+
+    Levels are bin indices times scale; with the default scale of 1 the
+    min, max and percentiles are ints.
+    """
+    total = int(hist.sum())
+    if total == 0:
+        return None
+    levels = np.arange(len(hist), dtype=np.float64)
+    mean = float((hist * levels).sum() / total)
+    variance = float((hist * (levels - mean) ** 2).sum() / total)
+    nonzero = np.flatnonzero(hist)
+    cumulative = np.cumsum(hist)
+    probabilities = hist[nonzero] / total
+    return {
+        'count': total,
+        'mean': mean * scale,
+        'std': variance ** 0.5 * scale,
+        'min': int(nonzero[0]) * scale,
+        'max': int(nonzero[-1]) * scale,
+        'percentiles': {q: int(np.searchsorted(cumulative, total * q / 100.0)) * scale
+                        for q in PERCENTILES},
+        'entropy': float(-(probabilities * np.log2(probabilities)).sum()),
+    }
+
+
+def compute(img):
+    """Histograms and derived statistics for img.
+
+    'histograms' always holds 256-bin histograms for plotting; for native
+    depths the statistics come from the full-resolution histogram.
+    """
+    if img.mode in NATIVE_MODES:
+        hist = native_histogram(img)
+        desc = describe(hist, 1 / 65535 if img.mode == 'F' else 1)
+        folded = hist.reshape(256, 256).sum(axis=1)
+        return {
+            'histograms': {'L': folded, 'Luminance': folded},
+            'channels': {'L': desc, 'Luminance': desc},
+            'float': img.mode == 'F',
+        }
+    hists = histograms(img)
+    return {
+        'histograms': hists,
+        'channels': {name: describe(hist) for name, hist in hists.items()},
+        'float': False,
+    }
+
+
+_cache = IdentityCache(compute, max_entries=16)
+
+
+def image_stats(img):
+    """Cached statistics for img (one entry per history state)"""
+    return _cache.get(img)
+
+
+def format_summary(stats):
+    """Short multi-line summary for the Quick Stats panel"""
+    lum = stats['channels']['Luminance']
+    p = lum['percentiles']
+    precision = 4 if stats['float'] else 1
+
+    def level(value):
+        return f"{value:.4f}" if stats['float'] else str(value)
+
+    lines = [
+        f"Mean: {lum['mean']:.{precision}f}  Std: {lum['std']:.{precision}f}",
+        f"Min/Max: {level(lum['min'])} / {level(lum['max'])}",
+        f"P1/P50/P99: {level(p[1])} / {level(p[50])} / {level(p[99])}",
+        f"Entropy: {lum['entropy']:.2f} bits",
+    ]
+    channel_means = [f"{name} {desc['mean']:.0f}" for name, desc in stats['channels'].items()
+                     if name not in ('Luminance', 'L')]
+    if channel_means:
+        lines.append("Means: " + "  ".join(channel_means))
+    return "\n".join(lines)
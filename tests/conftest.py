@@ -0,0 +1,24 @@
+"""Shared fixtures; the toolkit's modules live in the repository root"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+@pytest.fixture
+def rgb_image(rng):
+    """Small noisy RGB image with some smooth structure"""
+    y, x = np.mgrid[0:61, 0:83]
+    ramp = (x * 3 + y * 2) % 256
+    noise = rng.integers(0, 64, (61, 83, 3))
+    array = (ramp[:, :, None] + noise).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(array, 'RGB')
@@ -0,0 +1,63 @@
+"""Otsu, adaptive and Sauvola thresholds against their direct formulas"""
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import binarize
+import filters
+
+
+def windows(array, size):
+    radius = size // 2
+    return sliding_window_view(np.pad(array.astype(np.float64), radius, mode='edge'), (size, size))
+
+
+def assert_thresholded(result, gray, threshold, tolerance=1e-3):
+    """result is gray > threshold, except where float32 rounding may tip a pixel at the threshold"""
+    expected = np.where(gray > threshold, 255, 0)
+    differ = result != expected
+    assert not (differ & (np.abs(gray - threshold) > tolerance)).any()
+
+
+@pytest.fixture
+def gray(rng):
+    # Uneven lighting, so local and global thresholds disagree
+    y, x = np.mgrid[0:70, 0:53]
+    return np.clip(x * 2 + y + rng.integers(0, 90, (70, 53)), 0, 255).astype(np.uint8)
+
+
+def test_otsu_maximises_between_class_variance(gray):
+    values = gray.ravel().astype(np.float64)
+    best, level = -1, None
+    for t in range(1, 256):
+        low, high = values[values < t], values[values >= t]
+        if not len(low) or not len(high):
+            continue
+        between = len(low) * len(high) * (low.mean() - high.mean()) ** 2
+        if between > best + 1e-6:
+            best, level = between, t
+    hist = np.bincount(gray.ravel(), minlength=256)
+    # Empty bins between the classes give the same split; the first is picked
+    assert binarize.otsu_level(hist) <= level
+    assert (gray >= binarize.otsu_level(hist)).sum() == (gray >= level).sum()
+
+
+@pytest.mark.parametrize("size", [3, 15, 31])
+def test_adaptive_mean(gray, size):
+    threshold = windows(gray, size).mean(axis=(-2, -1)) - binarize.ADAPTIVE_OFFSET
+    assert_thresholded(binarize.adaptive_mean(gray, size, workers=2), gray, threshold)
+
+
+def test_adaptive_gaussian(gray):
+    threshold = filters.gaussian(gray, 15).astype(np.float64) - binarize.ADAPTIVE_OFFSET
+    assert_thresholded(binarize.adaptive_gaussian(gray, 15), gray, threshold)
+
+
+@pytest.mark.parametrize("size", [3, 15, 31])
+@pytest.mark.parametrize("dtype", [np.uint8, np.float32])
+def test_sauvola(gray, size, dtype):
+    array = gray.astype(dtype)
+    view = windows(array, size)
+    mean, std = view.mean(axis=(-2, -1)), view.std(axis=(-2, -1))
+    threshold = mean * (1 + binarize.SAUVOLA_K * (std / binarize.SAUVOLA_RANGE - 1))
+    assert_thresholded(binarize.sauvola(array, size, workers=2), array, threshold, tolerance=0.01)
@@ -0,0 +1,91 @@
+"""Decoded-file cache: invalidation on change and the byte budget"""
+import os
+import threading
+
+from PIL import Image
+
+from cache import DecodedCache
+from history import image_nbytes
+
+
+class Loader:
+    """Image.open + load, counting decodes"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, path):
+        self.calls.append(os.path.basename(path))
+        with Image.open(path) as image:
+            image.load()
+            return image.copy()
+
+
+def save(path, color, size=(20, 10)):
+    Image.new('RGB', size, color).save(path)
+    return str(path)
+
+
+def test_changed_file_is_decoded_again(tmp_path):
+    loader = Loader()
+    cache = DecodedCache(loader)
+    path = save(tmp_path / "a.png", 'red')
+    first = cache.get(path)
+    assert cache.get(path) is first and cache.lookup(path) is first
+    assert loader.calls == ["a.png"]
+
+    # Same size on disk, newer mtime
+    save(path, 'blue')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.lookup(path) is None
+    assert cache.get(path).getpixel((0, 0)) == (0, 0, 255)
+    # Different size, same mtime
+    mtime = os.stat(path).st_mtime_ns
+    save(path, 'green', size=(30, 10))
+    os.utime(path, ns=(mtime, mtime))
+    assert cache.get(path).size == (30, 10)
+    assert loader.calls == ["a.png"] * 3
+    # Stale versions were dropped rather than kept against the budget
+    assert cache.nbytes == image_nbytes(cache.lookup(path))
+
+    os.remove(path)
+    assert cache.lookup(path) is None
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    paths = [save(tmp_path / f"{name}.png", 'gray') for name in "abc"]
+    one = 20 * 10 * 3
+    cache = DecodedCache(Loader(), max_bytes=2 * one)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.lookup(paths[0])
+    cache.get(paths[2])
+    assert cache.nbytes == 2 * one
+    assert cache.lookup(paths[1]) is None
+    assert cache.lookup(paths[0]) is not None and cache.lookup(paths[2]) is not None
+
+    # An image larger than the whole budget is never cached
+    big = save(tmp_path / "big.png", 'gray', size=(100, 100))
+    cache.get(big)
+    assert cache.lookup(big) is None and cache.nbytes == 2 * one
+
+
+def test_concurrent_requests_share_one_decode(tmp_path):
+    path = save(tmp_path / "a.png", 'red')
+    gate = threading.Event()
+    loader = Loader()
+
+    def slow(path):
+        gate.wait(5)
+        return loader(path)
+    cache = DecodedCache(slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(path))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 4 and all(image is results[0] for image in results)
+    assert loader.calls == ["a.png"]
@@ -0,0 +1,80 @@
+"""Histogram equalisation and CLAHE against direct per-pixel computations"""
+import numpy as np
+import pytest
+
+import contrast
+
+
+def test_equalize_matches_cumulative_histogram(rng):
+    array = rng.integers(40, 180, (31, 45), dtype=np.uint8)
+    cdf = np.cumsum(np.bincount(array.ravel(), minlength=256))
+    first = cdf[array.min()]
+    expected = np.rint((cdf[array] - first) / (array.size - first) * 255)
+    result = contrast.equalize(array)
+    np.testing.assert_array_equal(result, expected.astype(np.uint8))
+    assert result.min() == 0 and result.max() == 255
+
+
+def test_equalize_flat_image_is_unchanged():
+    array = np.full((8, 8), 77, dtype=np.uint8)
+    np.testing.assert_array_equal(contrast.equalize(array), array)
+
+
+def brute_clahe(array, clip_limit, tiles):
+    """CLAHE one pixel at a time: clipped tile tables blended bilinearly by tile centre (0: no clipping)"""
+    height, width = array.shape
+    levels = 256 if array.dtype == np.uint8 else 65536
+    shift = int(np.log2(levels // contrast.CLAHE_BINS))
+    ys = [i * height // tiles for i in range(tiles + 1)]
+    xs = [i * width // tiles for i in range(tiles + 1)]
+
+    hists = np.zeros((tiles, tiles, contrast.CLAHE_BINS))
+    for ty in range(tiles):
+        for tx in range(tiles):
+            block = array[ys[ty]:ys[ty + 1], xs[tx]:xs[tx + 1]] >> shift
+            hist = np.bincount(block.ravel(), minlength=contrast.CLAHE_BINS).astype(float)
+            if clip_limit > 0:
+                limit = max(hist.sum() * clip_limit / contrast.CLAHE_BINS, 1.0)
+                excess = np.maximum(hist - limit, 0).sum()
+                hist = np.minimum(hist, limit) + excess / contrast.CLAHE_BINS
+            hists[ty, tx] = hist
+
+    def table(ty, tx, level):
+        hist = hists[ty, tx]
+        b = level >> shift
+        within = ((level & ((1 << shift) - 1)) + 1) / (1 << shift)
+        return (hist[:b].sum() + hist[b] * within) * (levels - 1) / hist.sum()
+
+    def neighbours(position, bounds):
+        centres = [(bounds[i] + bounds[i + 1] - 1) / 2 for i in range(len(bounds) - 1)]
+        lower = max(0, sum(c <= position for c in centres) - 1)
+        upper = min(lower + 1, len(centres) - 1)
+        if upper == lower:
+            return lower, upper, 0.0
+        weight = (position - centres[lower]) / (centres[upper] - centres[lower])
+        return lower, upper, min(max(weight, 0.0), 1.0)
+
+    out = np.empty(array.shape)
+    for y in range(height):
+        t0, t1, wy = neighbours(y, ys)
+        for x in range(width):
+            s0, s1, wx = neighbours(x, xs)
+            level = int(array[y, x])
+            left = table(t0, s0, level) * (1 - wy) + table(t1, s0, level) * wy
+            right = table(t0, s1, level) * (1 - wy) + table(t1, s1, level) * wy
+            out[y, x] = left * (1 - wx) + right * wx
+    return out
+
+
+@pytest.mark.parametrize("dtype, top", [(np.uint8, 256), (np.uint16, 65536)])
+@pytest.mark.parametrize("clip_limit, tiles", [(2.0, 4), (0.0, 3), (4.0, 1)])
+def test_clahe_matches_brute_force(rng, dtype, top, clip_limit, tiles):
+    y, x = np.mgrid[0:42, 0:57]
+    # Uneven lighting plus noise, so the tiles' histograms differ
+    base = (x + y) / (42 + 57) * 0.6 * top + rng.integers(0, top // 4, (42, 57))
+    array = np.clip(base, 0, top - 1).astype(dtype)
+    result = contrast.clahe(array, clip_limit, tiles, workers=2)
+    assert result.dtype == array.dtype
+    expected = brute_clahe(array, clip_limit, tiles)
+    # float32 blending may round a level the other way
+    assert np.abs(result.astype(np.float64) - np.rint(expected)).max() <= 1
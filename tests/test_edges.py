@@ -0,0 +1,61 @@
+"""Edge detectors against direct 3x3 convolutions and whole-image runs"""
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import edges
+
+
+def brute_gradients(gray, method):
+    """gx and gy from the full 3x3 kernels, one window at a time"""
+    smooth = edges.SMOOTHING[method].astype(np.float64)
+    derivative = edges.DERIVATIVE.astype(np.float64)
+    kx = np.outer(smooth, derivative) / smooth.sum()
+    ky = np.outer(derivative, smooth) / smooth.sum()
+    view = sliding_window_view(np.pad(gray.astype(np.float64), 1, mode='edge'), (3, 3))
+    return (view * kx).sum(axis=(-2, -1)), (view * ky).sum(axis=(-2, -1))
+
+
+@pytest.fixture
+def gray(rng):
+    return rng.integers(0, 256, (150, 41)).astype(np.float32)
+
+
+@pytest.mark.parametrize("method", ["sobel", "prewitt"])
+def test_gradients_match_direct_convolution(gray, method):
+    gx, gy = brute_gradients(gray, method)
+    magnitude, direction = edges.magnitude_direction(gray, method, workers=1)
+    np.testing.assert_allclose(magnitude, np.hypot(gx, gy), rtol=1e-5, atol=1e-3)
+    strong = magnitude > 1
+    np.testing.assert_allclose(direction[strong], np.arctan2(gy, gx)[strong], atol=1e-4)
+    expected = np.clip(np.hypot(gx, gy), 0, 255)
+    assert np.abs(edges.detect(gray, method).astype(float) - expected).max() <= 1
+
+
+@pytest.mark.parametrize("method", ["sobel", "prewitt", "canny"])
+def test_bands_match_one_worker(monkeypatch, gray, method):
+    # Bands of 16 rows put several band boundaries inside the image
+    monkeypatch.setattr(edges, "MIN_BAND_ROWS", 16)
+    np.testing.assert_array_equal(edges.detect(gray, method, workers=6),
+                                  edges.detect(gray, method, workers=1))
+    if method != "canny":
+        banded = edges.magnitude_direction(gray, method, workers=6)
+        whole = edges.magnitude_direction(gray, method, workers=1)
+        for a, b in zip(banded, whole):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_hysteresis_keeps_weak_edges_touching_strong_ones():
+    magnitude = np.zeros((9, 12), dtype=np.float32)
+    # A weak run attached diagonally to a strong pixel
+    magnitude[1, 1] = 90
+    magnitude[2, 2] = magnitude[3, 3] = magnitude[3, 4] = 30
+    # A weak run with no strong pixel
+    magnitude[6, 1:6] = 30
+    # An isolated strong pixel, and a weak one next to it only through a gap
+    magnitude[6, 10] = 90
+    magnitude[8, 10] = 30
+    expected = np.zeros(magnitude.shape, dtype=bool)
+    expected[1, 1] = expected[2, 2] = expected[3, 3] = expected[3, 4] = True
+    expected[6, 10] = True
+    np.testing.assert_array_equal(edges.hysteresis(magnitude, 20, 50), expected)
@@ -0,0 +1,66 @@
+"""Encoder options and parallel export against encoding each target directly"""
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import export
+import operations
+
+
+def test_encoder_options_defaults_and_overrides():
+    assert export.encoder_options('JPEG') == export.ENCODER_OPTIONS['JPEG']
+    options = export.encoder_options('JPEG', quality=70, progressive=True)
+    assert options == dict(export.ENCODER_OPTIONS['JPEG'], quality=70, progressive=True)
+    # The defaults themselves are never modified
+    assert export.ENCODER_OPTIONS['JPEG']['quality'] == 90
+    assert export.encoder_options('BMP') == {}
+
+
+@pytest.mark.parametrize("fmt, overrides", [
+    ('PNG', {'quality': 90}),
+    ('JPEG', {'lossless': True}),
+    ('JPEG', {'quality': 0}),
+    ('JPEG', {'quality': 101}),
+    ('WEBP', {'quality': -1}),
+])
+def test_bad_encoder_options_are_rejected(fmt, overrides):
+    with pytest.raises(ValueError):
+        export.encoder_options(fmt, **overrides)
+
+
+def test_export_all_matches_direct_saves(tmp_path, rgb_image):
+    big = rgb_image.resize((400, 300))
+    targets = [
+        export.Target(str(tmp_path / "a.png"), compress_level=1),
+        export.Target(str(tmp_path / "b.jpg"), quality=75, subsampling='4:4:4'),
+        export.Target(str(tmp_path / "c.webp"), lossless=True),
+        export.Target(str(tmp_path / "d.tif"), compression='tiff_adobe_deflate'),
+        export.Target(str(tmp_path / "e.jpg"), size=(100, 100)),
+    ]
+    reports = export.export_all(big, targets, workers=3)
+    assert [r['path'] for r in reports] == [t.path for t in targets]
+
+    for target, report in zip(targets, reports):
+        image = big if target.size is None else operations.fit(big, target.size)
+        expected = io.BytesIO()
+        image.save(expected, format=target.format, **target.options)
+        # TIFF headers differ between files and buffers, so compare what decodes
+        with Image.open(target.path) as written, Image.open(expected) as direct:
+            assert written.format == target.format
+            np.testing.assert_array_equal(np.asarray(written), np.asarray(direct), target.path)
+        assert report['bytes'] == os.path.getsize(target.path)
+        assert report['size'] == image.size
+    assert reports[-1]['size'] == (100, 75)
+    with Image.open(targets[2].path) as webp:
+        np.testing.assert_array_equal(np.asarray(webp), np.asarray(big))
+
+
+def test_web_set_targets(tmp_path):
+    targets = export.set_targets(str(tmp_path / "photo.tif"), {'JPEG': {'subsampling': '4:4:4'}})
+    assert [os.path.basename(t.path) for t in targets] == \
+        ["photo.png", "photo_web.jpg", "photo_thumb.jpg"]
+    assert [t.size for t in targets] == [None, (2048, 2048), (256, 256)]
+    assert targets[1].options['quality'] == 85 and targets[1].options['subsampling'] == '4:4:4'
@@ -0,0 +1,44 @@
+"""Box and median filters against brute-force window computations"""
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import filters
+
+
+def windows(array, size):
+    """Every size x size window of array with edges replicated, as trailing axes"""
+    radius = size // 2
+    pad = [(radius, radius), (radius, radius)] + [(0, 0)] * (array.ndim - 2)
+    return sliding_window_view(np.pad(array, pad, mode='edge'), (size, size), axis=(0, 1))
+
+
+@pytest.fixture
+def levels(rng):
+    return rng.integers(0, 256, (37, 29, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("size", [1, 3, 5, 9, 21])
+def test_box_matches_brute_force(levels, size):
+    sums = windows(levels.astype(np.int64), size).sum(axis=(-2, -1))
+    area = size * size
+    expected = ((sums + area // 2) // area).astype(np.uint8)
+    np.testing.assert_array_equal(filters.box(levels, size), expected)
+
+
+def test_box_of_float_data(rng):
+    array = rng.random((23, 31), dtype=np.float32)
+    expected = windows(array.astype(np.float64), 5).mean(axis=(-2, -1))
+    np.testing.assert_allclose(filters.box(array, 5), expected, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("size", [1, 3, 5, 11])
+def test_median_matches_brute_force(levels, size):
+    expected = np.median(windows(levels, size), axis=(-2, -1)).astype(np.uint8)
+    np.testing.assert_array_equal(filters.median(levels, size), expected)
+
+
+@pytest.mark.parametrize("size", [0, 2, 4, -3])
+def test_even_or_empty_kernel_is_rejected(size):
+    with pytest.raises(ValueError):
+        filters.kernel_size(size)
@@ -0,0 +1,81 @@
+"""Streaming multi-frame files against processing each frame on its own"""
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+
+import frames
+import operations
+
+CHAIN = [("negative", ()), ("smoothing", (3,))]
+
+
+@pytest.fixture
+def pages(rng):
+    return [Image.fromarray(rng.integers(0, 256, (24, 31, 3), dtype=np.uint8)) for _ in range(5)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_multipage_tiff_round_trip(tmp_path, pages, workers):
+    source, output = str(tmp_path / "in.tif"), str(tmp_path / "out.tif")
+    pages[0].save(source, save_all=True, append_images=pages[1:])
+
+    report = frames.stream(source, output, CHAIN, workers=workers)
+
+    assert report['frames'] == len(pages) and report['size'] == (31, 24)
+    with Image.open(output) as result:
+        assert result.n_frames == len(pages)
+        for page, written in zip(pages, ImageSequence.Iterator(result)):
+            expected = operations.apply_chain(page, CHAIN)
+            np.testing.assert_array_equal(np.asarray(written.convert('RGB')), np.asarray(expected))
+
+
+def test_gif_keeps_frame_durations(tmp_path):
+    colours = [(200, 30, 30), (30, 200, 30), (30, 30, 200)]
+    durations = [40, 80, 120]
+    gif = []
+    for colour in colours:
+        frame = Image.new('RGB', (16, 12), colour)
+        frame.paste((255, 255, 255), (0, 0, 8, 6))
+        gif.append(frame)
+    source, output = str(tmp_path / "in.gif"), str(tmp_path / "out.gif")
+    gif[0].save(source, save_all=True, append_images=gif[1:], duration=durations, loop=0)
+
+    frames.stream(source, output, [("negative", ())], workers=2)
+
+    with Image.open(output) as result:
+        assert result.n_frames == len(colours)
+        for frame, colour, duration in zip(ImageSequence.Iterator(result), colours, durations):
+            assert frame.info['duration'] == duration
+            rgb = frame.convert('RGB')
+            assert rgb.getpixel((0, 0)) == (0, 0, 0)
+            assert rgb.getpixel((15, 11)) == tuple(255 - c for c in colour)
+
+
+def test_workers_keep_frame_order(pages):
+    numbered = [(page, {'duration': i}) for i, page in enumerate(pages)]
+    serial = list(frames.process_frames(iter(numbered), CHAIN))
+    pooled = list(frames.process_frames(iter(numbered), CHAIN, workers=2))
+    assert [info for _, info in pooled] == [info for _, info in serial]
+    for (a, _), (b, _) in zip(serial, pooled):
+        assert a.tobytes() == b.tobytes()
+
+
+def test_directory_sequence(tmp_path, pages):
+    source = tmp_path / "shots"
+    source.mkdir()
+    for i, page in enumerate(pages[:3]):
+        page.save(source / f"shot{i}.png")
+    output = tmp_path / "out"
+    frames.stream(str(source), str(output), CHAIN, fmt='png')
+    written = sorted(output.iterdir())
+    assert [path.name for path in written] == [f"frame_{i:05d}.png" for i in range(3)]
+    for page, path in zip(pages, written):
+        with Image.open(path) as result:
+            assert result.tobytes() == operations.apply_chain(page, CHAIN).tobytes()
+
+
+def test_output_must_differ_from_input(tmp_path, pages):
+    path = str(tmp_path / "in.tif")
+    pages[0].save(path)
+    with pytest.raises(ValueError):
+        frames.stream(path, path, CHAIN)
@@ -0,0 +1,86 @@
+"""Undo/redo history: eviction, disk spill and replay"""
+import os
+
+import pytest
+
+import operations
+from history import History, ORIGINAL, image_nbytes
+
+OPS = [
+    (operations.log_gamma, (1.8,)),
+    (operations.smoothing, (3,)),
+    (operations.negative, ()),
+    (operations.sharpening, (1.5, 2)),
+    (operations.median_smoothing, (3,)),
+    (operations.log_transform, ()),
+    (operations.box_smoothing, (5,)),
+]
+
+
+@pytest.fixture
+def chain(rgb_image):
+    """Images of every step of OPS applied one after another"""
+    images = []
+    for func, args in OPS:
+        images.append(func(images[-1] if images else rgb_image, *args))
+    return images
+
+
+def push_all(history, images):
+    for i, (op, image) in enumerate(zip(OPS, images)):
+        history.push(image, op, i - 1 if i else ORIGINAL)
+
+
+def test_budget_spills_checkpoints_and_replays_the_rest(rgb_image, chain):
+    history = History(max_bytes=2 * image_nbytes(rgb_image), keep_recent=2, checkpoint_interval=3)
+    history.reset(rgb_image)
+    push_all(history, chain)
+    assert history.ram_bytes <= 2 * image_nbytes(rgb_image)
+    spilled = os.listdir(history._spill_dir)
+    # Steps 0 and 3 are checkpoints; 6 is still resident
+    assert len(spilled) == 2
+
+    seen = [history.current()]
+    while history.can_undo():
+        seen.append(history.undo())
+    assert [image.tobytes() for image in reversed(seen)] == [image.tobytes() for image in chain]
+    while history.can_redo():
+        history.redo()
+    assert history.current().tobytes() == chain[-1].tobytes()
+
+    spill_dir = history._spill_dir
+    history.close()
+    assert not os.path.exists(spill_dir)
+
+
+def test_push_after_undo_discards_redo_steps(rgb_image, chain):
+    history = History(max_bytes=0, keep_recent=1, checkpoint_interval=1)
+    history.reset(rgb_image)
+    push_all(history, chain[:4])
+    history.undo()
+    history.undo()
+    history.push(chain[4], OPS[4], history.index)
+    assert len(history) == 3
+    assert not history.can_redo()
+    assert history.current() is chain[4]
+    # Steps 2 and 3 had been spilled, and their files went with them
+    assert len(os.listdir(history._spill_dir)) == 2
+    assert history.undo().tobytes() == chain[1].tobytes()
+
+
+def test_reset_step_shares_its_base(rgb_image, chain):
+    history = History()
+    history.reset(rgb_image)
+    history.push(chain[0], OPS[0], ORIGINAL)
+    history.push(rgb_image, None, ORIGINAL)
+    assert history.current() is rgb_image
+    assert history.ram_bytes == image_nbytes(chain[0])
+
+
+def test_unrendered_step_is_replayed(rgb_image, chain):
+    history = History()
+    history.reset(rgb_image)
+    history.push(None, OPS[0], ORIGINAL)
+    assert history.cached(0) is None and history.ram_bytes == 0
+    history.push(chain[1], OPS[1], 0)
+    assert history.undo().tobytes() == chain[0].tobytes()
@@ -0,0 +1,55 @@
+"""Morphology against brute-force window minima and maxima"""
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import morphology
+
+
+def brute(array, size, reduce):
+    radius = size // 2
+    pad = [(radius, radius), (radius, radius)] + [(0, 0)] * (array.ndim - 2)
+    view = sliding_window_view(np.pad(array, pad, mode='edge'), (size, size), axis=(0, 1))
+    return reduce(view, axis=(-2, -1))
+
+
+def brute_erode(array, size):
+    return brute(array, size, np.min)
+
+
+def brute_dilate(array, size):
+    return brute(array, size, np.max)
+
+
+# Both sides of DIRECT_MAX, so the shifted-copy and van Herk/Gil-Werman paths are covered
+SIZES = [1, 3, 7, morphology.DIRECT_MAX + 2, 31]
+
+
+@pytest.fixture(params=['uint8', 'uint16', 'rgb'])
+def array(request, rng):
+    if request.param == 'uint16':
+        return rng.integers(0, 65536, (53, 47), dtype=np.uint16)
+    shape = (53, 47, 3) if request.param == 'rgb' else (53, 47)
+    return rng.integers(0, 256, shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_erode_and_dilate(array, size):
+    np.testing.assert_array_equal(morphology.erode(array, size), brute_erode(array, size))
+    np.testing.assert_array_equal(morphology.dilate(array, size), brute_dilate(array, size))
+
+
+@pytest.mark.parametrize("size", [3, morphology.DIRECT_MAX + 2])
+def test_compound_operators(array, size):
+    opened = brute_dilate(brute_erode(array, size), size)
+    closed = brute_erode(brute_dilate(array, size), size)
+    np.testing.assert_array_equal(morphology.opening(array, size, workers=2), opened)
+    np.testing.assert_array_equal(morphology.closing(array, size, workers=2), closed)
+    np.testing.assert_array_equal(morphology.top_hat(array, size), array - opened)
+    np.testing.assert_array_equal(morphology.gradient(array, size),
+                                  brute_dilate(array, size) - brute_erode(array, size))
+
+
+def test_float_data(rng):
+    array = rng.random((40, 33), dtype=np.float32)
+    np.testing.assert_array_equal(morphology.erode(array, 5), brute_erode(array, 5))
@@ -0,0 +1,38 @@
+"""Fused point-operation chains against running each step on its own"""
+import numpy as np
+import pytest
+from PIL import Image
+
+import operations
+
+CHAINS = [
+    [("gamma", (2.2,)), ("negative", ()), ("log", ())],
+    [("negative", ()), ("threshold", (100,)), ("gamma", (1.5,))],
+    [("gamma", (0.8,)), ("smoothing", (3,)), ("negative", ()), ("threshold", (128,)), ("negative", ())],
+    [("threshold", (90,)), ("threshold", (200,))],
+    [("log", ()), ("sharpening", (1.5, 2)), ("gamma", (2.2,))],
+]
+
+
+@pytest.mark.parametrize("chain", CHAINS)
+def test_fused_chain_matches_sequential(rgb_image, chain):
+    fused = operations.apply_chain(rgb_image, chain)
+    sequential = operations.apply_chain(rgb_image, chain, fuse=False)
+    assert fused.mode == sequential.mode
+    assert fused.size == sequential.size
+    assert fused.tobytes() == sequential.tobytes()
+
+
+def test_point_runs_collapse_to_one_step():
+    fused = operations.fuse_chain(CHAINS[2])
+    assert [name for name, _ in fused] == ["gamma", "smoothing", operations.FUSED_STEP]
+    assert len(operations.fuse_chain(CHAINS[0])) == 1
+
+
+def test_native_depth_chain_runs_unfused(rgb_image):
+    levels = np.asarray(rgb_image.convert('L'), dtype=np.float32) / 255
+    image = operations.to_16bit(Image.fromarray(levels))
+    chain = [("gamma", (2.2,)), ("negative", ())]
+    result = operations.apply_chain(image, chain)
+    assert result.mode == 'I;16'
+    assert result.tobytes() == operations.apply_chain(image, chain, fuse=False).tobytes()
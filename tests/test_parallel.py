@@ -0,0 +1,69 @@
+"""Banded parallel.apply against a single serial call"""
+import threading
+import time
+
+import pytest
+
+import edges
+import operations
+import parallel
+import scheduler
+
+CASES = [
+    (operations.smoothing, (7,)),
+    (operations.median_smoothing, (5,)),
+    (operations.sharpening, (1.5, 3)),
+    (operations.log_gamma, (2.2,)),
+    (operations.adaptive_mean_threshold, (15,)),
+    (operations.closing, (5,)),
+    (operations.edge_detection, ("sobel",)),
+]
+
+
+@pytest.fixture(autouse=True)
+def small_bands(monkeypatch):
+    # Let a test-sized image split into many bands
+    monkeypatch.setattr(parallel, 'MIN_BAND_ROWS', 8)
+    monkeypatch.setattr(edges, 'MIN_BAND_ROWS', 8)
+
+
+@pytest.mark.parametrize("func, args", CASES, ids=lambda case: getattr(case, '__name__', None))
+def test_bands_match_serial(rgb_image, func, args):
+    assert len(parallel.bands_for(rgb_image.height, 3 * parallel.BANDS_PER_WORKER,
+                                  parallel.halo_for(func, args))) > 1
+    banded = parallel.apply(func, rgb_image, args, workers=3)
+    serial = func(rgb_image, *args)
+    assert banded.mode == serial.mode
+    assert banded.tobytes() == serial.tobytes()
+
+
+def test_non_local_operation_runs_whole(rgb_image):
+    assert parallel.halo_for(operations.otsu_threshold, ()) is None
+    result = parallel.apply(operations.otsu_threshold, rgb_image, (), workers=3)
+    assert result.tobytes() == operations.otsu_threshold(rgb_image).tobytes()
+
+
+def test_cancelled_job_skips_remaining_bands(rgb_image):
+    pool = scheduler.Scheduler(workers=1)
+    submitted = threading.Event()
+    jobs, started = [], []
+
+    def band(img):
+        submitted.wait()
+        started.append(img.height)
+        # Superseded while the first bands run; the rest must not start
+        jobs[0].cancel()
+        return img.copy()
+
+    operations.OP_NAMES[band] = "negative"
+    try:
+        jobs.append(pool.submit(parallel.apply, band, rgb_image, (), 2, key='edit'))
+        submitted.set()
+        while pool.busy():
+            time.sleep(0.01)
+    finally:
+        del operations.OP_NAMES[band]
+        pool.shutdown()
+    bands = parallel.bands_for(rgb_image.height, 2 * parallel.BANDS_PER_WORKER, 0)
+    assert jobs[0].state == scheduler.CANCELLED
+    assert len(started) < len(bands)
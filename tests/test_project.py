@@ -0,0 +1,100 @@
+"""Saving a session as a project and opening it again"""
+import numpy as np
+import pytest
+from PIL import Image
+
+import operations
+import project
+from history import History, ORIGINAL
+
+STEPS = [
+    ((operations.log_gamma, (2.2,)), ORIGINAL),
+    ((operations.smoothing, (5,)), 0),
+    ((operations.sauvola_threshold, (15,)), 1),
+    ((operations.negative, ()), 0),
+]
+
+
+def build_history(original):
+    history = History()
+    history.reset(original)
+    for op, base in STEPS:
+        func, args = op
+        source = original if base == ORIGINAL else history.cached(base)
+        history.push(func(source, *args), op, base)
+    return history
+
+
+@pytest.fixture(params=['RGB', 'I;16', 'F'])
+def original(request, rgb_image):
+    if request.param == 'RGB':
+        return rgb_image
+    levels = np.asarray(rgb_image.convert('L'), dtype=np.float32) / 255
+    image = Image.fromarray(levels)
+    return operations.to_16bit(image) if request.param == 'I;16' else image
+
+
+@pytest.mark.parametrize("snapshots", [True, False])
+def test_round_trip(tmp_path, original, snapshots):
+    history = build_history(original)
+    history.undo()
+    expected = [history.cached(i) for i in range(len(history))]
+    path = str(tmp_path / ("session" + project.PROJECT_EXTENSION))
+
+    project.save_project(path, original, project.history_steps(history, snapshots),
+                         history.index, source='input.png')
+    assert project.is_project(path)
+
+    loaded, steps, index, source = project.load_project(path)
+    assert (index, source) == (history.index, 'input.png')
+    assert loaded.mode == original.mode and loaded.tobytes() == original.tobytes()
+    assert [(op, base) for op, base, _ in steps] == history.steps()
+    assert all((reload is not None) == snapshots for _, _, reload in steps)
+
+    restored = History()
+    restored.restore(loaded, steps, index)
+    for i in reversed(range(len(expected))):
+        restored.index = i
+        image = restored.current()
+        assert image.mode == expected[i].mode
+        assert image.tobytes() == expected[i].tobytes()
+
+
+def test_save_over_open_project_keeps_mapped_files(tmp_path, rgb_image):
+    path = tmp_path / ("session" + project.PROJECT_EXTENSION)
+    history = build_history(rgb_image)
+    project.save_project(str(path), rgb_image, project.history_steps(history), history.index)
+    loaded, steps, index, _ = project.load_project(str(path))
+    files = sorted(path.iterdir())
+
+    restored = History()
+    restored.restore(loaded, steps, index)
+    project.save_project(str(path), loaded, project.history_steps(restored), restored.index)
+    assert sorted(path.iterdir()) == files
+
+
+def test_unknown_operation_is_reported(tmp_path, rgb_image):
+    path = tmp_path / ("session" + project.PROJECT_EXTENSION)
+    history = build_history(rgb_image)
+    project.save_project(str(path), rgb_image, project.history_steps(history), history.index)
+    manifest = (path / project.MANIFEST).read_text().replace('"sauvola"', '"bogus"')
+    (path / project.MANIFEST).write_text(manifest)
+    with pytest.raises(ValueError, match="bogus"):
+        project.load_project(str(path))
+
+
+@pytest.mark.parametrize("mode, mapped", [('L', True), ('I;16', True), ('RGB', False), ('F', False)])
+def test_mapped_and_copied_modes(tmp_path, rgb_image, mode, mapped):
+    if mode == 'RGB':
+        image = rgb_image
+    elif mode == 'F':
+        image = Image.fromarray(np.asarray(rgb_image.convert('L'), dtype=np.float32) / 255)
+    else:
+        image = rgb_image.convert('L')
+        image = operations.to_16bit(image) if mode == 'I;16' else image
+    path = tmp_path / ("session" + project.PROJECT_EXTENSION)
+    project.save_project(str(path), image, [], ORIGINAL)
+    loaded, _, _, _ = project.load_project(str(path))
+    assert loaded.mode == mode and loaded.tobytes() == image.tobytes()
+    # Pillow marks images backed by a mapped buffer read-only
+    assert bool(loaded.readonly) == mapped
@@ -0,0 +1,101 @@
+"""Scheduler lanes: coalescing, supersession and cancellation"""
+import threading
+import time
+
+import pytest
+
+from scheduler import CANCELLED, DONE, FAILED, Scheduler, checkpoint
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def settle(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while scheduler.busy():
+        assert time.monotonic() < deadline, "jobs did not finish"
+        time.sleep(0.005)
+
+
+def blocker():
+    """A job function that runs until released, checking for cancellation"""
+    started, release = threading.Event(), threading.Event()
+
+    def run():
+        started.set()
+        while not release.wait(0.005):
+            checkpoint()
+        return 'released'
+    return run, started, release
+
+
+def echo(value):
+    return value
+
+
+def test_identical_pending_request_is_coalesced(scheduler):
+    run, started, release = blocker()
+    scheduler.submit(run, key='edit', cancellable=False)
+    assert started.wait(5)
+    first = scheduler.submit(echo, 1, key='edit')
+    assert scheduler.submit(echo, 1, key='edit') is first
+    # Not coalesced: different arguments, or coalescing turned off
+    second = scheduler.submit(echo, 2, key='edit')
+    assert second is not first and first.state == CANCELLED
+    third = scheduler.submit(echo, 2, key='edit', coalesce=False)
+    assert third is not second and second.state == CANCELLED
+    release.set()
+    settle(scheduler)
+    assert (third.state, third.result) == (DONE, 2)
+
+
+def test_newer_job_supersedes_running_one(scheduler):
+    delivered = []
+    run, started, release = blocker()
+    stale = scheduler.submit(run, key='edit', on_done=delivered.append)
+    assert started.wait(5)
+    fresh = scheduler.submit(echo, 'fresh', key='edit', on_done=delivered.append)
+    settle(scheduler)
+    assert stale.state == CANCELLED and stale.cancelled
+    assert fresh.state == DONE
+    assert delivered == ['fresh']
+
+
+def test_non_cancellable_job_finishes_before_the_next(scheduler):
+    order = []
+    run, started, release = blocker()
+    kept = scheduler.submit(run, key='edit', cancellable=False,
+                            on_done=lambda result: order.append(result))
+    assert started.wait(5)
+    scheduler.submit(echo, 'next', key='edit', on_done=order.append)
+    release.set()
+    settle(scheduler)
+    assert kept.state == DONE
+    assert order == ['released', 'next']
+
+
+def test_cancel_one_lane_only(scheduler):
+    run_a, started_a, _ = blocker()
+    run_b, started_b, release_b = blocker()
+    a = scheduler.submit(run_a, key='a')
+    b = scheduler.submit(run_b, key='b')
+    assert started_a.wait(5) and started_b.wait(5)
+    scheduler.cancel('a')
+    release_b.set()
+    settle(scheduler)
+    assert (a.state, b.state) == (CANCELLED, DONE)
+
+
+def test_failure_is_reported(scheduler):
+    errors = []
+
+    def fail():
+        raise ValueError("bad")
+    job = scheduler.submit(fail, key='edit', on_error=errors.append)
+    settle(scheduler)
+    assert job.state == FAILED
+    assert [str(e) for e in errors] == ["bad"]
@@ -0,0 +1,81 @@
+"""The HTTP server end to end, in process, against running the chain directly"""
+import http.client
+import io
+import json
+import threading
+
+import pytest
+from PIL import Image
+
+import operations
+import server
+
+
+@pytest.fixture(scope="module")
+def address():
+    httpd = server.make_server("127.0.0.1", 0, workers=1, max_body=4 << 20)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.service.close()
+    httpd.server_close()
+
+
+def request(address, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def png(rgb_image):
+    out = io.BytesIO()
+    rgb_image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def metrics(address):
+    status, body = request(address, "GET", "/metrics")
+    assert status == 200
+    return json.loads(body)
+
+
+def test_requests_and_metrics(address, png, rgb_image):
+    before = metrics(address)
+
+    status, body = request(address, "POST", "/process?op=negative&op=smoothing=3", png)
+    assert status == 200
+    chain = [operations.parse_op("negative"), operations.parse_op("smoothing=3")]
+    expected = operations.apply_chain(rgb_image, chain)
+    with Image.open(io.BytesIO(body)) as result:
+        assert result.tobytes() == expected.tobytes()
+
+    for query in ("op=bogus", "op=resize=0x0", "op=fit=10", "format=gif",
+                  "format=jpeg&quality=0", "format=webp&quality=101", "quality=x&format=jpeg"):
+        status, _ = request(address, "POST", "/process?" + query, png)
+        assert status == 400, query
+
+    # Refused on the header alone, before any of the body is sent
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    connection.putrequest("POST", "/process")
+    connection.putheader("Content-Length", str(5 << 20))
+    connection.endheaders()
+    assert connection.getresponse().status == 413
+    connection.close()
+
+    # Large enough to be spooled to a temporary file; its name must not leak
+    status, body = request(address, "POST", "/process", b"not an image" * 100000)
+    assert status == 400
+    assert b"dit-" not in body and body == server.ERROR_BODIES[400].encode()
+
+    after = metrics(address)
+    assert after["requests"] - before["requests"] == 10
+    assert after["completed"] - before["completed"] == 1
+    assert after["failed"] - before["failed"] == 1
+    assert after["bytes_in"] - before["bytes_in"] == len(png) + 1200000
+    assert after["queue_depth"] == 0
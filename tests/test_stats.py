@@ -0,0 +1,68 @@
+"""Histograms and statistics against direct computations on the pixels"""
+import numpy as np
+import pytest
+from PIL import Image
+
+import operations
+import stats
+
+
+def direct(values):
+    """describe() computed from the pixel values themselves"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    _, counts = np.unique(values, return_counts=True)
+    p = counts / values.size
+    return {
+        'count': values.size,
+        'mean': values.mean(),
+        'std': values.std(),
+        'min': values.min(),
+        'max': values.max(),
+        'percentiles': {q: np.percentile(values, q, method='inverted_cdf') for q in stats.PERCENTILES},
+        'entropy': -(p * np.log2(p)).sum(),
+    }
+
+
+def assert_described(desc, values, atol=1e-9):
+    expected = direct(values)
+    assert desc['count'] == expected['count']
+    for key in ('mean', 'std', 'min', 'max', 'entropy'):
+        assert desc[key] == pytest.approx(expected[key], abs=atol), key
+    for q in stats.PERCENTILES:
+        assert desc['percentiles'][q] == pytest.approx(expected['percentiles'][q], abs=atol), q
+
+
+def test_histograms_match_pillow(monkeypatch, rgb_image):
+    # Several chunks, the last one partial
+    monkeypatch.setattr(stats, "HISTOGRAM_CHUNK", 1000)
+    hists = stats.histograms(rgb_image)
+    pillow = rgb_image.histogram()
+    for i, band in enumerate("RGB"):
+        np.testing.assert_array_equal(hists[band], pillow[i * 256:(i + 1) * 256])
+    np.testing.assert_array_equal(hists['Luminance'], rgb_image.convert('L').histogram())
+
+
+def test_rgb_statistics(rgb_image):
+    result = stats.compute(rgb_image)
+    assert not result['float']
+    array = np.asarray(rgb_image)
+    for i, band in enumerate("RGB"):
+        assert_described(result['channels'][band], array[:, :, i])
+    assert_described(result['channels']['Luminance'], np.asarray(rgb_image.convert('L')))
+
+
+def test_native_depth_statistics(rgb_image):
+    levels = np.asarray(rgb_image.convert('L'), dtype=np.float32) / 255
+    deep = operations.to_16bit(Image.fromarray(levels))
+    result = stats.compute(deep)
+    assert_described(result['channels']['L'], np.asarray(deep))
+    assert result['histograms']['L'].sum() == deep.width * deep.height
+
+    result = stats.compute(Image.fromarray(levels))
+    assert result['float']
+    quantised = np.rint(levels.astype(np.float64) * 65535) / 65535
+    assert_described(result['channels']['L'], quantised, atol=1e-6)
+
+
+def test_empty_histogram_has_no_statistics():
+    assert stats.describe(np.zeros(256, dtype=np.int64)) is None
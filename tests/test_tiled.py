@@ -0,0 +1,89 @@
+"""Tiled processing with halos against processing the whole image at once"""
+import numpy as np
+import pytest
+from PIL import Image
+
+import operations
+import tiled
+
+CHAINS = [
+    [("smoothing", (5,))],
+    [("median", (3,)), ("gamma", (2.2,))],
+    [("sharpening", (1.5, 2)), ("negative", ())],
+    [("box", (7,)), ("erode", (3,)), ("sauvola", (15,))],
+]
+
+
+@pytest.mark.parametrize("chain", CHAINS)
+@pytest.mark.parametrize("suffix", [".npy", ".tif"])
+def test_tiles_match_whole_image(tmp_path, rgb_image, chain, suffix):
+    source = tmp_path / "in.npy"
+    np.save(source, np.asarray(rgb_image))
+    output = str(tmp_path / f"out{suffix}")
+
+    report = tiled.process_tiled(str(source), output, chain, tile_size=16)
+
+    assert report['tiles'] > 1
+    expected = np.asarray(operations.apply_chain(rgb_image, chain))
+    if suffix == ".npy":
+        result = np.load(output)
+    else:
+        with Image.open(output) as image:
+            result = np.asarray(image)
+    if result.ndim == 3 and expected.ndim == 2:
+        result = result[:, :, 0]
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_non_local_chain_is_refused(tmp_path, rgb_image):
+    source = tmp_path / "in.npy"
+    np.save(source, np.asarray(rgb_image))
+    with pytest.raises(ValueError):
+        tiled.process_tiled(str(source), str(tmp_path / "out.npy"), [("otsu", ())])
+
+
+def test_large_tiled_header_is_opened(tmp_path):
+    path = str(tmp_path / "large.tif")
+    tile = np.arange(256 * 256 * 3, dtype=np.uint32).reshape(256, 256, 3).astype(np.uint8)
+    writer = tiled.TiffTileWriter(path, (20000, 20000), 3, 256)
+    # Only one tile holds data; the file stays small while the header claims 400 MP
+    writer.write(3, 2, tile)
+    writer.close()
+
+    source = tiled.open_source(path)
+    try:
+        assert source.size == (20000, 20000)
+        np.testing.assert_array_equal(source.read((768, 512, 1024, 768)), tile)
+    finally:
+        source.close()
+    with pytest.raises(ValueError, match="max-pixels"):
+        tiled.open_source(path, max_pixels=10 ** 8)
+
+
+def test_compressed_tiled_input_is_decoded_per_tile(tmp_path, rgb_image):
+    source = tmp_path / "in.npy"
+    np.save(source, np.asarray(rgb_image))
+    compressed = str(tmp_path / "in.tif")
+    tiled.process_tiled(str(source), compressed, [], tile_size=16, compress=True)
+    with Image.open(compressed) as image:
+        assert image.info['compression'] == 'tiff_adobe_deflate'
+        reader = tiled.open_source(compressed)
+        assert isinstance(reader, tiled.TiffTileSource)
+        reader.close()
+
+    chain = CHAINS[3]
+    output = str(tmp_path / "out.npy")
+    tiled.process_tiled(compressed, output, chain, tile_size=32)
+    expected = np.asarray(operations.apply_chain(rgb_image, chain))
+    result = np.load(output)
+    np.testing.assert_array_equal(result[:, :, 0] if expected.ndim == 2 else result, expected)
+
+
+def test_whole_decode_beyond_budget_is_refused(tmp_path, rgb_image):
+    path = str(tmp_path / "in.png")
+    rgb_image.save(path)
+    with pytest.raises(ValueError, match="max-decode"):
+        tiled.open_source(path, decode_budget=1000)
+    source = tiled.open_source(path)
+    assert isinstance(source, tiled.PilSource)
+    source.close()
@@ -0,0 +1,473 @@
+"""Out-of-core tiled processing for images larger than RAM.
+
+The source is read tile by tile (memory-mapped for NPY and uncompressed
+TIFF/BMP/PPM files, decoded one TIFF tile at a time for compressed tiled
+TIFFs), each tile is processed with enough halo for the neighbourhood
+filters in the chain, and finished tiles are written straight into a
+tiled TIFF or an NPY file. Peak memory is bounded by the tile size, not
+the image size. Other compressed inputs have to be decoded whole, so they
+are refused beyond a memory budget.
+
+Inputs are trusted local files, so Pillow's decompression-bomb limit is
+lifted; max_pixels sets an explicit limit instead.
+"""
+import argparse
+import io
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+import operations
+
+# Inputs that cannot be read tile by tile are decoded whole up to this size
+DECODE_BUDGET_BYTES = 1 << 30
+
+# PIL raw modes that can be memory-mapped: rawmode -> (bytes per pixel, channel order)
+RAW_LAYOUTS = {
+    'L': (1, None),
+    'RGB': (3, None),
+    'BGR': (3, [2, 1, 0]),
+    'RGBA': (4, None),
+    'RGBX': (4, [0, 1, 2]),
+}
+
+
+class NpySource:
+    """Memory-mapped .npy array"""
+
+    def __init__(self, path):
+        self.array = np.load(path, mmap_mode='r')
+        if self.array.ndim == 2:
+            self.array = self.array[:, :, None]
+        if self.array.dtype != np.uint8 or self.array.ndim != 3:
+            raise ValueError("NPY input must be a uint8 array of shape (H, W) or (H, W, C)")
+        self.size = (self.array.shape[1], self.array.shape[0])
+        self.bands = self.array.shape[2]
+
+    def read(self, box):
+        x0, y0, x1, y1 = box
+        return np.ascontiguousarray(self.array[y0:y1, x0:x1])
+
+    def close(self):
+        self.array = None
+
+
+class RawSource:
+    """Uncompressed file whose PIL tiles can be memory-mapped in place"""
+
+    def __init__(self, path, image):
+        self.path = path
+        self.size = image.size
+        self.regions = []
+        for tile in image.tile:
+            rawmode, stride, ystep = tile.args
+            bpp, order = RAW_LAYOUTS[rawmode]
+            x0, y0, x1, y1 = tile.extents
+            stride = stride or (x1 - x0) * bpp
+            self.regions.append((tile.extents, tile.offset, stride, ystep, bpp, order))
+        self.bands = len(image.getbands()) if image.mode != 'RGBX' else 3
+        self._maps = {}
+
+    @classmethod
+    def supports(cls, image):
+        for tile in image.tile:
+            if tile.codec_name != 'raw' or not isinstance(tile.args, tuple) or len(tile.args) != 3:
+                return False
+            if tile.args[0] not in RAW_LAYOUTS or tile.args[2] not in (1, -1):
+                return False
+        return bool(image.tile)
+
+    def _map(self, index):
+        if index not in self._maps:
+            (x0, y0, x1, y1), offset, stride, _, _, _ = self.regions[index]
+            self._maps[index] = np.memmap(self.path, dtype=np.uint8, mode='r',
+                                          offset=offset, shape=(y1 - y0, stride))
+        return self._maps[index]
+
+    def read(self, box):
+        bx0, by0, bx1, by1 = box
+        out = np.zeros((by1 - by0, bx1 - bx0, self.bands), dtype=np.uint8)
+        for index, (extents, _, _, ystep, bpp, order) in enumerate(self.regions):
+            x0, y0, x1, y1 = extents
+            ix0, iy0, ix1, iy1 = max(bx0, x0), max(by0, y0), min(bx1, x1), min(by1, y1)
+            if ix0 >= ix1 or iy0 >= iy1:
+                continue
+            rows = self._map(index)
+            if ystep == -1:
+                height = y1 - y0
+                rows = rows[height - (iy1 - y0):height - (iy0 - y0)][::-1]
+            else:
+                rows = rows[iy0 - y0:iy1 - y0]
+            pixels = rows[:, (ix0 - x0) * bpp:(ix1 - x0) * bpp].reshape(iy1 - iy0, ix1 - ix0, bpp)
+            if order is not None:
+                pixels = pixels[:, :, order]
+            out[iy0 - by0:iy1 - by0, ix0 - bx0:ix1 - bx0] = pixels
+        return out
+
+    def close(self):
+        self._maps.clear()
+
+
+class TiffTileSource:
+    """Compressed tiled TIFF, decoded one TIFF tile at a time.
+
+    Pillow decodes a compressed TIFF as a whole, so each tile's bytes are
+    wrapped in a one-tile TIFF with the source's coding tags and decoded
+    on their own. Recently used tiles are kept, as neighbouring reads
+    overlap by their halo.
+    """
+
+    # How pixels are encoded; copied into every one-tile file
+    CODING_TAGS = (258, 259, 262, 277, 284, 317, 338, 339, 347, 530, 532)
+
+    def __init__(self, path, image):
+        tags = image.tag_v2
+        self.size = image.size
+        self.bands = len(image.getbands())
+        self.tile_width, self.tile_height = tags[322], tags[323]
+        self.across = math.ceil(self.size[0] / self.tile_width)
+        self.offsets, self.counts = tags[324], tags[325]
+        self.coding = [(tag, tags[tag], tags.tagtype[tag]) for tag in self.CODING_TAGS if tag in tags]
+        self.file = open(path, 'rb')
+        self._tiles = OrderedDict()
+        # Two rows of tiles cover every read of a tile row plus its halo
+        self._keep = max(8, 2 * self.across + 2)
+
+    @classmethod
+    def supports(cls, image):
+        tags = getattr(image, 'tag_v2', None)
+        return (tags is not None and 322 in tags and 324 in tags and tags.get(284, 1) == 1
+                and image.mode in ('L', 'RGB', 'RGBA'))
+
+    def _decode(self, index):
+        self.file.seek(self.offsets[index])
+        data = self.file.read(self.counts[index])
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b'II')
+        for tag, value, kind in self.coding:
+            ifd[tag] = value
+            ifd.tagtype[tag] = kind
+        # One strip holding the tile; the strip offset is filled in past the IFD
+        for tag, value in ((256, self.tile_width), (257, self.tile_height),
+                           (278, self.tile_height), (273, 0), (279, len(data))):
+            ifd[tag] = value
+            ifd.tagtype[tag] = 4
+        tile = b'II*\0' + struct.pack('<I', 8) + ifd.tobytes(8) + data
+        with Image.open(io.BytesIO(tile)) as image:
+            array = np.asarray(image)
+        return array[:, :, None] if array.ndim == 2 else array
+
+    def _tile(self, index):
+        if index in self._tiles:
+            self._tiles.move_to_end(index)
+        else:
+            self._tiles[index] = self._decode(index)
+            if len(self._tiles) > self._keep:
+                self._tiles.popitem(last=False)
+        return self._tiles[index]
+
+    def read(self, box):
+        bx0, by0, bx1, by1 = box
+        tw, th = self.tile_width, self.tile_height
+        out = np.empty((by1 - by0, bx1 - bx0, self.bands), dtype=np.uint8)
+        for row in range(by0 // th, (by1 - 1) // th + 1):
+            for col in range(bx0 // tw, (bx1 - 1) // tw + 1):
+                tile = self._tile(row * self.across + col)
+                x0, y0 = col * tw, row * th
+                ix0, iy0 = max(bx0, x0), max(by0, y0)
+                ix1, iy1 = min(bx1, x0 + tw), min(by1, y0 + th)
+                out[iy0 - by0:iy1 - by0, ix0 - bx0:ix1 - bx0] = \
+                    tile[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0]
+        return out
+
+    def close(self):
+        self._tiles.clear()
+        self.file.close()
+
+
+class PilSource:
+    """Fallback for compressed formats: PIL has to decode the whole image once"""
+
+    def __init__(self, image):
+        self.image = image
+        self.size = image.size
+        self.bands = len(image.getbands())
+
+    def read(self, box):
+        return np.array(self.image.crop(box))
+
+    def close(self):
+        self.image.close()
+
+
+def _open_image(path):
+    """Image.open without Pillow's decompression-bomb limit (inputs are trusted local files)"""
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def open_source(path, max_pixels=None, decode_budget=DECODE_BUDGET_BYTES):
+    """Pick the cheapest tile reader for a file.
+
+    Files larger than max_pixels (if given) raise ValueError, as do files
+    that must be decoded whole and would take more than decode_budget bytes.
+    """
+    if path.lower().endswith('.npy'):
+        source = NpySource(path)
+    else:
+        image = _open_image(path)
+        if RawSource.supports(image):
+            source = RawSource(path, image)
+            image.close()
+        elif TiffTileSource.supports(image):
+            source = TiffTileSource(path, image)
+            image.close()
+        else:
+            width, height = image.size
+            needed = width * height * len(image.getbands())
+            if needed > decode_budget:
+                image.close()
+                raise ValueError(
+                    f"{os.path.basename(path)} ({width}x{height}) cannot be read tile by tile and would "
+                    f"take {needed / 2 ** 20:.0f} MB to decode (budget {decode_budget / 2 ** 20:.0f} MB); "
+                    f"convert it to an uncompressed or tiled TIFF, or raise --max-decode")
+            source = PilSource(image)
+    width, height = source.size
+    if max_pixels and width * height > max_pixels:
+        source.close()
+        raise ValueError(f"{os.path.basename(path)} has {width * height} pixels, "
+                         f"more than --max-pixels {max_pixels}")
+    return source
+
+
+def to_rgb_image(array):
+    """Tile array to the RGB image the GUI would have loaded"""
+    if array.shape[2] == 1:
+        return Image.fromarray(array[:, :, 0], 'L').convert('RGB')
+    if array.shape[2] == 4:
+        return Image.fromarray(array, 'RGBA').convert('RGB')
+    return Image.fromarray(array, 'RGB')
+
+
+class TiffTileWriter:
+    """Streams tiles into a tiled TIFF (BigTIFF when over 4 GB), optionally deflate-compressed"""
+
+    def __init__(self, path, size, bands, tile_size, compress=False):
+        self.width, self.height = size
+        self.bands = bands
+        self.tile_size = tile_size
+        self.compress = compress
+        self.across = math.ceil(self.width / tile_size)
+        self.down = math.ceil(self.height / tile_size)
+        self.tile_bytes = tile_size * tile_size * bands
+        # Deflate practically never grows a tile much, so the raw size decides
+        self.big = self.tile_bytes * self.across * self.down > 0xFFFF0000
+        self.offsets = [0] * (self.across * self.down)
+        self.counts = [self.tile_bytes] * (self.across * self.down)
+        self.file = open(path, 'wb')
+        # Header is patched with the IFD offset on close
+        self.file.write(b'\0' * (16 if self.big else 8))
+
+    def write(self, col, row, array):
+        """Write the tile at grid position (col, row); edge tiles are padded"""
+        h, w = array.shape[:2]
+        if (h, w) != (self.tile_size, self.tile_size):
+            padded = np.zeros((self.tile_size, self.tile_size, self.bands), dtype=np.uint8)
+            padded[:h, :w] = array
+            array = padded
+        data = np.ascontiguousarray(array).tobytes()
+        if self.compress:
+            data = zlib.compress(data, 6)
+        self.offsets[row * self.across + col] = self.file.tell()
+        self.counts[row * self.across + col] = len(data)
+        self.file.write(data)
+
+    def close(self):
+        long_type, long_fmt = (16, 'Q') if self.big else (4, 'I')
+        photometric = 1 if self.bands == 1 else 2
+        entries = [
+            (256, 4, [self.width]),
+            (257, 4, [self.height]),
+            (258, 3, [8] * self.bands),
+            (259, 3, [8 if self.compress else 1]),
+            (262, 3, [photometric]),
+            (277, 3, [self.bands]),
+            (284, 3, [1]),
+            (322, 4, [self.tile_size]),
+            (323, 4, [self.tile_size]),
+            (324, long_type, self.offsets),
+            (325, long_type, self.counts),
+        ]
+        formats = {3: 'H', 4: 'I', 16: 'Q'}
+        inline = 8 if self.big else 4
+
+        # Out-of-line values go first, then the IFD that points at them
+        values = []
+        for tag, kind, data in entries:
+            payload = struct.pack(f'<{len(data)}{formats[kind]}', *data)
+            if len(payload) > inline:
+                if self.file.tell() % 2:
+                    self.file.write(b'\0')
+                values.append((tag, kind, len(data), None, self.file.tell()))
+                self.file.write(payload)
+            else:
+                values.append((tag, kind, len(data), payload.ljust(inline, b'\0'), None))
+
+        if self.file.tell() % 2:
+            self.file.write(b'\0')
+        ifd_offset = self.file.tell()
+        if self.big:
+            self.file.write(struct.pack('<Q', len(values)))
+        else:
+            self.file.write(struct.pack('<H', len(values)))
+        for tag, kind, count, payload, offset in values:
+            if payload is None:
+                payload = struct.pack(f'<{long_fmt}', offset)
+            if self.big:
+                self.file.write(struct.pack('<HHQ', tag, kind, count) + payload)
+            else:
+                self.file.write(struct.pack('<HHI', tag, kind, count) + payload)
+        self.file.write(struct.pack(f'<{long_fmt}', 0))
+
+        self.file.seek(0)
+        if self.big:
+            self.file.write(b'II' + struct.pack('<HHHQ', 43, 8, 0, ifd_offset))
+        else:
+            self.file.write(b'II' + struct.pack('<HI', 42, ifd_offset))
+        self.file.close()
+
+
+class NpyTileWriter:
+    """Writes tiles into a memory-mapped .npy file"""
+
+    def __init__(self, path, size, bands, tile_size):
+        width, height = size
+        self.tile_size = tile_size
+        self.array = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                               shape=(height, width, bands))
+
+    def write(self, col, row, array):
+        y, x = row * self.tile_size, col * self.tile_size
+        h, w = array.shape[:2]
+        self.array[y:y + h, x:x + w] = array
+
+    def close(self):
+        self.array.flush()
+        self.array = None
+
+
+def open_writer(path, size, bands, tile_size, compress=False):
+    lower = path.lower()
+    if lower.endswith('.npy'):
+        return NpyTileWriter(path, size, bands, tile_size)
+    if lower.endswith(('.tif', '.tiff')):
+        return TiffTileWriter(path, size, bands, tile_size, compress)
+    raise ValueError("Tiled output must be a .tif/.tiff or .npy file")
+
+
+def process_tiled(input_path, output_path, chain, tile_size=1024, progress=None,
+                  max_pixels=None, decode_budget=DECODE_BUDGET_BYTES, compress=False):
+    """Run chain over input_path tile by tile and stream tiles to output_path"""
+    halo = operations.chain_halo(chain)
+    # TIFF requires tile dimensions that are multiples of 16
+    tile_size = max(16, (tile_size + 15) // 16 * 16)
+    source = open_source(input_path, max_pixels, decode_budget)
+    width, height = source.size
+    writer = None
+    start = time.perf_counter()
+    try:
+        across = math.ceil(width / tile_size)
+        down = math.ceil(height / tile_size)
+        for row in range(down):
+            for col in range(across):
+                x0, y0 = col * tile_size, row * tile_size
+                x1, y1 = min(x0 + tile_size, width), min(y0 + tile_size, height)
+                hx0, hy0 = max(0, x0 - halo), max(0, y0 - halo)
+                hx1, hy1 = min(width, x1 + halo), min(height, y1 + halo)
+
+                tile = to_rgb_image(source.read((hx0, hy0, hx1, hy1)))
+                result = operations.apply_chain(tile, chain)
+                result = result.crop((x0 - hx0, y0 - hy0, x1 - hx0, y1 - hy0))
+                array = np.asarray(result)
+                if array.ndim == 2:
+                    array = array[:, :, None]
+
+                if writer is None:
+                    writer = open_writer(output_path, (width, height), array.shape[2], tile_size,
+                                         compress)
+                writer.write(col, row, array)
+                if progress:
+                    progress(row * across + col + 1, across * down, time.perf_counter() - start)
+    finally:
+        if writer is not None:
+            writer.close()
+        source.close()
+    return {
+        'size': (width, height),
+        'tiles': math.ceil(width / tile_size) * math.ceil(height / tile_size),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def print_progress(done, total, elapsed):
+    """Single-line progress report on stderr"""
+    sys.stderr.write(f"\r{done}/{total} tiles  {elapsed:.1f}s")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py tiled",
+        description="Process one very large image tile by tile with bounded memory.")
+    parser.add_argument("input")
+    parser.add_argument("output", help="output .tif/.tiff (tiled TIFF) or .npy")
+    parser.add_argument("--op", action="append", default=[], metavar="NAME[=VALUE]",
+                        help="operation to apply, in order; repeatable (resize is not supported)")
+    parser.add_argument("--tile", type=int, default=1024, help="tile size in pixels (default 1024)")
+    parser.add_argument("--compress", action="store_true", help="deflate-compress TIFF output tiles")
+    parser.add_argument("--max-pixels", type=int, default=None,
+                        help="refuse inputs with more pixels (default: no limit; inputs are trusted)")
+    parser.add_argument("--max-decode", type=int, default=DECODE_BUDGET_BYTES >> 20, metavar="MB",
+                        help="memory for inputs that must be decoded whole, such as PNG or "
+                             f"compressed strip TIFF (default: {DECODE_BUDGET_BYTES >> 20})")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    return parser
+
+
+def main(argv):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        chain = [operations.parse_op(spec) for spec in args.op]
+        operations.chain_halo(chain)
+    except ValueError as e:
+        parser.error(str(e))
+    if not chain:
+        parser.error("at least one --op is required")
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        parser.error("output must differ from input")
+
+    try:
+        summary = process_tiled(args.input, args.output, chain, tile_size=args.tile,
+                                progress=None if args.quiet else print_progress,
+                                max_pixels=args.max_pixels, decode_budget=args.max_decode << 20,
+                                compress=args.compress)
+    except (OSError, ValueError) as e:
+        print(f"Failed: {e}", file=sys.stderr)
+        return 1
+    width, height = summary['size']
+    print(f"Processed {width}x{height} in {summary['tiles']} tiles "
+          f"in {summary['seconds']:.2f}s")
+    return 0
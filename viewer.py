@@ -0,0 +1,264 @@
+"""Zoomable, pannable image panes that draw only what is on screen.
+
+A Viewport shows one image on a Tk canvas. A redraw takes the visible
+rectangle from the pyramid level nearest the current zoom (never coarser
+than the screen needs), resamples just that rectangle and pastes it into
+a PhotoImage that is kept until the canvas changes size. Redraws after a
+window resize are debounced; drags are coalesced into one redraw per idle
+turn of the event loop and use a cheaper filter until the button is
+released. Linked viewports follow each other's zoom and pan.
+
+The view is stored independently of the image: ``extent`` is the width
+of the whole image on screen in pixels (None fits it to the pane) and
+``center`` is the point in the middle of the pane as fractions of the
+image size. Panes holding images of different sizes (a full-resolution
+result next to a preview proxy, or a resized result) therefore show the
+same part of the picture.
+"""
+import tkinter as tk
+
+from PIL import Image, ImageTk
+
+import operations
+import profiling
+from pyramid import get_pyramid
+
+RESIZE_DEBOUNCE_MS = 100
+ZOOM_STEP = 1.25
+# Screen pixels per image pixel at the closest zoom
+MAX_ZOOM = 32.0
+BACKGROUND = '#34495e'
+
+
+def fit_scale(size, width, height):
+    """Scale that fits size into width x height (never enlarging)"""
+    w, h = size
+    return min(width / w, height / h, 1.0)
+
+
+def view_scale(size, width, height, extent):
+    """Screen pixels per image pixel for a view extent (None fits the image)"""
+    fit = fit_scale(size, width, height)
+    if extent is None:
+        return fit
+    return min(max(extent / size[0], fit), MAX_ZOOM)
+
+
+def clamp_center(size, width, height, scale, center):
+    """Keep the view on the image; an axis that fits in the pane is centred"""
+    clamped = []
+    for length, view, c in zip(size, (width, height), center):
+        half = view / (2 * scale * length)
+        clamped.append(0.5 if half >= 0.5 else min(max(c, half), 1 - half))
+    return tuple(clamped)
+
+
+def render_view(image, width, height, scale, center, resample=Image.Resampling.LANCZOS):
+    """RGB width x height picture of image at scale, centred on center.
+
+    Only the visible rectangle is resampled, from the smallest pyramid
+    level that still has enough pixels; magnified pixels stay square.
+    """
+    iw, ih = image.size
+    left = center[0] * iw - width / (2 * scale)
+    top = center[1] * ih - height / (2 * scale)
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + width / scale, iw), min(top + height / scale, ih)
+
+    frame = Image.new('RGB', (width, height), BACKGROUND)
+    dx, dy = round((x0 - left) * scale), round((y0 - top) * scale)
+    out = (min(round((x1 - x0) * scale), width - dx), min(round((y1 - y0) * scale), height - dy))
+    if out[0] < 1 or out[1] < 1:
+        return frame
+
+    level = get_pyramid(image).level_for_scale(scale)
+    fx, fy = level.width / iw, level.height / ih
+    if scale >= fx:
+        resample = Image.Resampling.NEAREST
+    region = level.resize(out, resample, box=(x0 * fx, y0 * fy, x1 * fx, y1 * fy))
+    frame.paste(operations.to_8bit(region), (dx, dy))
+    return frame
+
+
+class Viewport:
+    """Canvas pane with wheel zoom, drag pan and double-click fit / 1:1"""
+
+    def __init__(self, master, text, fg='white'):
+        self.master = master
+        self.canvas = tk.Canvas(master, bg=BACKGROUND, highlightthickness=0)
+        self.image = None
+        self.extent = None
+        self.center = (0.5, 0.5)
+        self.photo = None
+        self.linked = []
+        self._item = self.canvas.create_image(0, 0, anchor='nw', state='hidden')
+        self._text = self.canvas.create_text(0, 0, text=text, fill=fg, font=("Arial", 14),
+                                             justify='center')
+        self._zoom_text = self.canvas.create_text(0, 0, anchor='se', fill='white',
+                                                  font=("Arial", 9))
+        self._resize_job = None
+        self._redraw_job = None
+        self._drag = None
+        self._size = None
+
+        self.canvas.bind('<Configure>', self.on_configure)
+        self.canvas.bind('<MouseWheel>', lambda e: self.zoom_at(
+            ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP, e.x, e.y))
+        self.canvas.bind('<Button-4>', lambda e: self.zoom_at(ZOOM_STEP, e.x, e.y))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom_at(1 / ZOOM_STEP, e.x, e.y))
+        self.canvas.bind('<ButtonPress-1>', self.start_drag)
+        self.canvas.bind('<B1-Motion>', self.drag)
+        self.canvas.bind('<ButtonRelease-1>', self.end_drag)
+        self.canvas.bind('<Double-Button-1>', lambda e: self.toggle_zoom(e.x, e.y))
+
+    def pack(self, **options):
+        self.canvas.pack(**options)
+
+    def link(self, *others):
+        """Share zoom and pan with other viewports"""
+        for other in others:
+            if other not in self.linked:
+                self.linked.append(other)
+                other.linked.append(self)
+
+    def size(self):
+        """Canvas size as last laid out (no forced geometry update)"""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width < 50 or height < 50:
+            width, height = 400, 300
+        return width, height
+
+    # Content
+    def show(self, image):
+        """Draw a new image with the current zoom and pan"""
+        self.image = image
+        self.canvas.itemconfigure(self._text, state='hidden')
+        self.render()
+
+    def clear(self, text, fg='white'):
+        """Drop the image and show a placeholder message"""
+        self.image = None
+        self.photo = None
+        self.canvas.itemconfigure(self._item, image='', state='hidden')
+        self.canvas.itemconfigure(self._zoom_text, text='')
+        self.message(text, fg)
+
+    def message(self, text, fg='white'):
+        """Placeholder text, visible while no image is shown"""
+        self.canvas.itemconfigure(self._text, text=text, fill=fg,
+                                  state='hidden' if self.image is not None else 'normal')
+
+    # View
+    def fit(self):
+        """Fit the whole image again (linked panes follow)"""
+        self.extent = None
+        self.center = (0.5, 0.5)
+        self.changed()
+
+    def scale(self):
+        width, height = self.size()
+        return view_scale(self.image.size, width, height, self.extent)
+
+    def zoom_at(self, factor, x, y):
+        """Zoom by factor keeping the image point under (x, y) in place"""
+        if self.image is None:
+            return
+        width, height = self.size()
+        iw, ih = self.image.size
+        scale = self.scale()
+        center = clamp_center(self.image.size, width, height, scale, self.center)
+        px = center[0] * iw + (x - width / 2) / scale
+        py = center[1] * ih + (y - height / 2) / scale
+        new = min(scale * factor, MAX_ZOOM)
+        if new <= fit_scale(self.image.size, width, height):
+            self.fit()
+            return
+        self.extent = new * iw
+        self.center = ((px - (x - width / 2) / new) / iw, (py - (y - height / 2) / new) / ih)
+        self.changed()
+
+    def toggle_zoom(self, x, y):
+        """Double click: 1:1 at the pointer, or back to fit"""
+        if self.image is None:
+            return
+        if self.extent is None:
+            self.zoom_at(1 / self.scale(), x, y)
+        else:
+            self.fit()
+
+    def start_drag(self, event):
+        self._drag = (event.x, event.y)
+        self.canvas.config(cursor='fleur')
+
+    def drag(self, event):
+        if self._drag is None or self.image is None:
+            return
+        width, height = self.size()
+        scale = self.scale()
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        cx, cy = clamp_center(self.image.size, width, height, scale, self.center)
+        self.center = clamp_center(self.image.size, width, height, scale,
+                                   (cx - dx / (scale * self.image.width),
+                                    cy - dy / (scale * self.image.height)))
+        self.changed()
+
+    def end_drag(self, event):
+        self._drag = None
+        self.canvas.config(cursor='')
+        # Redraw the last position at full quality
+        for view in [self] + self.linked:
+            view.request_render()
+
+    def changed(self):
+        """Push this view to the linked panes and schedule redraws"""
+        for other in self.linked:
+            other.extent, other.center = self.extent, self.center
+            other.request_render()
+        self.request_render()
+
+    # Drawing
+    def on_configure(self, event):
+        size = (event.width, event.height)
+        if size == self._size:
+            return
+        self._size = size
+        self.canvas.coords(self._text, event.width / 2, event.height / 2)
+        self.canvas.coords(self._zoom_text, event.width - 6, event.height - 4)
+        if self._resize_job is not None:
+            self.canvas.after_cancel(self._resize_job)
+        self._resize_job = self.canvas.after(RESIZE_DEBOUNCE_MS, self.render)
+
+    def request_render(self):
+        """Redraw once the pending events are handled (repeat requests coalesce)"""
+        if self._redraw_job is None:
+            self._redraw_job = self.canvas.after_idle(self.render)
+
+    def render(self):
+        for job in (self._resize_job, self._redraw_job):
+            if job is not None:
+                self.canvas.after_cancel(job)
+        self._resize_job = self._redraw_job = None
+        image = self.image
+        if image is None:
+            return
+        try:
+            width, height = self.size()
+            scale = view_scale(image.size, width, height, self.extent)
+            center = clamp_center(image.size, width, height, scale, self.center)
+            dragging = self._drag is not None or any(view._drag is not None for view in self.linked)
+            resample = Image.Resampling.BILINEAR if dragging else Image.Resampling.LANCZOS
+            with profiling.span('display', 'display', image=image) as span:
+                frame = render_view(image, width, height, scale, center, resample)
+                span.output(frame)
+                if self.photo is not None and (self.photo.width(), self.photo.height()) == frame.size:
+                    self.photo.paste(frame)
+                else:
+                    self.photo = ImageTk.PhotoImage(frame)
+                    self.canvas.itemconfigure(self._item, image=self.photo)
+            self.canvas.itemconfigure(self._item, state='normal')
+            self.canvas.itemconfigure(self._zoom_text, text=f"{scale * 100:.0f}%")
+            self.canvas.tag_raise(self._zoom_text)
+        except Exception as e:
+            profiling.profiler.error('display', e)
+            print(f"Display error: {e}")